@@ -1,17 +1,28 @@
+import os
 from flask import Flask
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 from .models import db
 from .utils.jwt_handler import init_jwt
+from .utils.database import init_database
 from .routes.auth import auth_bp
 from .routes.translation import translation_bp
 from .routes.payment import payment_bp
 from .routes.history import history_bp
+from .routes.ai import ai_bp
+from .routes.downloads import downloads_bp
+from .routes.metrics import metrics_bp
+from .routes.pages import pages_bp, FRONTEND_DIR
 
-def create_app(config_class='config.DevelopmentConfig'):
-    app = Flask(__name__)
+def create_app(config_class=None):
+    """The application factory used by run.py (dev server), wsgi.py (gunicorn) and the CLI scripts.
+
+    config_class defaults to $APP_CONFIG, else config.DevelopmentConfig.
+    """
+    app = Flask(__name__, static_folder=FRONTEND_DIR)
     
     # Load config
+    if config_class is None:
+        config_class = os.getenv('APP_CONFIG', 'config.DevelopmentConfig')
     if isinstance(config_class, str):
         app.config.from_object(config_class)
     else:
@@ -19,17 +30,21 @@ def create_app(config_class='config.DevelopmentConfig'):
     
     # Initialize extensions
     CORS(app)
-    db.init_app(app)
+    init_database(app)
     init_jwt(app)
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-    
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(translation_bp, url_prefix='/api/translation')
     app.register_blueprint(payment_bp, url_prefix='/api/payment')
     app.register_blueprint(history_bp, url_prefix='/api/history')
+    # AI/config endpoints
+    app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    # File đã dịch: /downloads/<path> (link có chữ ký, hỗ trợ Range/ETag/X-Accel-Redirect)
+    app.register_blueprint(downloads_bp)
+    # Prometheus metrics (/metrics) and request timing
+    app.register_blueprint(metrics_bp)
+    # Frontend pages and static files
+    app.register_blueprint(pages_bp)
     
-    return app
\ No newline at end of file
+    return app
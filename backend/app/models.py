@@ -1,8 +1,28 @@
+import hashlib
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import LargeBinary, TypeDecorator
 from datetime import datetime
+from app.utils.compression import compress_text, decompress_text
 
 db = SQLAlchemy()
 
+# Characters of original/translated text kept in plain text for history lists; one more is
+# stored so a list can tell a cut preview from a short text
+PREVIEW_CHARS = 200
+
+class CompressedText(TypeDecorator):
+    """Text stored as (optionally zlib/zstd compressed) bytes; str in, str out."""
+    impl = LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql')
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     google_id = db.Column(db.String(255), unique=True)
@@ -15,13 +35,78 @@ class User(db.Model):
 class Translation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    original_text = db.Column(db.Text)
-    translated_text = db.Column(db.Text)
+    original_text = db.Column(CompressedText)
+    translated_text = db.Column(CompressedText)
     source_lang = db.Column(db.String(10))
     target_lang = db.Column(db.String(10))
     file_path = db.Column(db.String(500))
+    content_hash = db.Column(db.String(64))  # translation_hash() of the stored row, set on insert
+    # Uncompressed prefixes (PREVIEW_CHARS + 1) so history lists never read the texts
+    original_preview = db.Column(db.String(PREVIEW_CHARS + 1))
+    translated_preview = db.Column(db.String(PREVIEW_CHARS + 1))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # History listing and per-day range scans of one user (quota backfill, date filter)
+        db.Index('ix_translation_user_created', 'user_id', 'created_at'),
+        # Idempotent saves and duplicate lookups without comparing Text columns
+        db.Index('ix_translation_user_hash', 'user_id', 'content_hash'),
+    )
+
+class TranslationArchive(db.Model):
+    """History rows moved out of translation by archive_history(); same ids and columns."""
+    __tablename__ = 'translation_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    original_text = db.Column(CompressedText)
+    translated_text = db.Column(CompressedText)
+    source_lang = db.Column(db.String(10))
+    target_lang = db.Column(db.String(10))
+    file_path = db.Column(db.String(500))
+    content_hash = db.Column(db.String(64))
+    original_preview = db.Column(db.String(PREVIEW_CHARS + 1))
+    translated_preview = db.Column(db.String(PREVIEW_CHARS + 1))
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_translation_archive_user_created', 'user_id', 'created_at'),)
+
+def translation_hash(user_id, source_lang, target_lang, original_text, translated_text):
+    """SHA-256 identifying a history record by owner, languages and (stored) texts."""
+    parts = [str(user_id or ''), source_lang or '', target_lang or '', original_text or '', translated_text or '']
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+@event.listens_for(Translation, 'before_insert')
+@event.listens_for(Translation, 'before_update')
+def _set_content_hash(mapper, connection, target):
+    target.content_hash = translation_hash(
+        target.user_id, target.source_lang, target.target_lang, target.original_text, target.translated_text,
+    )
+
+def text_preview(value):
+    return (value or '')[:PREVIEW_CHARS + 1]
+
+@event.listens_for(Translation, 'before_insert')
+@event.listens_for(Translation, 'before_update')
+def _set_previews(mapper, connection, target):
+    target.original_preview = text_preview(target.original_text)
+    target.translated_preview = text_preview(target.translated_text)
+
+class UsageCounter(db.Model):
+    """Translations recorded per user and UTC day; bumped in the same transaction as the inserts."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class UsageRollup(db.Model):
+    """History rows per user, UTC day, language pair and kind ('text' or 'document'), kept by UsageRollups."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    source_lang = db.Column(db.String(10), primary_key=True, default='')
+    target_lang = db.Column(db.String(10), primary_key=True, default='')
+    kind = db.Column(db.String(10), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -29,4 +114,35 @@ class Payment(db.Model):
     currency = db.Column(db.String(10), default='VND')
     status = db.Column(db.String(50), default='pending')
     sepay_transaction_id = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+class TranslationJob(db.Model):
+    """Durable document job record shared by API processes and translation workers."""
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(255), index=True)  # JWT identity (google_id) of the uploader
+    file_path = db.Column(db.String(500), nullable=False)
+    target_lang = db.Column(db.String(10), nullable=False)
+    base_job_id = db.Column(db.String(36))
+    batch_id = db.Column(db.String(36), index=True)  # set for jobs created by the batch API
+    result_key = db.Column(db.String(64))  # ResultCache key: hash of (source file, target_lang, model, pipeline)
+    incremental = db.Column(db.Boolean, default=True)
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, in_progress, cancelling, completed, failed, cancelled
+    priority = db.Column(db.Integer, default=1)  # plan weight of the uploader
+    # Fair-queuing tag: jobs are leased in virtual_start order (JobStore.create/lease)
+    virtual_start = db.Column(db.Double)
+    progress = db.Column(db.Integer, default=0)
+    message = db.Column(db.String(255))
+    download_path = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    fallback = db.Column(db.Boolean, default=False)
+    fallback_reason = db.Column(db.String(255))
+    segments_reused = db.Column(db.Integer, default=0)
+    segments_translated = db.Column(db.Integer, default=0)
+    eta_seconds = db.Column(db.Integer)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    attempts = db.Column(db.Integer, default=0)
+    worker_id = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_translation_job_status_vstart', 'status', 'virtual_start', 'created_at'),)
@@ -1,14 +1,26 @@
 from flask import Blueprint, request, jsonify, redirect, session
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from app.models import db, User, Translation
-import google.auth.transport.requests
-import google.oauth2.id_token
-import google.oauth2.service_account
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models import db, User
+from app.services.usage_service import usage_counters
+from app.services.identity_service import current_user, identity_cache, issue_token
 import os
 import secrets
 
 auth_bp = Blueprint('auth', __name__)
 
+
+@auth_bp.record_once
+def _init_identity_cache(state):
+    identity_cache.init_app(state.app)
+
+
+def _verify_google_token(token, client_id):
+    # google-auth (and requests under it) is only needed at sign-in, not at startup
+    import google.auth.transport.requests
+    import google.oauth2.id_token
+    return google.oauth2.id_token.verify_oauth2_token(token, google.auth.transport.requests.Request(), client_id)
+
+
 @auth_bp.route('/config', methods=['GET'])
 def auth_config():
     from flask import current_app
@@ -107,11 +119,7 @@ def google_callback():
         
         # Verify and decode ID token
         try:
-            idinfo = google.oauth2.id_token.verify_oauth2_token(
-                id_token,
-                google.auth.transport.requests.Request(),
-                client_id
-            )
+            idinfo = _verify_google_token(id_token, client_id)
             
             user_id = idinfo.get('sub')
             email = idinfo.get('email')
@@ -128,7 +136,7 @@ def google_callback():
                 db.session.commit()
             
             # Create JWT for our app
-            access_token = create_access_token(identity=user_id)
+            access_token = issue_token(user)
             print(f"[DEBUG] JWT created for user: {user_id}")
             
             # Redirect to dashboard with token
@@ -154,11 +162,7 @@ def google_auth():
         token = data.get('token')
         print(f"[DEBUG] Received token: {token[:50]}...")
         
-        idinfo = google.oauth2.id_token.verify_oauth2_token(
-            token, 
-            google.auth.transport.requests.Request(), 
-            os.getenv('GOOGLE_CLIENT_ID')
-        )
+        idinfo = _verify_google_token(token, os.getenv('GOOGLE_CLIENT_ID'))
         
         user_id = idinfo.get('sub')
         email = idinfo.get('email')
@@ -177,7 +181,7 @@ def google_auth():
             db.session.commit()
         
         print(f"[DEBUG] Creating access token for user: {user_id}")
-        access_token = create_access_token(identity=user_id)
+        access_token = issue_token(user)
         print(f"[DEBUG] Token created: {access_token[:50]}...")
         
         return jsonify(access_token=access_token), 200
@@ -194,19 +198,13 @@ def google_auth():
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
-    user_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_id).first()
+    user = current_user(profile=True)
     if user:
-        # Compute today's translation count
-        from datetime import datetime, timedelta
-        today = datetime.utcnow().date()
-        count_today = 0
+        # Today's translation count (usage counter row, cached per process)
         try:
-            count_today = Translation.query.filter(
-                Translation.user_id == user.id,
-                db.func.date(Translation.created_at) == today
-            ).count()
+            count_today = usage_counters.used_today(user.id)
         except Exception:
+            db.session.rollback()
             count_today = 0
 
         # Determine plan info (daily quota is used for current enforcement/UI)
@@ -222,7 +220,7 @@ def get_profile():
             'id': user.id,
             'email': user.email,
             'name': user.name,
-            'avatar_url': getattr(user, 'avatar_url', None),
+            'avatar_url': user.avatar_url,
             'plan': plan,
             'plan_name': plan_info['name'],
             'daily_quota': plan_info['daily_quota'],
@@ -258,6 +256,7 @@ def update_profile():
         user.avatar_url = avatar_url or None
 
     db.session.commit()
+    identity_cache.invalidate(user.google_id)
 
     return jsonify({
         'id': user.id,
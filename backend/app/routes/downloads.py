@@ -0,0 +1,75 @@
+import os
+import mimetypes
+from urllib.parse import quote
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+from werkzeug.utils import safe_join
+from app.services.download_service import download_links
+from app.services.result_cache import ResultCache
+
+downloads_bp = Blueprint('downloads', __name__)
+
+
+@downloads_bp.record_once
+def _init_download_links(state):
+    download_links.init_app(state.app)
+
+
+def _attachment(filename):
+    # RFC 6266: ASCII fallback plus UTF-8 name
+    ascii_name = filename.encode('ascii', 'ignore').decode() or 'download'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+@downloads_bp.route('/downloads/<path:filename>')
+def serve_download(filename):
+    """Serve a translated file (as attachment) from backend/downloads.
+
+    Requires a signed link from the job status (see DownloadLinks). Range requests,
+    ETag/If-None-Match and gzip variants saved next to the file (<name>.gz) are handled
+    here, or the transfer is handed to the front proxy with DOWNLOAD_OFFLOAD:
+    'x-accel' (nginx X-Accel-Redirect, see frontend/nginx.conf) or 'x-sendfile'.
+    """
+    cfg = current_app.config
+    if not download_links.verify(filename, request.args.get('expires'), request.args.get('sig')):
+        if not cfg.get('DOWNLOAD_ALLOW_UNSIGNED', False):
+            return jsonify({"error": "Download link is invalid or expired"}), 403
+
+    path = safe_join(download_links.folder, filename)
+    if not path or not os.path.isfile(path):
+        return jsonify({"error": "File not found"}), 404
+
+    # Downloads count as use for the result cache's LRU eviction
+    ResultCache.mark_used(path)
+    name = os.path.basename(path)
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    mode = (cfg.get('DOWNLOAD_OFFLOAD') or '').strip().lower()
+
+    if mode == 'x-accel':
+        # nginx serves the file from an internal location (Range, ETag and gzip_static included)
+        resp = Response(mimetype=mimetype)
+        prefix = cfg.get('DOWNLOAD_ACCEL_PREFIX', '/_protected_downloads/')
+        resp.headers['X-Accel-Redirect'] = prefix + quote(download_links.relative_path(path))
+        resp.headers['Content-Disposition'] = _attachment(name)
+        return resp
+
+    # Precompressed variant for clients that accept gzip
+    variant, encoding = path, None
+    if request.accept_encodings['gzip'] and os.path.isfile(path + '.gz'):
+        variant, encoding = path + '.gz', 'gzip'
+
+    if mode == 'x-sendfile':
+        resp = Response(mimetype=mimetype)
+        resp.headers['X-Sendfile'] = variant
+        resp.headers['Content-Disposition'] = _attachment(name)
+    else:
+        resp = send_file(
+            variant, mimetype=mimetype, as_attachment=True, download_name=name,
+            conditional=True, etag=True, max_age=int(cfg.get('DOWNLOAD_MAX_AGE', 3600)),
+        )
+        # Links are per user; keep the file out of shared caches
+        resp.cache_control.public = False
+        resp.cache_control.private = True
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    return resp
@@ -1,65 +1,74 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Translation, User
+from flask_jwt_extended import jwt_required
+from app.models import db
+from app.services.history_service import history_from_args, get_translation, translation_detail
+from app.services.search_service import search_index
+from app.services.rollup_service import usage_rollups
+from app.services.identity_service import current_user
 
 history_bp = Blueprint('history', __name__)
 
 @history_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_history():
-    user_google_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_google_id).first()
+    user = current_user()
     if not user:
-        return jsonify({'translations': [], 'total': 0, 'pages': 0, 'current_page': 1}), 200
+        return jsonify({'translations': [], 'has_more': False, 'next_cursor': None}), 200
 
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    filter_type = (request.args.get('type') or 'all').strip().lower()
-    date_str = (request.args.get('date') or '').strip()
+    try:
+        return jsonify(history_from_args(user.id, request.args)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    q = Translation.query.filter(Translation.user_id == user.id)
-    if filter_type == 'text':
-        q = q.filter(Translation.file_path.is_(None))
-    elif filter_type == 'document':
-        q = q.filter(Translation.file_path.isnot(None))
+@history_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_history():
+    """Full-text search: ?q=...&sort=relevance|recent&limit=20&cursor=<next_cursor>."""
+    user = current_user()
+    if not user:
+        return jsonify({'results': [], 'has_more': False, 'next_cursor': None}), 200
 
-    if date_str:
-        from datetime import datetime
-        try:
-            d = datetime.strptime(date_str, '%Y-%m-%d').date()
-            q = q.filter(db.func.date(Translation.created_at) == d)
-        except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    try:
+        page = search_index.search(
+            user.id, request.args.get('q', ''),
+            cursor=(request.args.get('cursor') or '').strip() or None,
+            limit=request.args.get('limit', 20, type=int),
+            sort=(request.args.get('sort') or 'relevance').strip().lower(),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page), 200
 
-    q = q.order_by(Translation.created_at.desc())
-    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
+@history_bp.route('/stats', methods=['GET'])
+@jwt_required()
+def history_stats():
+    """Usage totals from the daily rollups: ?days=30 (max 366)."""
+    user = current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify(usage_rollups.stats(user.id, request.args.get('days', 30, type=int))), 200
 
-    history = [{
-        'id': t.id,
-        'original_text': t.original_text,
-        'translated_text': t.translated_text,
-        'source_lang': t.source_lang,
-        'target_lang': t.target_lang,
-        'created_at': t.created_at.isoformat(),
-        'has_file': bool(t.file_path)
-    } for t in pagination.items]
+@history_bp.route('/<int:translation_id>', methods=['GET'])
+@jwt_required()
+def get_translation_detail(translation_id):
+    """Full texts of one record (list items only carry previews)."""
+    user = current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
 
-    return jsonify({
-        'translations': history,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': pagination.page
-    }), 200
+    translation = get_translation(user.id, translation_id)
+    if not translation:
+        return jsonify({"error": "Translation not found"}), 404
+    return jsonify(translation_detail(translation)), 200
 
 @history_bp.route('/<int:translation_id>', methods=['DELETE'])
 @jwt_required()
 def delete_translation(translation_id):
-    user_google_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_google_id).first()
+    user = current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    translation = Translation.query.filter_by(id=translation_id, user_id=user.id).first()
+    translation = get_translation(user.id, translation_id)
     if translation:
         db.session.delete(translation)
         db.session.commit()
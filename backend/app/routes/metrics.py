@@ -0,0 +1,45 @@
+import hmac
+import time
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from app.utils.metrics import REGISTRY, HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.record_once
+def _init_metrics(state):
+    REGISTRY.configure(state.app.config.get('METRICS_DIR'), state.app.config.get('METRICS_FLUSH_INTERVAL'))
+
+
+@metrics_bp.before_app_request
+def _request_started():
+    REGISTRY.start()
+    g._metrics_started = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+
+
+@metrics_bp.after_app_request
+def _request_finished(response):
+    started = g.get('_metrics_started')
+    if started is not None:
+        HTTP_REQUEST_SECONDS.labels(request.method, request.endpoint or 'unmatched', response.status_code) \
+            .observe(time.perf_counter() - started)
+    return response
+
+
+@metrics_bp.teardown_app_request
+def _request_closed(exc):
+    # Also runs when a view raised, so the in-flight gauge cannot drift
+    if g.pop('_metrics_started', None) is not None:
+        HTTP_IN_FLIGHT.dec()
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint; with METRICS_TOKEN set it requires `Authorization: Bearer <token>`."""
+    if not current_app.config.get('METRICS_ENABLED', True):
+        return jsonify({'error': 'Not found'}), 404
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(REGISTRY.collect(), content_type='text/plain; version=0.0.4; charset=utf-8')
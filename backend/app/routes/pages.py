@@ -0,0 +1,64 @@
+import os
+from flask import Blueprint, send_from_directory, jsonify
+
+# Đường dẫn tới thư mục frontend
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../frontend'))
+PAGES_DIR = os.path.join(FRONTEND_DIR, 'pages')
+
+pages_bp = Blueprint('pages', __name__)
+
+# Route cho trang chủ trả về home.html
+@pages_bp.route('/')
+def home():
+    return send_from_directory(PAGES_DIR, 'home.html')
+
+# Route cho trang đăng ký/đăng nhập
+@pages_bp.route('/auth')
+def auth_page():
+    return send_from_directory(PAGES_DIR, 'auth.html')
+
+# Route cho trang dashboard
+@pages_bp.route('/dashboard')
+def dashboard_page():
+    return send_from_directory(PAGES_DIR, 'dashboard.html')
+
+# Route cho trang about
+@pages_bp.route('/about')
+def about_page():
+    return send_from_directory(PAGES_DIR, 'about.html')
+
+# Route cho trang contact
+@pages_bp.route('/contact')
+def contact_page():
+    return send_from_directory(PAGES_DIR, 'contact.html')
+
+# Route cho trang profile
+@pages_bp.route('/profile')
+def profile_page():
+    return send_from_directory(PAGES_DIR, 'profile.html')
+
+# Route phục vụ các file tĩnh (css, js, images)
+@pages_bp.route('/css/<path:filename>')
+def serve_css(filename):
+    return send_from_directory(os.path.join(FRONTEND_DIR, 'css'), filename)
+
+@pages_bp.route('/js/<path:filename>')
+def serve_js(filename):
+    return send_from_directory(os.path.join(FRONTEND_DIR, 'js'), filename)
+
+# Route phục vụ trực tiếp các file HTML (để tương thích với links trong HTML)
+@pages_bp.route('/<filename>.html')
+def serve_html(filename):
+    if filename in ['home', 'auth', 'dashboard', 'about', 'contact', 'profile']:
+        return send_from_directory(PAGES_DIR, f'{filename}.html')
+    return jsonify({"error": "Page not found"}), 404
+
+# API cho leaderboard (placeholder)
+@pages_bp.route('/api/games/leaderboard')
+def game_leaderboard():
+    leaderboard = [
+        {"rank": 1, "username": "Player1", "score": 1000},
+        {"rank": 2, "username": "Player2", "score": 950},
+        {"rank": 3, "username": "Player3", "score": 900}
+    ]
+    return jsonify(leaderboard)
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Payment, User
+from app.services.identity_service import current_user, identity_cache, issue_token
 from app.services.payment_service import PaymentService
 
 payment_bp = Blueprint('payment', __name__)
@@ -13,8 +14,7 @@ def create_payment():
     amount = data.get('amount')
     currency = data.get('currency', 'VND')
     
-    user_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_id).first()
+    user = current_user()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -66,8 +66,11 @@ def dev_activate_plan():
 
     user.plan = plan
     db.session.commit()
+    identity_cache.invalidate(user.google_id)
 
     return jsonify({
         "plan": user.plan,
-        "plan_name": {"free": "Free", "pro": "Pro", "promax": "ProMax"}[plan]
+        "plan_name": {"free": "Free", "pro": "Pro", "promax": "ProMax"}[plan],
+        # Earlier tokens still carry the old plan claim
+        "access_token": issue_token(user),
     }), 200
\ No newline at end of file
@@ -1,16 +1,48 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, redirect
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Translation, User
+from app.models import db, Translation, translation_hash
 from app.services.translation_service import TranslationService
+from app.services.upload_service import UploadSessionStore, UploadError
+from app.services.download_service import download_links
+from app.services.usage_service import usage_counters, daily_quota
+from app.services.history_service import history_from_args
+from app.services.identity_service import current_user
+from app.services.history_writer import history_writer
+from app.utils.file_handler import allowed_file, save_upload_hashed
 from werkzeug.utils import secure_filename
 import os
+import json
+import time
+from datetime import datetime
+import zipfile
+from werkzeug.datastructures import FileStorage
 
 translation_bp = Blueprint('translation', __name__)
 translation_service = TranslationService()
 
+
+@translation_bp.record_once
+def _init_translation_service(state):
+    translation_service.init_app(state.app)
+    usage_counters.init_app(state.app)
+    history_writer.init_app(state.app)
+    upload_sessions.configure(
+        max_size=state.app.config.get('UPLOAD_MAX_SIZE'),
+        chunk_size=state.app.config.get('UPLOAD_CHUNK_SIZE'),
+        ttl_seconds=state.app.config.get('UPLOAD_SESSION_TTL'),
+    )
+
+    # Start the embedded job worker with the first request so that scripts importing
+    # the app (connect_db.py, worker.py) do not lease jobs by accident
+    @state.app.before_request
+    def _start_job_worker():
+        translation_service.start_worker()
+
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
+# Resumable chunked uploads for large documents
+upload_sessions = UploadSessionStore(os.path.join(UPLOAD_FOLDER, '.sessions'))
 
 @translation_bp.route('/text', methods=['POST'])
 @jwt_required(optional=True)
@@ -19,54 +51,159 @@ def translate_text():
     text = data.get('text')
     source_lang = data.get('source_lang', 'auto')
     target_lang = data.get('target_lang')
+    # Multi-target mode: target_langs ["vi", "fr"] (or "vi,fr") answered in one provider call
+    target_langs = data.get('target_langs') or []
+    if isinstance(target_langs, str):
+        target_langs = target_langs.split(',')
+    targets = list(dict.fromkeys(str(t).strip() for t in [target_lang] + list(target_langs) if t and str(t).strip()))
 
     if not text or not str(text).strip():
         return jsonify({"error": "No text provided"}), 400
-    if not target_lang or not str(target_lang).strip():
+    if not targets:
         return jsonify({"error": "target_lang is required"}), 400
+    target_lang = targets[0]
 
-    user_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_id).first() if user_id else None
+    user = current_user()
 
     # Enforce daily quota if user exists
     if user:
-        from datetime import datetime
-        today = datetime.utcnow().date()
-        try:
-            used_today = Translation.query.filter(
-                Translation.user_id == user.id,
-                db.func.date(Translation.created_at) == today
-            ).count()
-        except Exception:
-            used_today = 0
-        plan = (user.plan or 'free')
-        plan_quota = {'free': 170, 'pro': 4000, 'promax': 10000}.get(plan, 170)
-        if plan_quota > 0 and used_today >= plan_quota:
+        over, used_today, plan_quota = _over_quota(user, len(targets))
+        if over:
             return jsonify({"error": "Quota exceeded for today", "quota": plan_quota}), 402
 
     is_html = data.get('is_html', False)
 
     try:
         if is_html:
-            translated_text = translation_service.translate_html(text, source_lang, target_lang)
+            translations = {t: translation_service.translate_html(text, source_lang, t) for t in targets}
+        elif len(targets) > 1:
+            translations = translation_service.translate_text_multi(text, source_lang, targets)
         else:
-            translated_text = translation_service.translate_text(text, source_lang, target_lang)
+            translations = {target_lang: translation_service.translate_text(text, source_lang, target_lang)}
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except RuntimeError as e:
         return jsonify({"error": str(e)}), 503
 
-    translation = Translation(
-        user_id=user.id if user else None,
-        original_text=(text[:5000] + '...') if len(text) > 5000 else text,
-        translated_text=(translated_text[:5000] + '...') if len(translated_text) > 5000 else translated_text,
-        source_lang=source_lang,
-        target_lang=target_lang
-    )
-    db.session.add(translation)
+    _save_text_history(user, [_history_row(user, text, translated_text, source_lang, t) for t, translated_text in translations.items()])
+
+    body = {"translated_text": translations[target_lang], "is_html": bool(is_html)}
+    if len(targets) > 1:
+        body["translations"] = translations
+    return jsonify(body), 200
+
+def _history_row(user, text, translated_text, source_lang, target_lang):
+    return {
+        'user_id': user.id if user else None,
+        'original_text': (text[:5000] + '...') if len(text) > 5000 else text,
+        'translated_text': (translated_text[:5000] + '...') if len(translated_text) > 5000 else translated_text,
+        'source_lang': source_lang,
+        'target_lang': target_lang,
+        'created_at': datetime.utcnow(),
+    }
+
+
+def _save_text_history(user, rows):
+    """Store history rows of text translations and count them against the quota.
+
+    The usage counter is always updated in the request so quotas stay exact; the rows
+    themselves go through the write-behind queue when HISTORY_WRITE_BEHIND is on.
+    """
+    if user:
+        usage_counters.add(user.id, len(rows))
+    db.session.add_all([Translation(**row) for row in history_writer.submit(rows)])
     db.session.commit()
 
-    return jsonify({"translated_text": translated_text, "is_html": bool(is_html)}), 200
+
+def _daily_usage(user):
+    """(translations used today, daily quota of the user's plan)."""
+    try:
+        used_today = usage_counters.used_today(user.id)
+    except Exception:
+        db.session.rollback()
+        used_today = 0
+    return used_today, daily_quota(user.plan)
+
+
+def _over_quota(user, needed):
+    """(over quota, used today, quota) for `needed` more translations.
+
+    The plan comes from token claims or the identity cache and may predate an upgrade
+    made through another process, so a refusal is re-checked against the database.
+    """
+    used_today, plan_quota = _daily_usage(user)
+    if plan_quota > 0 and used_today + needed > plan_quota:
+        fresh = current_user(fresh=True)
+        if fresh and fresh.plan != user.plan:
+            used_today, plan_quota = _daily_usage(fresh)
+    return plan_quota > 0 and used_today + needed > plan_quota, used_today, plan_quota
+
+
+@translation_bp.route('/text/batch', methods=['POST'])
+@jwt_required(optional=True)
+def translate_text_batch():
+    """Translate many strings in one request.
+
+    Body: {"items": ["Save", ...] | [{"key": "btn.save", "text": "Save"}, ...] | {"btn.save": "Save"},
+           "source_lang": "auto", "target_lang": "vi" | "target_langs": ["vi", "fr"]}
+    Returns {"results": {key: {target: text}}, "errors": {key: {target: message}}}; plain
+    strings are their own key. One quota check and one history insert for the request.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    source_lang = data.get('source_lang', 'auto')
+    targets = data.get('target_langs') or ([data.get('target_lang')] if data.get('target_lang') else [])
+    if isinstance(targets, str):
+        targets = targets.split(',')
+    targets = list(dict.fromkeys(str(t).strip() for t in targets if t and str(t).strip()))
+
+    if isinstance(items, dict):
+        pairs = [(str(k), v) for k, v in items.items()]
+    elif isinstance(items, list):
+        pairs = [(str(i.get('key', i.get('text'))), i.get('text')) if isinstance(i, dict) else (str(i), i) for i in items]
+    else:
+        return jsonify({"error": "items must be a list or an object"}), 400
+    pairs = [(k, '' if v is None else str(v)) for k, v in pairs]
+    if not pairs:
+        return jsonify({"error": "No text provided"}), 400
+    if not targets:
+        return jsonify({"error": "target_lang is required"}), 400
+    cfg = current_app.config
+    max_items = int(cfg.get('BULK_TEXT_MAX_ITEMS', 10000))
+    if len(pairs) * len(targets) > max_items:
+        return jsonify({"error": f"At most {max_items} strings x targets per request"}), 413
+
+    user = current_user()
+    texts = [text for _, text in pairs]
+    needed = sum(1 for t in texts if t.strip()) * len(targets)
+    if user:
+        over, used_today, plan_quota = _over_quota(user, needed)
+        if over:
+            return jsonify({
+                "error": "Quota exceeded for today", "quota": plan_quota,
+                "remaining": max(0, plan_quota - used_today), "requested": needed,
+            }), 402
+
+    results, errors, rows = {}, {}, []
+    for target in targets:
+        try:
+            outs = translation_service.translate_many(texts, source_lang, target)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 503
+        for (key, text), (out, error) in zip(pairs, outs):
+            if out is None:
+                errors.setdefault(key, {})[target] = error
+                continue
+            results.setdefault(key, {})[target] = out
+            if text.strip():
+                rows.append(_history_row(user, text, out, source_lang, target))
+    # One round-trip for the whole request instead of one commit per string
+    _save_text_history(user, rows)
+
+    return jsonify({"results": results, "errors": errors, "count": len(rows)}), 200
+
 
 @translation_bp.route('/document', methods=['POST'])
 @jwt_required(optional=True)
@@ -76,19 +213,41 @@ def translate_document():
     
     file = request.files['file']
     target_lang = request.form.get('target_lang')
+    # Revision mode: reuse unchanged segments from an earlier upload of the same document
+    base_job_id = (request.form.get('base_job_id') or '').strip() or None
+    incremental = str(request.form.get('incremental', 'true')).strip().lower() not in ('0', 'false', 'no', 'off')
 
     if not target_lang or not str(target_lang).strip():
         return jsonify({"error": "target_lang is required"}), 400
     
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
+
+    user_id = get_jwt_identity()
+    error = _check_base_job(base_job_id, target_lang, user_id)
+    if error:
+        return error
     
     filename = secure_filename(file.filename)
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    
-    user_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_id).first() if user_id else None
+    # Hash while writing so the result cache can answer repeat uploads without re-reading the file
+    filepath, file_hash = save_upload_hashed(file, UPLOAD_FOLDER)
+    return _queue_document(filepath, filename, file_hash, target_lang, base_job_id, incremental, user_id)
+
+
+def _check_base_job(base_job_id, target_lang, user_id):
+    """Error response if base_job_id cannot serve as the revision base, else None."""
+    if not base_job_id:
+        return None
+    base = translation_service.revisions.load(base_job_id)
+    if not base or base.get('user_id') != user_id:
+        return jsonify({"error": "Base job not found"}), 404
+    if str(base.get('target_lang') or '').strip().lower() != str(target_lang).strip().lower():
+        return jsonify({"error": "Base job was translated to a different target_lang"}), 400
+    return None
+
+
+def _queue_document(filepath, filename, file_hash, target_lang, base_job_id, incremental, user_id):
+    user = current_user() if user_id else None
 
     # Create DB record indicating processing started
     translation = Translation(
@@ -100,24 +259,33 @@ def translate_document():
         file_path=filepath
     )
     db.session.add(translation)
+    if user:
+        usage_counters.add(user.id)
     db.session.commit()
 
     # Start background job
-    job_id = translation_service.translate_document_background(filepath, target_lang, user_id=user_id)
-
-    return jsonify({"job_id": job_id, "status_url": f"/api/translation/document/status/{job_id}"}), 202
+    job_id = translation_service.translate_document_background(
+        filepath, target_lang, user_id=user_id, base_job_id=base_job_id, incremental=incremental,
+        plan=user.plan if user else None, file_hash=file_hash,
+    )
 
-@translation_bp.route('/document/status/<job_id>', methods=['GET'])
-@jwt_required(optional=True)
-def document_status(job_id):
-    job = translation_service.get_job(job_id)
-    if not job:
-        return jsonify({"error": "Job not found"}), 404
-    # When completed, include download_url
-    download_url = None
-    if job.get('status') == 'completed' and job.get('download_path'):
-        download_url = f"/downloads/{os.path.basename(job.get('download_path'))}"
     return jsonify({
+        "job_id": job_id,
+        "status_url": f"/api/translation/document/status/{job_id}",
+        "events_url": f"/api/translation/document/events/{job_id}",
+    }), 202
+
+
+def _download_url(job):
+    """Short-lived signed link to a completed job's output, None once the result cache evicted it."""
+    if job.get('status') == 'completed' and job.get('download_path') and os.path.isfile(job['download_path']):
+        return download_links.url_for(job['download_path'])
+    return None
+
+
+def _job_payload(job_id, job):
+    download_url = _download_url(job)
+    return {
         'job_id': job_id,
         'status': job.get('status'),
         'progress': job.get('progress'),
@@ -125,10 +293,370 @@ def document_status(job_id):
         'download_url': download_url,
         'error': job.get('error'),
         'fallback': job.get('fallback', False),
-        'fallback_reason': job.get('fallback_reason')
+        'fallback_reason': job.get('fallback_reason'),
+        'base_job_id': job.get('base_job_id'),
+        'segments_reused': job.get('segments_reused', 0),
+        'segments_translated': job.get('segments_translated', 0),
+        'queue_position': translation_service.job_store.queue_position(job),
+        'eta_seconds': job.get('eta_seconds')
+    }
+
+@translation_bp.route('/document/status/<job_id>', methods=['GET'])
+@jwt_required(optional=True)
+def document_status(job_id):
+    job = translation_service.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_job_payload(job_id, job)), 200
+
+
+@translation_bp.route('/document/events/<job_id>', methods=['GET'])
+@jwt_required(optional=True)
+def document_events(job_id):
+    """Server-Sent Events stream of job progress (status polling remains as fallback).
+
+    One event per change, coalesced to at most one every JOB_EVENTS_MIN_INTERVAL seconds
+    so fast jobs don't flood clients; the final state is always sent as a 'done' event.
+    Workers in this process wake the stream immediately; jobs running elsewhere are
+    picked up by re-reading the store every JOB_EVENTS_POLL_INTERVAL seconds.
+
+    An open stream holds one request thread (gunicorn gthread: GUNICORN_THREADS per
+    worker) for up to JOB_EVENTS_MAX_DURATION seconds, after which it ends and the
+    browser reconnects after the `retry` delay. Size WEB_CONCURRENCY x GUNICORN_THREADS
+    for the concurrent streams expected on top of regular requests.
+    """
+    job = translation_service.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    cfg = current_app.config
+    min_interval = float(cfg.get('JOB_EVENTS_MIN_INTERVAL', 0.5))
+    poll_interval = float(cfg.get('JOB_EVENTS_POLL_INTERVAL', 2.0))
+    keepalive = float(cfg.get('JOB_EVENTS_KEEPALIVE', 15.0))
+    max_duration = float(cfg.get('JOB_EVENTS_MAX_DURATION', 600.0))
+    store = translation_service.job_store
+
+    def _stream(job):
+        started = time.monotonic()
+        last_sent = started - min_interval  # first state goes out immediately
+        last_payload = None
+        seen = store.version(job_id)
+        yield 'retry: 3000\n\n'
+        while True:
+            payload = _job_payload(job_id, job)
+            final = payload['status'] in ('completed', 'failed', 'cancelled')
+            if final:
+                yield f"event: done\ndata: {json.dumps(payload)}\n\n"
+                return
+            now = time.monotonic()
+            if payload != last_payload:
+                wait = min_interval - (now - last_sent)
+                if wait > 0:
+                    # Coalesce: let more updates accumulate, then send the latest state
+                    time.sleep(wait)
+                    job = translation_service.get_job(job_id) or job
+                    continue
+                yield f"event: progress\ndata: {json.dumps(payload)}\n\n"
+                last_payload, last_sent = payload, time.monotonic()
+            elif now - last_sent >= keepalive:
+                yield ': keepalive\n\n'
+                last_sent = now
+            if now - started >= max_duration:
+                # Bounds how long a request thread is held; the client's EventSource
+                # reconnects after `retry` (dashboard.js keeps it instead of polling)
+                return
+            store.wait_for_change(job_id, seen, poll_interval)
+            seen = store.version(job_id)
+            job = translation_service.get_job(job_id) or job
+
+    return Response(_stream(job), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def _batch_uploads(files, max_files, max_bytes):
+    """Save the files of a batch request, expanding zip archives. Returns [(path, sha256, name)].
+
+    max_bytes bounds the total size of the documents, zip members and plain files alike.
+    On error the files saved so far are removed.
+    """
+    saved = []
+    total = 0
+    limit = f"Batch is limited to {max_files} files and {max_bytes} bytes"
+    try:
+        for file in files:
+            if file.filename.lower().endswith('.zip'):
+                with zipfile.ZipFile(file.stream) as zf:
+                    for info in zf.infolist():
+                        name = os.path.basename(info.filename)
+                        # Skip folders, macOS metadata and unsupported entries
+                        if info.is_dir() or not name or name.startswith('.') or '__MACOSX' in info.filename:
+                            continue
+                        if not allowed_file(name):
+                            continue
+                        total += info.file_size
+                        if len(saved) >= max_files or total > max_bytes:
+                            raise ValueError(limit)
+                        with zf.open(info) as stream:
+                            path, file_hash = save_upload_hashed(FileStorage(stream=stream, filename=name), UPLOAD_FOLDER)
+                        saved.append((path, file_hash, secure_filename(name)))
+            elif allowed_file(file.filename):
+                # Multipart parts rarely carry a length: reject early when they do, count the saved size
+                if len(saved) >= max_files or total + (file.content_length or 0) > max_bytes:
+                    raise ValueError(limit)
+                path, file_hash = save_upload_hashed(file, UPLOAD_FOLDER)
+                saved.append((path, file_hash, secure_filename(file.filename)))
+                total += os.path.getsize(path)
+                if total > max_bytes:
+                    raise ValueError(limit)
+    except Exception:
+        for path, _, _ in saved:
+            if os.path.exists(path):
+                os.remove(path)
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+        raise
+    return saved
+
+
+@translation_bp.route('/batch', methods=['POST'])
+@jwt_required(optional=True)
+def translate_batch():
+    """Translate several documents (files[] and/or .zip archives) into several languages.
+
+    target_langs: comma separated or repeated. Creates one job per (file, target) under a
+    batch id; GET status_url shows aggregate progress and, once done, a zip bundle.
+    """
+    files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f and f.filename]
+    targets = []
+    for value in request.form.getlist('target_langs') + request.form.getlist('target_lang'):
+        targets.extend(t.strip() for t in str(value).split(',') if t.strip())
+    targets = list(dict.fromkeys(targets))
+    if not files:
+        return jsonify({"error": "No file provided"}), 400
+    if not targets:
+        return jsonify({"error": "target_langs is required"}), 400
+    cfg = current_app.config
+    max_targets = int(cfg.get('BATCH_MAX_TARGETS', 10))
+    if len(targets) > max_targets:
+        return jsonify({"error": f"At most {max_targets} target languages per batch"}), 400
+
+    try:
+        saved = _batch_uploads(files, int(cfg.get('BATCH_MAX_FILES', 50)), int(cfg.get('UPLOAD_MAX_SIZE', 500 * 1024 * 1024)))
+    except zipfile.BadZipFile:
+        return jsonify({"error": "Invalid zip archive"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    if not saved:
+        return jsonify({"error": "No supported documents in the batch"}), 400
+
+    user_id = get_jwt_identity()
+    user = current_user()
+    # One history record per document and target, as for single uploads
+    db.session.add_all([
+        Translation(
+            user_id=user.id if user else None,
+            original_text=f"File: {name}",
+            translated_text="Processing file...",
+            source_lang='auto',
+            target_lang=target,
+            file_path=path,
+        )
+        for path, _, name in saved for target in targets
+    ])
+    if user:
+        usage_counters.add(user.id, len(saved) * len(targets))
+    db.session.commit()
+
+    batch_id, jobs = translation_service.translate_batch_background(
+        [(path, file_hash) for path, file_hash, _ in saved], targets, user_id=user_id,
+        plan=user.plan if user else None,
+    )
+    return jsonify({
+        "batch_id": batch_id,
+        "jobs": [{"job_id": j['job_id'], "filename": os.path.basename(j['file_path']), "target_lang": j['target_lang']} for j in jobs],
+        "status_url": f"/api/translation/batch/{batch_id}",
+    }), 202
+
+
+def _batch_jobs(batch_id):
+    """Jobs of a batch visible to the caller, or None."""
+    jobs = translation_service.get_batch(batch_id)
+    if not jobs or (jobs[0].get('user_id') and jobs[0].get('user_id') != get_jwt_identity()):
+        return None
+    return jobs
+
+
+@translation_bp.route('/batch/<batch_id>', methods=['GET'])
+@jwt_required(optional=True)
+def batch_status(batch_id):
+    """Aggregate progress of a batch: one poll instead of one per (file, target)."""
+    jobs = _batch_jobs(batch_id)
+    if jobs is None:
+        return jsonify({"error": "Batch not found"}), 404
+    counts = {}
+    for job in jobs:
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+    active = sum(counts.get(s, 0) for s in ('pending', 'in_progress', 'cancelling'))
+    if active:
+        status = 'in_progress'
+    elif counts.get('completed', 0) == len(jobs):
+        status = 'completed'
+    elif counts.get('completed'):
+        status = 'partial'
+    else:
+        status = 'failed' if counts.get('failed') else 'cancelled'
+    etas = [j['eta_seconds'] for j in jobs if j['status'] in ('pending', 'in_progress') and j.get('eta_seconds') is not None]
+    return jsonify({
+        'batch_id': batch_id,
+        'status': status,
+        'progress': int(sum(j['progress'] or 0 for j in jobs) / len(jobs)),
+        'total': len(jobs),
+        'counts': counts,
+        'eta_seconds': max(etas) if etas else None,
+        'jobs': [{
+            'job_id': j['id'],
+            'filename': os.path.basename(j['file_path']),
+            'target_lang': j['target_lang'],
+            'status': j['status'],
+            'progress': j['progress'],
+            'download_url': _download_url(j),
+            'error': j.get('error'),
+        } for j in jobs],
+        'bundle_url': f"/api/translation/batch/{batch_id}/bundle" if not active and counts.get('completed') else None,
     }), 200
 
 
+@translation_bp.route('/batch/<batch_id>/bundle', methods=['GET'])
+@jwt_required(optional=True)
+def batch_bundle(batch_id):
+    """Zip of all finished outputs of the batch; redirects to a signed download link."""
+    jobs = _batch_jobs(batch_id)
+    if jobs is None:
+        return jsonify({"error": "Batch not found"}), 404
+    if any(j['status'] in ('pending', 'in_progress', 'cancelling') for j in jobs):
+        return jsonify({"error": "Batch is still running"}), 409
+    if not any(j['status'] == 'completed' for j in jobs):
+        return jsonify({"error": "Batch has no completed documents"}), 409
+    bundle = translation_service.build_batch_bundle(batch_id, jobs)
+    return redirect(download_links.url_for(bundle), code=302)
+
+
+@translation_bp.route('/batch/<batch_id>', methods=['DELETE'])
+@jwt_required(optional=True)
+def cancel_batch(batch_id):
+    jobs = _batch_jobs(batch_id)
+    if jobs is None:
+        return jsonify({"error": "Batch not found"}), 404
+    cancelled = [j['id'] for j in jobs if translation_service.cancel_job(j['id'])]
+    return jsonify({"batch_id": batch_id, "cancelled": len(cancelled)}), 202
+
+
+def _upload_error(e):
+    body = {"error": str(e)}
+    if e.offset is not None:
+        body["offset"] = e.offset
+    return jsonify(body), e.status
+
+
+def _upload_payload(session):
+    return {
+        'upload_id': session['upload_id'],
+        'filename': session['filename'],
+        'size': session['size'],
+        'offset': session['offset'],
+        'chunk_size': upload_sessions.chunk_size,
+        'upload_url': f"/api/translation/document/uploads/{session['upload_id']}",
+    }
+
+
+@translation_bp.route('/document/uploads', methods=['POST'])
+@jwt_required(optional=True)
+def create_upload():
+    """Start a resumable upload: {filename, size}. Chunks are then PUT to upload_url."""
+    data = request.get_json(silent=True) or {}
+    try:
+        session = upload_sessions.create(get_jwt_identity(), data.get('filename'), data.get('size'))
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify(_upload_payload(session)), 201
+
+
+@translation_bp.route('/document/uploads/<upload_id>', methods=['GET'])
+@jwt_required(optional=True)
+def upload_status(upload_id):
+    """Current offset, to resume after a dropped connection."""
+    try:
+        session = upload_sessions.get(upload_id, get_jwt_identity())
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify(_upload_payload(session)), 200
+
+
+@translation_bp.route('/document/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+@jwt_required(optional=True)
+def upload_chunk(upload_id):
+    """Append the raw request body at the Upload-Offset header.
+
+    X-Chunk-SHA256 (hex) is verified before the chunk is stored. A 409 response carries
+    the offset the server actually has, so the client can continue from there.
+    """
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({"error": "Upload-Offset header is required"}), 400
+    data = request.get_data(cache=False)
+    if not data:
+        return jsonify({"error": "Empty chunk"}), 400
+    try:
+        new_offset = upload_sessions.append(
+            upload_id, get_jwt_identity(), offset, data, checksum=request.headers.get('X-Chunk-SHA256'),
+        )
+    except UploadError as e:
+        return _upload_error(e)
+    return jsonify({"upload_id": upload_id, "offset": new_offset}), 200
+
+
+@translation_bp.route('/document/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required(optional=True)
+def complete_upload(upload_id):
+    """Finish a chunked upload and queue the translation job (same fields as /document)."""
+    data = request.get_json(silent=True) or request.form
+    target_lang = data.get('target_lang')
+    base_job_id = (data.get('base_job_id') or '').strip() or None
+    incremental = str(data.get('incremental', 'true')).strip().lower() not in ('0', 'false', 'no', 'off')
+    if not target_lang or not str(target_lang).strip():
+        return jsonify({"error": "target_lang is required"}), 400
+
+    user_id = get_jwt_identity()
+    error = _check_base_job(base_job_id, target_lang, user_id)
+    if error:
+        return error
+    try:
+        session, filepath, file_hash = upload_sessions.complete(
+            upload_id, user_id, UPLOAD_FOLDER, sha256=data.get('sha256'),
+        )
+    except UploadError as e:
+        return _upload_error(e)
+    return _queue_document(filepath, session['filename'], file_hash, target_lang, base_job_id, incremental, user_id)
+
+
+@translation_bp.route('/document/<job_id>', methods=['DELETE'])
+@translation_bp.route('/document/<job_id>/cancel', methods=['POST'])
+@jwt_required(optional=True)
+def cancel_document(job_id):
+    job = translation_service.get_job(job_id)
+    # Jobs started by a signed-in user can only be cancelled by that user
+    if not job or (job.get('user_id') and job.get('user_id') != get_jwt_identity()):
+        return jsonify({"error": "Job not found"}), 404
+    status = translation_service.cancel_job(job_id)
+    if not status:
+        return jsonify({"error": "Job already finished", "status": job.get('status')}), 409
+    return jsonify({"job_id": job_id, "status": status}), 202
+
+
 @translation_bp.route('/save', methods=['POST'])
 @jwt_required()
 def save_translation():
@@ -150,33 +678,33 @@ def save_translation():
     if not target_lang or not str(target_lang).strip():
         return jsonify({'error': 'target_lang is required'}), 400
 
-    user_google_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_google_id).first()
+    user = current_user()
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    # Best-effort idempotency: if the same record was saved very recently, reuse it.
-    from datetime import datetime, timedelta
+    row = _history_row(user, str(original_text), str(translated_text), source_lang, str(target_lang).strip())
+    content_hash = translation_hash(
+        user.id, row['source_lang'], row['target_lang'], row['original_text'], row['translated_text'],
+    )
+
+    # Best-effort idempotency: if the same record was saved very recently (by /text or an
+    # earlier save), reuse it. One lookup on ix_translation_user_hash, after a check of the
+    # rows /text queued for write-behind, which are not in the table yet.
+    if history_writer.is_pending(content_hash):
+        return jsonify({'message': 'already_saved', 'id': None}), 200
+    from datetime import timedelta
     window_start = datetime.utcnow() - timedelta(minutes=2)
     existing = Translation.query.filter(
         Translation.user_id == user.id,
-        Translation.source_lang == source_lang,
-        Translation.target_lang == target_lang,
+        Translation.content_hash == content_hash,
         Translation.created_at >= window_start,
-        Translation.original_text == original_text,
-        Translation.translated_text == translated_text,
     ).order_by(Translation.created_at.desc()).first()
     if existing:
         return jsonify({'message': 'already_saved', 'id': existing.id}), 200
 
-    translation = Translation(
-        user_id=user.id,
-        original_text=(str(original_text)[:5000] + '...') if len(str(original_text)) > 5000 else str(original_text),
-        translated_text=(str(translated_text)[:5000] + '...') if len(str(translated_text)) > 5000 else str(translated_text),
-        source_lang=source_lang,
-        target_lang=str(target_lang).strip(),
-    )
+    translation = Translation(**row)
     db.session.add(translation)
+    usage_counters.add(user.id)
     db.session.commit()
     return jsonify({'message': 'saved', 'id': translation.id}), 201
 
@@ -184,49 +712,12 @@ def save_translation():
 @translation_bp.route('/history', methods=['GET'])
 @jwt_required(optional=True)
 def get_history():
-    user_google_id = get_jwt_identity()
-    user = User.query.filter_by(google_id=user_google_id).first() if user_google_id else None
+    """Same listing as /api/history/ (keyset pages: ?cursor=<next_cursor>&limit=10&type=&date=)."""
+    user = current_user()
     if not user:
-        return jsonify({'translations': [], 'total': 0, 'pages': 0, 'current_page': 1}), 200
+        return jsonify({'translations': [], 'has_more': False, 'next_cursor': None}), 200
 
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    filter_type = (request.args.get('type') or 'all').strip().lower()
-    date_str = (request.args.get('date') or '').strip()
-
-    q = Translation.query.filter(Translation.user_id == user.id)
-
-    # Filter by type (text/document)
-    if filter_type == 'text':
-        q = q.filter(Translation.file_path.is_(None))
-    elif filter_type == 'document':
-        q = q.filter(Translation.file_path.isnot(None))
-
-    # Optional date filter: YYYY-MM-DD (UTC date)
-    if date_str:
-        from datetime import datetime
-        try:
-            d = datetime.strptime(date_str, '%Y-%m-%d').date()
-            q = q.filter(db.func.date(Translation.created_at) == d)
-        except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-
-    q = q.order_by(Translation.created_at.desc())
-    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
-
-    history = [{
-        'id': t.id,
-        'original_text': t.original_text,
-        'translated_text': t.translated_text,
-        'source_lang': t.source_lang,
-        'target_lang': t.target_lang,
-        'created_at': t.created_at.isoformat(),
-        'has_file': bool(t.file_path)
-    } for t in pagination.items]
-
-    return jsonify({
-        'translations': history,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': pagination.page,
-    }), 200
\ No newline at end of file
+    try:
+        return jsonify(history_from_args(user.id, request.args)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
\ No newline at end of file
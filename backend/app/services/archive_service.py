@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, select
+from app.models import db, Translation, TranslationArchive
+
+
+def archive_history(older_than_days, batch_size=1000, max_batches=None):
+    """Move history rows older than older_than_days into translation_archive.
+
+    Rows are copied with INSERT ... SELECT (stored bytes as they are, ids kept) and
+    deleted from translation in the same transaction, batch_size rows per transaction,
+    so the live table and its indexes stay small. History reads (list, detail, search)
+    fall through to the archive. Returns the number of rows moved.
+    """
+    if not older_than_days or older_than_days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    live, archive = Translation.__table__, TranslationArchive.__table__
+    columns = ['id', 'user_id', 'original_text', 'translated_text', 'source_lang', 'target_lang',
+               'file_path', 'content_hash', 'original_preview', 'translated_preview', 'created_at']
+    moved, batches, last_id = 0, 0, 0
+    while max_batches is None or batches < max_batches:
+        with db.engine.begin() as conn:
+            # Ids grow with created_at: walk the primary key from the oldest row and stop at
+            # the first row inside the retention window instead of scanning the whole table
+            rows = conn.execute(
+                select(live.c.id, live.c.created_at).where(live.c.id > last_id).order_by(live.c.id).limit(batch_size)
+            ).fetchall()
+            ids = [r.id for r in rows if r.created_at is not None and r.created_at < cutoff]
+            done = len(rows) < batch_size or len(ids) < len(rows)
+            if not ids:
+                break
+            last_id = rows[-1].id
+            conn.execute(insert(archive).from_select(
+                columns + ['archived_at'],
+                select(*[live.c[name] for name in columns], literal(datetime.utcnow(), archive.c.archived_at.type))
+                .where(live.c.id.in_(ids)),
+            ))
+            conn.execute(delete(live).where(live.c.id.in_(ids)))
+        moved += len(ids)
+        batches += 1
+        if done:
+            break
+    return moved
@@ -0,0 +1,410 @@
+"""CPU-bound document stages: parse a file into a compact segment list, rebuild it from translations.
+
+Functions here are module-level and only take/return plain data (paths, lists of strings)
+so FileService can run them in a process pool, away from the GIL of the API process.
+The translate stage in between is network-bound and stays on the thread/scheduler tier.
+
+The rebuild of a format walks the document in exactly the same order as its parse, so
+translations[i] always belongs to segments[i]. A translation of None means the segment
+failed; each format applies its own fallback (original text or blank).
+"""
+import io
+import os
+import re
+import json
+import codecs
+import unicodedata
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.xlsx', '.txt')
+TXT_MAX_CHARS = 3000
+
+
+def document_format(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError("Unsupported file type")
+    return ext
+
+
+def sanitize_text(text):
+    if not isinstance(text, str):
+        try:
+            text = str(text)
+        except Exception:
+            return ''
+    # Normalize unicode and remove control characters that break XML/docx
+    text = unicodedata.normalize('NFC', text)
+    # Remove C0 control characters except tab/newline/carriage return
+    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F]', '', text)
+    # Collapse weird zero-width/formatting if any
+    text = re.sub(r'[\u200B-\u200F\u2028\u2029]', ' ', text)
+    return text
+
+
+def output_path_for(file_path, download_folder, ext):
+    # Ensure output filename has the expected extension
+    output_filename = f"translated_{os.path.basename(file_path)}"
+    if not output_filename.lower().endswith(ext):
+        output_filename += ext
+    return os.path.join(download_folder, output_filename)
+
+
+def sniff_format(ext, head):
+    """Check the first bytes of an upload against its extension (True if plausible)."""
+    if ext == '.pdf':
+        return b'%PDF-' in head[:1024]
+    if ext in ('.docx', '.xlsx'):
+        # Office Open XML documents are zip archives
+        return head.startswith(b'PK\x03\x04')
+    if ext == '.txt':
+        return b'\x00' not in head
+    return False
+
+
+def extract_segments(file_path):
+    """Parse stage. Returns {'format': ext, 'segments': [str], 'meta': {...}}."""
+    ext = document_format(file_path)
+    if ext == '.pdf':
+        segments, meta = _extract_pdf(file_path)
+    elif ext == '.docx':
+        segments, meta = _extract_docx(file_path)
+    elif ext == '.xlsx':
+        segments, meta = _extract_xlsx(file_path)
+    else:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            segments, meta = split_text(f.read()), {}
+    return {'format': ext, 'segments': segments, 'meta': meta}
+
+
+def rebuild_document(file_path, parsed, translations, download_folder):
+    """Rebuild stage. Returns the path of the written output (may be a .txt fallback)."""
+    ext = parsed['format']
+    if ext == '.pdf':
+        return _rebuild_pdf(file_path, translations, download_folder)
+    if ext == '.docx':
+        return _rebuild_docx(file_path, translations, download_folder)
+    if ext == '.xlsx':
+        return _rebuild_xlsx(file_path, parsed['meta'], translations, download_folder)
+    return _rebuild_txt(file_path, translations, download_folder)
+
+
+# --- TXT -------------------------------------------------------------------
+
+def split_text(text, max_chars=TXT_MAX_CHARS):
+    """Split into paragraphs then chunk long paragraphs to avoid provider length limits."""
+    paras = [p.strip() for p in re.split(r'\n{2,}', text) if p.strip()]
+    chunks = []
+    for p in paras:
+        if len(p) <= max_chars:
+            chunks.append(p)
+        else:
+            parts = re.split(r'(?<=[.!?])\s+', p)
+            cur = ''
+            for part in parts:
+                if len(cur) + len(part) + 1 <= max_chars:
+                    cur = (cur + ' ' + part).strip() if cur else part
+                else:
+                    if cur:
+                        chunks.append(cur)
+                    cur = part
+            if cur:
+                # If still too long, slice it
+                while len(cur) > max_chars:
+                    chunks.append(cur[:max_chars])
+                    cur = cur[max_chars:]
+                if cur:
+                    chunks.append(cur)
+    return chunks
+
+
+class TextSegmenter:
+    """Incremental split_text() for TXT uploads arriving in chunks.
+
+    feed() decodes bytes as they come in and splits off every paragraph that is already
+    complete, so extraction is done when the last chunk arrives. close() returns exactly
+    what split_text() returns for the whole file read in text mode.
+    Raises UnicodeDecodeError as soon as the input stops being UTF-8.
+    """
+
+    _BREAK_RE = re.compile(r'\n{2,}')
+
+    def __init__(self):
+        # Same newline translation as open(..., 'r')
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+        self._tail = ''
+        self.segments = []
+
+    def feed(self, data):
+        self._tail += self._decoder.decode(data)
+        # Cut at the last paragraph break that is followed by text: everything before it is final
+        cut = None
+        for m in self._BREAK_RE.finditer(self._tail):
+            if m.end() < len(self._tail):
+                cut = m
+        if cut is not None:
+            self.segments.extend(split_text(self._tail[:cut.start()]))
+            self._tail = self._tail[cut.end():]
+
+    def close(self):
+        self._tail += self._decoder.decode(b'', final=True)
+        self.segments.extend(split_text(self._tail))
+        self._tail = ''
+        return self.segments
+
+
+def parsed_path(file_path):
+    return file_path + '.parsed.json'
+
+
+def save_parsed(file_path, parsed):
+    """Store a parse result next to the file so other jobs on the same upload (other
+    target languages, retries) skip the parse stage."""
+    path = parsed_path(file_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'size': os.path.getsize(file_path), 'parsed': parsed}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_parsed(file_path):
+    """Parse result saved by save_parsed(), or None if absent or stale."""
+    try:
+        with open(parsed_path(file_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('size') != os.path.getsize(file_path):
+            return None
+    except (OSError, ValueError):
+        return None
+    return data.get('parsed')
+
+
+def _rebuild_txt(file_path, translations, download_folder):
+    translated_text = '\n\n'.join(t if t is not None else '' for t in translations)
+    output_path = output_path_for(file_path, download_folder, '.txt')
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(translated_text)
+    return output_path
+
+
+# --- PDF -------------------------------------------------------------------
+
+def _extract_pdf(file_path):
+    import PyPDF2
+
+    text = ""
+    page_texts = []
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        for page in pdf_reader.pages:
+            page_text = page.extract_text()
+            page_texts.append(page_text)
+            text += page_text + "\n"
+    pages = text.split('\f') if '\f' in text else text.split('\n\f') if '\n\f' in text else text.split('\n\n')
+    # No paragraph breaks found: fall back to one segment per page so that an edit on
+    # one page of a revised document does not force re-translating the whole file
+    if len(pages) <= 1 and len(page_texts) > 1:
+        pages = page_texts
+    return pages, {'pages': len(page_texts)}
+
+
+def _rebuild_pdf(file_path, translations, download_folder):
+    translated_text = '\n\n'.join(t if t is not None else '' for t in translations)
+    # fpdf is optional; if missing we fallback to text output for PDFs
+    try:
+        from fpdf import FPDF
+    except Exception:
+        FPDF = None
+
+    if FPDF is None:
+        # Fallback: save plain text and include a note
+        output_path = output_path_for(file_path, download_folder, '.txt')
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write("NOTE: PDF rebuild not available on this system. Install 'fpdf' to get translated PDF output.\n\n")
+            f.write(translated_text)
+        return output_path
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    # Split text into lines to fit page
+    lines = translated_text.split('\n')
+    for line in lines:
+        # Handle long lines
+        while len(line) > 0:
+            if pdf.get_string_width(line) < 180:  # Approximate page width
+                pdf.cell(0, 10, txt=line, ln=True)
+                break
+            else:
+                # Find a good break point
+                words = line.split()
+                current_line = ""
+                for word in words:
+                    if pdf.get_string_width(current_line + " " + word) < 180:
+                        current_line += " " + word if current_line else word
+                    else:
+                        pdf.cell(0, 10, txt=current_line, ln=True)
+                        current_line = word
+                if current_line:
+                    pdf.cell(0, 10, txt=current_line, ln=True)
+                line = ""
+
+    output_path = output_path_for(file_path, download_folder, '.pdf')
+    pdf.output(output_path)
+    return output_path
+
+
+# --- DOCX ------------------------------------------------------------------
+
+def _docx_paragraphs(doc):
+    """Every translatable paragraph in a fixed order: body, table cells, headers, footers."""
+    paragraphs = list(doc.paragraphs)
+    # Tables: cell-by-cell; merged cells are returned once per grid slot, visit them once
+    seen_cells = set()
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if cell._tc in seen_cells:
+                    continue
+                seen_cells.add(cell._tc)
+                paragraphs.extend(cell.paragraphs)
+    # Headers and footers
+    try:
+        for section in doc.sections:
+            paragraphs.extend(section.header.paragraphs)
+            paragraphs.extend(section.footer.paragraphs)
+    except Exception:
+        # ignore headers/footers issues
+        pass
+    return [p for p in paragraphs if p.runs and "".join(r.text or "" for r in p.runs).strip()]
+
+
+def _extract_docx(file_path):
+    import docx
+
+    doc = docx.Document(file_path)
+    segments = ["".join(r.text or "" for r in p.runs) for p in _docx_paragraphs(doc)]
+    return segments, {}
+
+
+def distribute_text_to_runs(translated, runs_texts):
+    """
+    Heuristic: keep the same run count/styles by distributing the translated
+    paragraph text back into existing runs proportionally by original run length.
+    """
+    if translated is None:
+        translated = ""
+    translated = str(translated)
+
+    # Only consider runs that had some text (including whitespace) for distribution
+    lengths = [len(t) for t in runs_texts]
+    total = sum(lengths)
+    if total <= 0:
+        # If all runs are empty, put everything into the first run
+        return [translated] + [""] * (len(runs_texts) - 1)
+
+    # Initial proportional allocation
+    alloc = []
+    used = 0
+    for i, ln in enumerate(lengths):
+        if i == len(lengths) - 1:
+            take = len(translated) - used
+        else:
+            take = int(round((ln / total) * len(translated)))
+            take = max(0, min(take, len(translated) - used))
+        alloc.append(translated[used : used + take])
+        used += take
+
+    # Fix rounding drift
+    if used < len(translated):
+        alloc[-1] += translated[used:]
+    elif used > len(translated):
+        # Trim from the end if we overshot
+        overflow = used - len(translated)
+        if overflow > 0 and alloc[-1]:
+            alloc[-1] = alloc[-1][:-overflow]
+
+    # Ensure same length
+    if len(alloc) < len(runs_texts):
+        alloc.extend([""] * (len(runs_texts) - len(alloc)))
+    return alloc[: len(runs_texts)]
+
+
+def _rebuild_docx(file_path, translations, download_folder):
+    import docx
+
+    # Modify original document in-place so styles/images/relationships are preserved
+    doc = docx.Document(file_path)
+    for paragraph, translated in zip(_docx_paragraphs(doc), translations):
+        if translated is None:
+            # Translation failed: keep the original paragraph
+            continue
+        runs = list(paragraph.runs)
+        pieces = distribute_text_to_runs(sanitize_text(translated), [r.text or "" for r in runs])
+        for run, piece in zip(runs, pieces):
+            run.text = piece
+
+    output_path = output_path_for(file_path, download_folder, '.docx')
+    # Save and validate
+    doc.save(output_path)
+
+    # Validate produced DOCX — if invalid, write a plain text fallback to avoid corrupt file being returned
+    try:
+        # Try opening the saved file with python-docx to validate
+        docx.Document(output_path)
+    except Exception:
+        # Create a text fallback containing translated paragraphs and table text
+        fallback_path = output_path
+        if not fallback_path.lower().endswith('.txt'):
+            fallback_path += '.txt'
+        lines = []
+        for p in doc.paragraphs:
+            lines.append(p.text)
+        for t in doc.tables:
+            for row in t.rows:
+                for cell in row.cells:
+                    lines.append(cell.text)
+        with open(fallback_path, 'w', encoding='utf-8') as f:
+            f.write("NOTE: DOCX creation failed on server. Showing plain text fallback below.\n\n")
+            f.write('\n'.join(lines))
+        output_path = fallback_path
+    return output_path
+
+
+# --- XLSX ------------------------------------------------------------------
+
+def _extract_xlsx(file_path):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(file_path)
+    segments = []
+    locations = []  # (sheet name, cell coordinate) per segment, so rebuild need not rescan
+    for sheet_name in wb.sheetnames:
+        ws = wb[sheet_name]
+        for row in ws.iter_rows():
+            for cell in row:
+                try:
+                    is_formula = (cell.data_type == 'f') or (
+                        isinstance(cell.value, str) and cell.value.startswith("=")
+                    )
+                except Exception:
+                    is_formula = False
+
+                if (not is_formula) and isinstance(cell.value, str) and cell.value.strip():
+                    segments.append(cell.value)
+                    locations.append((sheet_name, cell.coordinate))
+    return segments, {'locations': locations}
+
+
+def _rebuild_xlsx(file_path, meta, translations, download_folder):
+    import openpyxl
+
+    # Translate in-place to preserve styles, merged cells, formulas, column widths, etc.
+    wb = openpyxl.load_workbook(file_path)
+    for (sheet_name, coordinate), translated in zip(meta['locations'], translations):
+        if translated is not None:
+            wb[sheet_name][coordinate].value = translated
+
+    output_path = output_path_for(file_path, download_folder, '.xlsx')
+    wb.save(output_path)
+    return output_path
@@ -0,0 +1,56 @@
+import os
+import hmac
+import time
+import hashlib
+from urllib.parse import quote, urlencode
+
+_backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class DownloadLinks:
+    """Short-lived signed URLs for files under backend/downloads.
+
+    A link is /downloads/<path>?expires=<unix time>&sig=<hmac>, where the HMAC-SHA256
+    covers the path and the expiry, so result paths can neither be guessed nor shared
+    beyond their lifetime. Signing only needs the configured key, not a request context,
+    so progress streams can build links too.
+    """
+
+    def __init__(self, folder=None, ttl_seconds=900):
+        self.folder = folder or os.path.join(_backend_dir, 'downloads')
+        self.ttl_seconds = ttl_seconds
+        self._key = None
+
+    def init_app(self, app):
+        secret = app.config.get('DOWNLOAD_SIGNING_KEY') or app.config.get('SECRET_KEY')
+        self._key = str(secret).encode('utf-8') if secret else None
+        self.ttl_seconds = int(app.config.get('DOWNLOAD_URL_TTL', self.ttl_seconds))
+
+    def relative_path(self, path):
+        """Path of a file below the downloads folder, with forward slashes."""
+        return os.path.relpath(path, self.folder).replace(os.sep, '/')
+
+    def _signature(self, rel_path, expires):
+        if self._key is None:
+            raise RuntimeError('DownloadLinks is not configured; call init_app(app) first')
+        message = f"{rel_path}|{int(expires)}".encode('utf-8')
+        return hmac.new(self._key, message, hashlib.sha256).hexdigest()
+
+    def url_for(self, path, ttl_seconds=None):
+        """Signed download URL for an absolute path inside the downloads folder."""
+        rel_path = self.relative_path(path)
+        expires = int(time.time()) + int(ttl_seconds or self.ttl_seconds)
+        query = urlencode({'expires': expires, 'sig': self._signature(rel_path, expires)})
+        return f"/downloads/{quote(rel_path)}?{query}"
+
+    def verify(self, rel_path, expires, sig):
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if not sig or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(rel_path, expires), str(sig))
+
+
+download_links = DownloadLinks()
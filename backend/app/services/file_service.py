@@ -1,24 +1,58 @@
 import os
-import re
-import unicodedata
 import time
-import PyPDF2
-import docx
-import openpyxl
-# fpdf is optional; if missing we fallback to text output for PDFs
-try:
-    from fpdf import FPDF
-    HAS_FPDF = True
-except Exception:
-    FPDF = None
-    HAS_FPDF = False
-from werkzeug.utils import secure_filename
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.services.document_formats import document_format, extract_segments, load_parsed, rebuild_document, save_parsed
+from app.utils.metrics import DOCUMENT_SEGMENTS, DOCUMENT_STAGE_SECONDS, SEGMENT_RETRIES
 
 
 class ProviderRateLimitError(Exception):
     """Raised when the upstream AI provider indicates a hard rate limit (429 or insufficient credits)."""
     pass
 
+
+class JobCancelledError(Exception):
+    """Raised inside a document job once the user has cancelled it."""
+    pass
+
+
+class SegmentMemory:
+    """Segment-level translation memory for one document job.
+
+    reuse: {source_segment: translated_segment} taken from a previous revision of the
+    same document. Segments found here are returned verbatim without calling the provider.
+    Every segment successfully translated (or reused) in this job is recorded so the
+    job can in turn serve as the base for the next revision.
+    """
+
+    def __init__(self, reuse=None):
+        self.reuse = dict(reuse or {})
+        self.record = {}
+        self.reused = 0
+        self.translated = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, text):
+        out = self.reuse.get(text)
+        if out is not None:
+            with self._lock:
+                self.reused += 1
+                self.record[text] = out
+        return out
+
+    def store(self, text, translated):
+        with self._lock:
+            self.translated += 1
+            self.record[text] = translated
+
+    def fail(self):
+        with self._lock:
+            self.failed += 1
+
+
 class FileService:
     def __init__(self, translator=None):
         """translator: callable(text, source_lang, target_lang) -> translated_text"""
@@ -40,22 +74,31 @@ class FileService:
             self.retries = int(os.getenv('TRANSLATION_RETRIES', '3'))
             self.backoff = float(os.getenv('TRANSLATION_BACKOFF', '1.5'))
         self._executor_cls = ThreadPoolExecutor
+        # Process pool for CPU-bound parse/rebuild stages (0 = run them on the job thread)
+        self.process_workers = int(os.getenv('DOCUMENT_PROCESS_WORKERS', str(min(2, os.cpu_count() or 1))))
+        self._process_pool = None
+        self._pool_lock = threading.Lock()
+        self._parse_locks = {}  # file_path -> Lock, while a parse of that upload is running
 
-    def _translate_with_retry(self, text, target_lang):
+    def _translate_with_retry(self, text, target_lang, cancel_event=None, translator=None):
         """Translate a piece of text with retry/backoff on transient errors.
 
+        translator overrides self.translator for one job (e.g. multi-target fan-out).
+
         IMPORTANT: If a provider rate-limit or "insufficient credits" error is encountered,
         fail fast by raising ProviderRateLimitError so the calling job can abort immediately
         instead of continuing and wasting quota/retries.
         """
-        if not self.translator:
+        translator = translator or self.translator
+        if not translator:
             raise RuntimeError('Translator not configured')
         last = None
         attempt = 0
         max_attempts = max(1, self.retries)
         while attempt < max_attempts:
+            self._raise_if_cancelled(cancel_event)
             try:
-                out = self.translator(text, 'auto', target_lang)
+                out = translator(text, 'auto', target_lang)
                 return out
             except Exception as e:
                 last = e
@@ -69,9 +112,14 @@ class FileService:
                     raise ProviderRateLimitError(str(e))
                 # Retry on transient network errors
                 if any(k in err for k in ('temporarily', 'timed out', 'timeout', 'connection')):
+                    SEGMENT_RETRIES.inc()
                     sleep_time = (self.backoff ** attempt)
                     print(f"Translate retry {attempt+1}/{self.retries} after {sleep_time}s due to: {e}")
-                    time.sleep(sleep_time)
+                    # Wake up early if the job is cancelled while backing off
+                    if cancel_event is not None:
+                        cancel_event.wait(sleep_time)
+                    else:
+                        time.sleep(sleep_time)
                     attempt += 1
                     continue
                 # Non-retryable errors: break
@@ -79,402 +127,149 @@ class FileService:
         # Final attempt to raise helpful error
         raise last
 
+    def _raise_if_cancelled(self, cancel_event, executor=None):
+        """Stop a cancelled job: drop not-yet-started segments and unwind the job thread."""
+        if cancel_event is None or not cancel_event.is_set():
+            return
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise JobCancelledError('Job cancelled')
+
+    def _translate_segment(self, text, target_lang, memory=None, cancel_event=None, translator=None):
+        """Translate one document segment, reusing the previous revision's output when unchanged."""
+        if memory is not None:
+            reused = memory.lookup(text)
+            if reused is not None:
+                DOCUMENT_SEGMENTS.labels('reused').inc()
+                return reused
+        self._raise_if_cancelled(cancel_event)
+        out = self._translate_with_retry(text, target_lang, cancel_event, translator)
+        # The provider call cannot be interrupted mid-flight; discard its result instead
+        self._raise_if_cancelled(cancel_event)
+        DOCUMENT_SEGMENTS.labels('translated').inc()
+        if memory is not None and out:
+            memory.store(text, out)
+        return out
     
-    def process_document(self, file_path, target_lang, progress_callback=None):
-        filename = os.path.basename(file_path)
-        name, ext = os.path.splitext(filename)
-        
-        if ext.lower() == '.pdf':
-            return self._process_pdf(file_path, target_lang, progress_callback)
-        elif ext.lower() == '.docx':
-            return self._process_docx(file_path, target_lang, progress_callback)
-        elif ext.lower() == '.xlsx':
-            return self._process_xlsx(file_path, target_lang, progress_callback)
-        elif ext.lower() == '.txt':
-            return self._process_txt(file_path, target_lang, progress_callback)
-        else:
-            raise ValueError("Unsupported file type")
-    
-    def _process_pdf(self, file_path, target_lang, progress_callback=None):
-        text = ""
-        with open(file_path, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            total_pages = len(pdf_reader.pages)
-            for i, page in enumerate(pdf_reader.pages):
-                text += page.extract_text() + "\n"
-                if progress_callback:
-                    progress_callback(int(5 + (i / max(1, total_pages)) * 20), f"Extracting page {i+1}/{total_pages}")
-        
-            if progress_callback:
-                progress_callback(25, "Translating PDF text...")
-            # Split by pages (already done) and translate pages in parallel
-            pages = text.split('\f') if '\f' in text else text.split('\n\f') if '\n\f' in text else text.split('\n\n')
-            with self._executor_cls(max_workers=self.concurrency) as ex:
-                futures = [ex.submit(self._translate_with_retry, p, target_lang) for p in pages]
-                translated_pages = []
-                for fut in futures:
+    def _executor(self, lane=None):
+        """Executor for segment translation: the job's lane on the global scheduler when
+        running as a queued job, otherwise a private pool (synchronous callers)."""
+        if lane is not None:
+            return lane
+        return self._executor_cls(max_workers=self.concurrency)
+
+    def _cpu_stage(self, fn, *args):
+        """Run a CPU-bound stage (parse/rebuild) in the process pool so PyPDF2/docx/openpyxl/FPDF
+        work does not hold the GIL of the process serving API requests."""
+        if self.process_workers <= 0:
+            return fn(*args)
+        with self._pool_lock:
+            if self._process_pool is None:
+                # spawn: never fork a process that is running request and scheduler threads
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            pool = self._process_pool
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A child died (OOM, killed): replace the pool and run this stage inline
+            with self._pool_lock:
+                if self._process_pool is pool:
+                    self._process_pool = None
+            return fn(*args)
+
+    def _parse_once(self, file_path):
+        """Parse stage shared by every job on the same upload (e.g. one per target language
+        of a batch): the first job parses and saves the result beside the file, jobs running
+        meanwhile in this process wait for it instead of parsing again. Chunked TXT uploads
+        arrive already split."""
+        with self._pool_lock:
+            lock = self._parse_locks.setdefault(file_path, threading.Lock())
+        try:
+            with lock:
+                parsed = load_parsed(file_path)
+                if parsed is None:
+                    parsed = self._cpu_stage(extract_segments, file_path)
                     try:
-                        translated_pages.append(fut.result())
-                    except ProviderRateLimitError:
-                        print("Provider rate limit detected during PDF page translation, aborting job.")
-                        raise
-                    except Exception as e:
-                        print(f"PDF page translation failed: {e}")
-                        translated_pages.append('')
-            translated_text = '\n\n'.join(translated_pages)
-
-        # If FPDF is available, build a PDF; otherwise fallback to a TXT file (no layout preservation)
-        if HAS_FPDF and FPDF:
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-
-            # Split text into lines to fit page
-            lines = translated_text.split('\n')
-            for line in lines:
-                # Handle long lines
-                while len(line) > 0:
-                    if pdf.get_string_width(line) < 180:  # Approximate page width
-                        pdf.cell(0, 10, txt=line, ln=True)
-                        break
-                    else:
-                        # Find a good break point
-                        words = line.split()
-                        current_line = ""
-                        for word in words:
-                            if pdf.get_string_width(current_line + " " + word) < 180:
-                                current_line += " " + word if current_line else word
-                            else:
-                                pdf.cell(0, 10, txt=current_line, ln=True)
-                                current_line = word
-                        if current_line:
-                            pdf.cell(0, 10, txt=current_line, ln=True)
-                        line = ""
+                        save_parsed(file_path, parsed)
+                    except (OSError, TypeError) as e:
+                        print(f"Saving parse result failed: {e}")
+                return parsed
+        finally:
+            with self._pool_lock:
+                self._parse_locks.pop(file_path, None)
+
+    def after_fork(self):
+        # The parent's pool and its management threads do not exist in a forked child
+        self._process_pool = None
+        self._pool_lock = threading.Lock()
+        self._parse_locks = {}
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def process_document(self, file_path, target_lang, progress_callback=None, memory=None, cancel_event=None, lane=None,
+                         output_folder=None, translator=None):
+        """Parse (process pool) -> translate segments (scheduler/threads) -> rebuild (process pool).
+
+        The output is written to output_folder (default: the downloads folder). translator
+        replaces the service translator for this document (multi-target fan-out).
+        """
+        fmt = document_format(file_path).lstrip('.')
+        if progress_callback:
+            progress_callback(5, "Parsing document")
+        with DOCUMENT_STAGE_SECONDS.labels('parse', fmt).time():
+            parsed = self._parse_once(file_path)
+        self._raise_if_cancelled(cancel_event)
 
-            # Ensure output filename has .pdf extension
-            output_filename = f"translated_{os.path.basename(file_path)}"
-            if not output_filename.lower().endswith('.pdf'):
-                output_filename += '.pdf'
-            output_path = os.path.join(self.download_folder, output_filename)
-            pdf.output(output_path)
-        else:
-            # Fallback: save plain text and include a note
-            if progress_callback:
-                progress_callback(60, "PDF library not available, writing plain text fallback")
-            output_filename = f"translated_{os.path.basename(file_path)}"
-            if not output_filename.lower().endswith('.txt'):
-                output_filename += '.txt'
-            output_path = os.path.join(self.download_folder, output_filename)
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write("NOTE: PDF rebuild not available on this system. Install 'fpdf' to get translated PDF output.\n\n")
-                f.write(translated_text)
+        with DOCUMENT_STAGE_SECONDS.labels('translate', fmt).time():
+            translations = self._translate_segments(
+                parsed['segments'], target_lang, progress_callback, memory, cancel_event, lane, translator
+            )
+        self._raise_if_cancelled(cancel_event)
 
+        if progress_callback:
+            progress_callback(92, "Rebuilding document")
+        with DOCUMENT_STAGE_SECONDS.labels('rebuild', fmt).time():
+            output_path = self._cpu_stage(rebuild_document, file_path, parsed, translations, output_folder or self.download_folder)
         if progress_callback:
             progress_callback(100, "Completed")
         return output_path
-    
-    def _process_docx(self, file_path, target_lang, progress_callback=None):
-        # Modify original document in-place so styles/images/relationships are preserved
-        doc = docx.Document(file_path)
-
-        def distribute_text_to_runs(translated: str, runs_texts):
-            """
-            Heuristic: keep the same run count/styles by distributing the translated
-            paragraph text back into existing runs proportionally by original run length.
-            """
-            if translated is None:
-                translated = ""
-            translated = str(translated)
-
-            # Only consider runs that had some text (including whitespace) for distribution
-            lengths = [len(t) for t in runs_texts]
-            total = sum(lengths)
-            if total <= 0:
-                # If all runs are empty, put everything into the first run
-                return [translated] + [""] * (len(runs_texts) - 1)
-
-            # Initial proportional allocation
-            alloc = []
-            used = 0
-            for i, ln in enumerate(lengths):
-                if i == len(lengths) - 1:
-                    take = len(translated) - used
-                else:
-                    take = int(round((ln / total) * len(translated)))
-                    take = max(0, min(take, len(translated) - used))
-                alloc.append(translated[used : used + take])
-                used += take
-
-            # Fix rounding drift
-            if used < len(translated):
-                alloc[-1] += translated[used:]
-            elif used > len(translated):
-                # Trim from the end if we overshot
-                overflow = used - len(translated)
-                if overflow > 0 and alloc[-1]:
-                    alloc[-1] = alloc[-1][:-overflow]
-
-            # Ensure same length
-            if len(alloc) < len(runs_texts):
-                alloc.extend([""] * (len(runs_texts) - len(alloc)))
-            return alloc[: len(runs_texts)]
-
-        def translate_paragraph_runs(paragraph, idx=None, total=None):
-            # Translate at paragraph-level for better quality, then map back to runs to keep formatting.
-            runs = list(paragraph.runs)
-            if not runs:
-                return
 
-            original_texts = [r.text or "" for r in runs]
-            paragraph_text = "".join(original_texts)
-            if not paragraph_text.strip():
-                return
-
-            try:
-                translated_para = self._translate_text(paragraph_text, target_lang)
-            except ProviderRateLimitError:
-                # Critical: if provider is rate-limited stop the entire document job
-                print("Provider rate limit detected during paragraph translation, raising to abort job.")
-                raise
-            except Exception as e:
-                print(f"Translator failed for paragraph: {e}")
-                translated_para = paragraph_text
-
-            pieces = distribute_text_to_runs(translated_para, original_texts)
-            for run, piece in zip(runs, pieces):
-                run.text = piece
-            if progress_callback and idx is not None and total is not None:
-                progress_callback(10 + int((idx / total) * 70), f"Translating paragraph {idx+1}/{total}")
-
-        # Body paragraphs
-        paragraphs = [p for p in doc.paragraphs]
-        total = len(paragraphs) if paragraphs else 1
-        # Translate in parallel using ThreadPoolExecutor
-        with self._executor_cls(max_workers=self.concurrency) as ex:
+    def _translate_segments(self, segments, target_lang, progress_callback=None, memory=None, cancel_event=None, lane=None,
+                            translator=None):
+        """Translate a segment list in parallel. Failed segments come back as None."""
+        translations = [None] * len(segments)
+        total = len(segments) or 1
+        with self._executor(lane) as ex:
             futures = {}
-            for idx, para in enumerate(paragraphs):
-                # capture original run texts
-                runs_texts = [r.text or "" for r in para.runs]
-                paragraph_text = "".join(runs_texts)
-                if not paragraph_text.strip():
+            for i, segment in enumerate(segments):
+                if not str(segment or '').strip():
+                    # Nothing to translate (e.g. blank PDF page): keep as is
+                    translations[i] = segment
                     continue
-                futures[ex.submit(self._translate_with_retry, paragraph_text, target_lang)] = (idx, para, runs_texts)
+                futures[i] = ex.submit(self._translate_segment, segment, target_lang, memory, cancel_event, translator)
 
-            completed = 0
-            for fut in list(futures):
+            for done, (i, fut) in enumerate(futures.items(), start=1):
+                self._raise_if_cancelled(cancel_event, ex)
                 try:
-                    res = fut.result()
-                    idx, para, runs_texts = futures[fut]
-                    pieces = distribute_text_to_runs(res, runs_texts)
-                    for run, piece in zip(list(para.runs), pieces):
-                        run.text = piece
-                except ProviderRateLimitError as e:
-                    print("Provider rate limit detected during paragraph processing, aborting job.")
+                    translations[i] = fut.result()
+                except JobCancelledError:
+                    self._raise_if_cancelled(cancel_event, ex)
                     raise
-                except Exception as e:
-                    print(f"Paragraph translation failed: {e}")
-                completed += 1
-                if progress_callback:
-                    progress_callback(10 + int((completed / max(1, total)) * 70), f"Translating paragraph {completed}/{total}")
-
-        # Tables: translate cell-by-cell, preserve cell formatting
-        for table in doc.tables:
-            for r in range(len(table.rows)):
-                for c in range(len(table.columns)):
-                    cell = table.rows[r].cells[c]
-                    for p_idx, p in enumerate(cell.paragraphs):
-                        translate_paragraph_runs(p, p_idx, len(cell.paragraphs))
-
-        # Headers and footers
-        try:
-            for section in doc.sections:
-                header = section.header
-                for p_idx, p in enumerate(header.paragraphs):
-                    translate_paragraph_runs(p, p_idx, len(header.paragraphs))
-                footer = section.footer
-                for p_idx, p in enumerate(footer.paragraphs):
-                    translate_paragraph_runs(p, p_idx, len(footer.paragraphs))
-        except Exception:
-            # ignore headers/footers issues
-            pass
-
-        # Ensure output filename has .docx extension
-        output_filename = f"translated_{os.path.basename(file_path)}"
-        if not output_filename.lower().endswith('.docx'):
-            output_filename += '.docx'
-        output_path = os.path.join(self.download_folder, output_filename)
-
-        # Save and validate
-        doc.save(output_path)
-
-
-        # Validate produced DOCX — if invalid, write a plain text fallback to avoid corrupt file being returned
-        try:
-            # Try opening the saved file with python-docx to validate
-            docx.Document(output_path)
-        except Exception as e:
-            # Create a text fallback containing translated paragraphs and table text
-            if progress_callback:
-                progress_callback(95, "DOCX validation failed, writing fallback text file")
-            fallback_filename = output_filename
-            if not fallback_filename.lower().endswith('.txt'):
-                fallback_filename += '.txt'
-            fallback_path = os.path.join(self.download_folder, fallback_filename)
-            # Collect text from doc
-            lines = []
-            for p in doc.paragraphs:
-                lines.append(p.text)
-            for t in doc.tables:
-                for row in t.rows:
-                    for cell in row.cells:
-                        lines.append(cell.text)
-            with open(fallback_path, 'w', encoding='utf-8') as f:
-                f.write("NOTE: DOCX creation failed on server. Showing plain text fallback below.\n\n")
-                f.write('\n'.join(lines))
-            output_path = fallback_path
-
-        if progress_callback:
-            progress_callback(100, "Completed")
-        return output_path
-    
-    def _process_xlsx(self, file_path, target_lang, progress_callback=None):
-        # Translate in-place to preserve styles, merged cells, formulas, column widths, etc.
-        wb = openpyxl.load_workbook(file_path)
-
-        # Count total cells (rough progress)
-        total_cells = 0
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            for _ in ws.iter_rows():
-                total_cells += 1
-        total_cells = total_cells or 1
-
-        # Collect cells to translate
-        to_translate = []
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            for row in ws.iter_rows():
-                for cell in row:
-                    try:
-                        is_formula = (cell.data_type == 'f') or (
-                            isinstance(cell.value, str) and cell.value.startswith("=")
-                        )
-                    except Exception:
-                        is_formula = False
-
-                    if (not is_formula) and isinstance(cell.value, str) and cell.value.strip():
-                        to_translate.append(cell)
-
-        total = len(to_translate) or 1
-        processed = 0
-        # Translate cells in parallel
-        with self._executor_cls(max_workers=self.concurrency) as ex:
-            futures = {ex.submit(self._translate_with_retry, cell.value, target_lang): cell for cell in to_translate}
-            for fut in futures:
-                try:
-                    translated = fut.result()
-                    cell = futures[fut]
-                    cell.value = translated
                 except ProviderRateLimitError:
-                    print("Provider rate limit detected during cell translation, aborting job.")
-                    raise
-                except Exception as e:
-                    print(f"Cell translation failed: {e}")
-                processed += 1
-                if progress_callback:
-                    progress_callback(10 + int((processed / total) * 80), f"Translating cells {processed}/{total}")
-
-        # Ensure output filename has .xlsx extension
-        output_filename = f"translated_{os.path.basename(file_path)}"
-        if not output_filename.lower().endswith('.xlsx'):
-            output_filename += '.xlsx'
-        output_path = os.path.join(self.download_folder, output_filename)
-        wb.save(output_path)
-        if progress_callback:
-            progress_callback(100, "Completed")
-        return output_path
-    
-    def _process_txt(self, file_path, target_lang, progress_callback=None):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            text = f.read()
-        if progress_callback:
-            progress_callback(25, "Translating text file...")
-
-        # Split into paragraphs then chunk long paragraphs to avoid provider length limits
-        paras = [p.strip() for p in re.split(r'\n{2,}', text) if p.strip()]
-        max_chars = 3000
-        chunks = []
-        for p in paras:
-            if len(p) <= max_chars:
-                chunks.append(p)
-            else:
-                parts = re.split(r'(?<=[.!?])\s+', p)
-                cur = ''
-                for part in parts:
-                    if len(cur) + len(part) + 1 <= max_chars:
-                        cur = (cur + ' ' + part).strip() if cur else part
-                    else:
-                        if cur:
-                            chunks.append(cur)
-                        cur = part
-                if cur:
-                    # If still too long, slice it
-                    while len(cur) > max_chars:
-                        chunks.append(cur[:max_chars])
-                        cur = cur[max_chars:]
-                    if cur:
-                        chunks.append(cur)
-
-        # Translate chunks in parallel
-        translated_parts = []
-        with self._executor_cls(max_workers=self.concurrency) as ex:
-            futures = [ex.submit(self._translate_with_retry, c, target_lang) for c in chunks]
-            total = len(futures) or 1
-            for i, fut in enumerate(futures, start=1):
-                try:
-                    res = fut.result()
-                    translated_parts.append(res)
-                except ProviderRateLimitError as e:
-                    try:
-                        print("Provider rate limit detected during text file translation, aborting job.")
-                    except UnicodeEncodeError:
-                        print("Provider rate limit detected during text file translation, aborting job.")
+                    print("Provider rate limit detected during segment translation, aborting job.")
+                    ex.shutdown(wait=False, cancel_futures=True)
                     raise
                 except Exception as e:
-                    print(f"Chunk translation failed: {e}")
-                    translated_parts.append('')
+                    print(f"Segment translation failed: {e}")
+                    DOCUMENT_SEGMENTS.labels('failed').inc()
+                    if memory is not None:
+                        memory.fail()
                 if progress_callback:
-                    progress_callback(25 + int((i / total) * 70), f"Translating chunk {i}/{total}")
-
-        translated_text = '\n\n'.join(translated_parts)
-
-        output_filename = f"translated_{os.path.basename(file_path)}"
-        if not output_filename.lower().endswith('.txt'):
-            output_filename += '.txt'
-        output_path = os.path.join(self.download_folder, output_filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(translated_text)
-        if progress_callback:
-            progress_callback(100, "Completed")
-        return output_path
-    
-    def _sanitize_text(self, text: str) -> str:
-        if not isinstance(text, str):
-            try:
-                text = str(text)
-            except Exception:
-                return ''
-        # Normalize unicode and remove control characters that break XML/docx
-        text = unicodedata.normalize('NFC', text)
-        # Remove C0 control characters except tab/newline/carriage return
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F]', '', text)
-        # Collapse weird zero-width/formatting if any
-        text = re.sub(r'[\u200B-\u200F\u2028\u2029]', ' ', text)
-        return text
-
-    def _translate_text(self, text, target_lang):
-        # Use injected translator with retry/backoff
-        if self.translator:
-            out = self._translate_with_retry(text, target_lang)
-            return self._sanitize_text(out)
-        raise RuntimeError("Translator is not configured")
\ No newline at end of file
+                    progress_callback(10 + int((done / total) * 80), f"Translating segment {done}/{total}")
+        return translations
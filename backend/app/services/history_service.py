@@ -0,0 +1,183 @@
+import base64
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_
+from app.models import db, PREVIEW_CHARS, Translation, TranslationArchive, User, text_preview
+from app.services.usage_service import day_range
+from app.utils.metrics import DB_QUERY_SECONDS
+
+# List items carry PREVIEW_CHARS of original/translated text (full text: GET /api/history/<id>)
+MAX_PAGE_SIZE = 100
+# Totals are counted up to this many rows; larger histories report total_is_estimate
+TOTAL_CAP = 1000
+
+
+def encode_cursor(created_at, translation_id):
+    raw = f"{created_at.isoformat()}|{translation_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) of the last row of the previous page; ValueError when malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, translation_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(translation_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _filtered(query, model, user_id, filter_type, day):
+    query = query.filter(model.user_id == user_id)
+    if filter_type == 'text':
+        query = query.filter(model.file_path.is_(None))
+    elif filter_type == 'document':
+        query = query.filter(model.file_path.isnot(None))
+    if day:
+        start, end = day_range(day)
+        query = query.filter(model.created_at >= start, model.created_at < end)
+    return query
+
+
+def _page(model, user_id, filter_type, day, after, n):
+    query = _filtered(db.session.query(
+        model.id,
+        model.original_preview,
+        model.translated_preview,
+        model.source_lang,
+        model.target_lang,
+        model.file_path.isnot(None).label('has_file'),
+        model.created_at,
+    ), model, user_id, filter_type, day)
+    if after:
+        created_at, last_id = after
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < last_id),
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(n).all()
+    # Rows written before the preview columns existed and not backfilled yet (migrate.py)
+    legacy = [row.id for row in rows if row.original_preview is None]
+    if not legacy:
+        return rows
+    texts = {
+        r.id: (r.original_text, r.translated_text)
+        for r in db.session.query(model.id, model.original_text, model.translated_text).filter(model.id.in_(legacy))
+    }
+    return [
+        SimpleNamespace(**{**row._asdict(), 'original_preview': text_preview(texts[row.id][0]),
+                           'translated_preview': text_preview(texts[row.id][1])})
+        if row.id in texts else row
+        for row in rows
+    ]
+
+
+@DB_QUERY_SECONDS.labels('history_list').time()
+def list_history(user_id, filter_type='all', day=None, cursor=None, limit=10, with_total=False):
+    """One page of a user's history, newest first, archived rows included.
+
+    Keyset pagination on (created_at, id): the page after `cursor` is an index range scan on
+    ix_translation_user_created (InnoDB and SQLite append the primary key to it), so deep
+    pages cost the same as the first one and no COUNT(*) runs unless with_total is set.
+    Archived rows are all older than the live ones, so a page that runs past the end of
+    translation continues in translation_archive with the same cursor. Texts come from the
+    plain-text preview columns, so the compressed originals are never read here.
+    """
+    limit = max(1, min(int(limit or 10), MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+    rows = _page(Translation, user_id, filter_type, day, after, limit + 1)
+    if len(rows) <= limit:
+        archive_after = (rows[-1].created_at, rows[-1].id) if rows else after
+        rows += _page(TranslationArchive, user_id, filter_type, day, archive_after, limit + 1 - len(rows))
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    page = {
+        'translations': [_preview(row) for row in rows],
+        'has_more': has_more,
+        'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+    }
+    if with_total:
+        page['total'], page['total_is_estimate'] = approximate_total(user_id, filter_type, day)
+    return page
+
+
+def approximate_total(user_id, filter_type='all', day=None, cap=TOTAL_CAP):
+    """(count, is_estimate): exact up to `cap` rows, otherwise `cap` with is_estimate=True."""
+    count = 0
+    for model in (Translation, TranslationArchive):
+        ids = _filtered(db.session.query(model.id), model, user_id, filter_type, day).limit(cap + 1 - count).subquery()
+        count += db.session.query(func.count()).select_from(ids).scalar() or 0
+        if count > cap:
+            break
+    return min(count, cap), count > cap
+
+
+@DB_QUERY_SECONDS.labels('history_detail').time()
+def get_translation(user_id, translation_id):
+    """Live or archived history record of user_id, or None."""
+    for model in (Translation, TranslationArchive):
+        row = model.query.filter_by(id=translation_id, user_id=user_id).first()
+        if row:
+            return row
+    return None
+
+
+def mark_document_history(google_id, file_path, target_lang, since, translated_text):
+    """Replace the placeholder text of the history record created with a document job.
+
+    The record is written by the upload request just before the job, so it is found on
+    ix_translation_user_created from a little before the job's created_at.
+    """
+    owner = db.session.query(User.id).filter_by(google_id=google_id).scalar() if google_id else None
+    rows = Translation.query.filter(
+        Translation.user_id == owner if owner else Translation.user_id.is_(None),
+        Translation.created_at >= (since or datetime.utcnow()) - timedelta(minutes=5),
+        Translation.file_path == file_path,
+        Translation.target_lang == target_lang,
+    ).all()
+    for row in rows:
+        row.translated_text = translated_text
+    db.session.commit()
+    return len(rows)
+
+
+def history_from_args(user_id, args):
+    """list_history() driven by query args: type, date (YYYY-MM-DD), cursor, limit/per_page, total."""
+    filter_type = (args.get('type') or 'all').strip().lower()
+    date_str = (args.get('date') or '').strip()
+    day = None
+    if date_str:
+        try:
+            day = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Invalid date format. Use YYYY-MM-DD')
+    limit = args.get('limit', type=int) or args.get('per_page', 10, type=int)
+    with_total = str(args.get('total', '')).strip().lower() in ('1', 'true', 'yes')
+    return list_history(user_id, filter_type, day, (args.get('cursor') or '').strip() or None, limit, with_total)
+
+
+def _preview(row):
+    original, translated = row.original_preview or '', row.translated_preview or ''
+    return {
+        'id': row.id,
+        'original_text': original[:PREVIEW_CHARS],
+        'translated_text': translated[:PREVIEW_CHARS],
+        'truncated': len(original) > PREVIEW_CHARS or len(translated) > PREVIEW_CHARS,
+        'source_lang': row.source_lang,
+        'target_lang': row.target_lang,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'has_file': bool(row.has_file),
+    }
+
+
+def translation_detail(t):
+    return {
+        'id': t.id,
+        'original_text': t.original_text,
+        'translated_text': t.translated_text,
+        'source_lang': t.source_lang,
+        'target_lang': t.target_lang,
+        'created_at': t.created_at.isoformat() if t.created_at else None,
+        'has_file': bool(t.file_path),
+    }
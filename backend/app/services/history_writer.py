@@ -0,0 +1,239 @@
+import time
+import queue
+import atexit
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import func, insert, select
+from app.models import db, Translation, text_preview, translation_hash
+from app.services.rollup_service import usage_rollups
+from app.services.search_service import search_index
+from app.utils.metrics import DB_QUERY_SECONDS, HISTORY_QUEUE_DEPTH
+
+
+class HistoryWriter:
+    """Write-behind queue for the history rows of text translations.
+
+    When enabled (HISTORY_WRITE_BEHIND), /text and /text/batch hand their rows to submit()
+    and respond without waiting for the insert; a background thread commits them in
+    batches of up to HISTORY_FLUSH_ROWS rows or every HISTORY_FLUSH_INTERVAL_MS, one
+    transaction per batch. Batches go through a Core executemany INSERT (multi-row
+    statements on every driver) with content_hash and previews filled in here, and the
+    search index and usage rollups are updated in the same transaction, as the session
+    hooks do for ORM inserts. A batch that fails twice is split in halves until only the
+    rows that cannot be written are dropped. The queue is bounded: submit() waits up to
+    put_timeout for room and otherwise hands the rows back so the caller writes them
+    synchronously, which slows producers down to the database's pace. Pending rows are
+    flushed by stop(), run at exit.
+
+    Quota counters are not deferred: callers still bump usage_counter in the request.
+    The content_hash of every queued row is kept until its batch is committed, so /save
+    can tell a record that is still on its way to the database (is_pending()).
+    """
+
+    def __init__(self, max_rows=500, interval_ms=200, max_queue=10000, put_timeout=0.5):
+        self.max_rows = max_rows
+        self.interval = interval_ms / 1000.0
+        self.put_timeout = put_timeout
+        self.enabled = False
+        self.app = None
+        self.flushed = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._hashes = Counter()  # content_hash -> rows queued or being written
+        self._hashes_lock = threading.Lock()
+
+    def init_app(self, app):
+        cfg = app.config
+        self.app = app
+        self.enabled = bool(cfg.get('HISTORY_WRITE_BEHIND', False))
+        self.max_rows = max(1, int(cfg.get('HISTORY_FLUSH_ROWS', self.max_rows)))
+        self.interval = float(cfg.get('HISTORY_FLUSH_INTERVAL_MS', self.interval * 1000)) / 1000.0
+        self._queue = queue.Queue(maxsize=max(1, int(cfg.get('HISTORY_QUEUE_SIZE', self._queue.maxsize))))
+        if self.enabled:
+            atexit.register(self.stop)
+        HISTORY_QUEUE_DEPTH.set_function(self.pending)
+
+    def submit(self, rows):
+        """Queue Translation column dicts; returns the rows the caller has to write itself.
+
+        That is all of them when write-behind is off, and the tail that did not fit when
+        the queue stayed full (written in the caller's transaction, never on a second
+        connection, which SQLite would block behind the caller's own write lock).
+        """
+        if not self.enabled or not rows:
+            return rows
+        self._start()
+        deadline = time.monotonic() + self.put_timeout
+        for i, row in enumerate(rows):
+            # Marked before the put: the writer thread may commit the row right after it
+            self._track([row], 1)
+            try:
+                self._queue.put(row, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                self._track([row], -1)
+                return rows[i:]
+        return []
+
+    def is_pending(self, content_hash):
+        """True while a row with this content_hash is queued and not yet committed."""
+        with self._hashes_lock:
+            return self._hashes.get(content_hash, 0) > 0
+
+    @staticmethod
+    def _hash(row):
+        return translation_hash(row.get('user_id'), row.get('source_lang'), row.get('target_lang'),
+                                row.get('original_text'), row.get('translated_text'))
+
+    def _track(self, rows, n):
+        keys = [self._hash(row) for row in rows]
+        with self._hashes_lock:
+            for key in keys:
+                self._hashes[key] += n
+                if self._hashes[key] <= 0:
+                    del self._hashes[key]
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @DB_QUERY_SECONDS.labels('history_write').time()
+    def _write(self, rows):
+        try:
+            with self.app.app_context():
+                if self._insert(rows) is None:
+                    return
+                # Once more after a pause for transient errors (lock timeout, lost connection),
+                # then bisect so one bad row does not take other users' rows down with it
+                time.sleep(min(1.0, self.interval * 5))
+                self._write_split(rows)
+        finally:
+            self._track(rows, -1)
+
+    def _write_split(self, rows):
+        error = self._insert(rows)
+        if error is None:
+            return
+        if len(rows) == 1:
+            self.failed += 1
+            print(f"History write-behind dropped a row of user {rows[0].get('user_id')}: {error}")
+            return
+        mid = len(rows) // 2
+        self._write_split(rows[:mid])
+        self._write_split(rows[mid:])
+
+    def _insert(self, rows):
+        """Insert rows in one transaction; returns the exception on failure, else None."""
+        try:
+            values = [self._values(row) for row in rows]
+            with db.engine.begin() as conn:
+                ids = self._insert_values(conn, values)
+                search_index.index_rows(conn, [
+                    (i, v['user_id'], v['original_text'], v['translated_text'], v['created_at'])
+                    for i, v in zip(ids, values) if i is not None
+                ])
+                usage_rollups.count_rows(conn, [
+                    (v['user_id'], v['created_at'], v['source_lang'], v['target_lang'], v['file_path']) for v in values
+                ])
+        except Exception as e:
+            return e
+        self.flushed += len(rows)
+        return None
+
+    @staticmethod
+    def _values(row):
+        # Everything the ORM insert hooks would set, so every dict has the same keys
+        v = {
+            'user_id': row.get('user_id'),
+            'original_text': row.get('original_text'),
+            'translated_text': row.get('translated_text'),
+            'source_lang': row.get('source_lang'),
+            'target_lang': row.get('target_lang'),
+            'file_path': row.get('file_path'),
+            'created_at': row.get('created_at') or datetime.utcnow(),
+        }
+        v['content_hash'] = translation_hash(v['user_id'], v['source_lang'], v['target_lang'],
+                                             v['original_text'], v['translated_text'])
+        v['original_preview'] = text_preview(v['original_text'])
+        v['translated_preview'] = text_preview(v['translated_text'])
+        return v
+
+    @staticmethod
+    def _insert_values(conn, values):
+        """Execute the INSERT and return the new ids in the order of values."""
+        table = Translation.__table__
+        if conn.dialect.insert_executemany_returning:
+            result = conn.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), values)
+            return [row[0] for row in result]
+        # MySQL has no RETURNING: read the ids back through ix_translation_user_hash, above
+        # the largest id seen before the insert
+        floor = conn.execute(select(func.max(table.c.id))).scalar() or 0
+        conn.execute(insert(table), values)
+        found = defaultdict(list)
+        for row in conn.execute(
+            select(table.c.id, table.c.user_id, table.c.content_hash)
+            .where(table.c.id > floor, table.c.content_hash.in_({v['content_hash'] for v in values}))
+            .order_by(table.c.id)
+        ):
+            found[(row.user_id, row.content_hash)].append(row.id)
+        ids = []
+        for v in values:
+            candidates = found[(v['user_id'], v['content_hash'])]
+            ids.append(candidates.pop(0) if candidates else None)
+        return ids
+
+    def flush(self):
+        """Write everything queued so far on the calling thread."""
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(rows) >= self.max_rows:
+                self._write(rows)
+                rows = []
+        if rows:
+            self._write(rows)
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        if self.app is not None:
+            self.flush()
+
+
+history_writer = HistoryWriter()
@@ -0,0 +1,140 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity
+from app.models import User
+
+
+class UserIdentity:
+    """What request handlers need to know about the caller, without an ORM instance.
+
+    id/google_id/plan are always set; the profile fields (email, name, avatar_url) only
+    when the identity was loaded from the database (profile=True).
+    """
+
+    __slots__ = ('id', 'google_id', 'plan', 'email', 'name', 'avatar_url', 'profile')
+
+    def __init__(self, id, google_id, plan, email=None, name=None, avatar_url=None, profile=False):
+        self.id = id
+        self.google_id = google_id
+        self.plan = plan or 'free'
+        self.email = email
+        self.name = name
+        self.avatar_url = avatar_url
+        self.profile = profile
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.google_id, user.plan, user.email, user.name,
+                   getattr(user, 'avatar_url', None), profile=True)
+
+
+class IdentityCache:
+    """Bounded LRU of UserIdentity by google_id, entries valid for ttl_seconds.
+
+    invalidate() drops the entry and remembers when the user changed, so claims of tokens
+    issued before the change are not trusted any more. Both only happen in the process
+    that handled the change: other gunicorn workers keep a cached entry until it expires
+    and keep trusting older tokens until those expire (IDENTITY_CACHE_TTL defaults to 0,
+    no entries, when WEB_CONCURRENCY > 1). Plan checks that must not be stale use
+    current_user(fresh=True).
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300, token_lifetime=900):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.token_lifetime = token_lifetime  # seconds, None when tokens never expire
+        self._entries = OrderedDict()
+        self._changed = OrderedDict()  # google_id -> int time of the last change, oldest first
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = int(app.config.get('IDENTITY_CACHE_SIZE', self.max_entries))
+        self.ttl_seconds = float(app.config.get('IDENTITY_CACHE_TTL', self.ttl_seconds))
+        expires = app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
+        if expires is False:
+            self.token_lifetime = None
+        else:
+            self.token_lifetime = expires.total_seconds() if isinstance(expires, timedelta) else float(expires)
+
+    def get(self, google_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(google_id)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[google_id]
+                return None
+            self._entries.move_to_end(google_id)
+            return entry[0]
+
+    def put(self, identity):
+        if not self.max_entries or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[identity.google_id] = (identity, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(identity.google_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, google_id):
+        # Whole seconds, like the iat claim: a token issued in the same second as the
+        # change (the new one the plan endpoint returns) is trusted
+        now = int(time.time())
+        with self._lock:
+            self._entries.pop(google_id, None)
+            self._changed.pop(google_id, None)
+            self._changed[google_id] = now
+            if self.token_lifetime is not None:
+                # Every token issued before these marks has expired by now
+                cutoff = now - self.token_lifetime
+                while self._changed and next(iter(self._changed.values())) < cutoff:
+                    self._changed.popitem(last=False)
+
+    def claims_trusted(self, google_id, issued_at):
+        with self._lock:
+            changed = self._changed.get(google_id)
+        return changed is None or int(issued_at or 0) >= changed
+
+
+identity_cache = IdentityCache()
+
+
+def issue_token(user):
+    """Access token for user with its internal id and plan as claims."""
+    return create_access_token(identity=user.google_id, additional_claims={'uid': user.id, 'plan': user.plan or 'free'})
+
+
+def current_user(fresh=False, profile=False):
+    """Identity of the JWT caller (None when anonymous or unknown).
+
+    Resolution order: the identity cache, then the token's uid/plan claims, then the
+    database. fresh=True always reads the database, e.g. before refusing a request on a
+    plan limit that a recent upgrade elsewhere might lift; profile=True needs the
+    profile fields, which claims do not carry.
+    """
+    google_id = get_jwt_identity()
+    if not google_id:
+        return None
+    if not fresh:
+        identity = identity_cache.get(google_id)
+        if identity and (identity.profile or not profile):
+            return identity
+        if not profile:
+            claims = get_jwt()
+            if claims.get('uid') and identity_cache.claims_trusted(google_id, claims.get('iat')):
+                identity = UserIdentity(claims['uid'], google_id, claims.get('plan'))
+                identity_cache.put(identity)
+                return identity
+    return load_user(google_id)
+
+
+def load_user(google_id):
+    user = User.query.filter_by(google_id=google_id).first()
+    if not user:
+        return None
+    identity = UserIdentity.from_user(user)
+    identity_cache.put(identity)
+    return identity
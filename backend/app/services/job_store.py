@@ -0,0 +1,353 @@
+import threading
+from datetime import datetime, timedelta
+from app.models import db, TranslationJob
+
+# Columns callers may update through JobStore.update()
+_MUTABLE_FIELDS = {
+    'status', 'progress', 'message', 'download_path', 'error', 'fallback', 'fallback_reason',
+    'segments_reused', 'segments_translated', 'base_job_id', 'eta_seconds', 'result_key',
+}
+ACTIVE_STATUSES = ('pending', 'in_progress', 'cancelling')
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class JobStore:
+    """Persistent document job queue backed by the translation_job table.
+
+    Any API process can create and read jobs; translation workers (in-process or the
+    standalone worker.py) lease pending jobs, keep their lease alive with heartbeats and
+    pick up jobs whose lease expired because their worker died.
+
+    Leasing is start-time fair queuing across users: each pending job gets a virtual_start
+    tag of max(V, tag of the user's previous active job + 1/weight), where V is the largest
+    tag leased so far and weight the uploader's plan weight (priority). Jobs are leased in
+    tag order, so a user with a backlog gets `weight` jobs leased for every one of a
+    weight-1 user instead of filling every worker slot, and an idle user's next job
+    starts at V instead of banking credit.
+    """
+
+    def __init__(self, app=None, lease_seconds=60, max_attempts=3):
+        self.app = app
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Wakes progress streams in this process as soon as a local worker writes
+        self._changed = threading.Condition()
+        self._versions = {}  # job_id -> local change counter
+
+    def init_app(self, app):
+        self.app = app
+        self.lease_seconds = int(app.config.get('JOB_LEASE_SECONDS', self.lease_seconds))
+        self.max_attempts = int(app.config.get('JOB_MAX_ATTEMPTS', self.max_attempts))
+
+    def _notify(self, *job_ids):
+        with self._changed:
+            if len(self._versions) > 10000:
+                # Bounded memory; waiters fall back to their poll timeout
+                self._versions.clear()
+            for job_id in job_ids:
+                self._versions[job_id] = self._versions.get(job_id, 0) + 1
+            self._changed.notify_all()
+
+    def version(self, job_id):
+        with self._changed:
+            return self._versions.get(job_id, 0)
+
+    def wait_for_change(self, job_id, seen_version, timeout):
+        """Block until this process writes to job_id (past seen_version) or timeout elapses.
+
+        Jobs run by workers in other processes are only seen when the caller re-reads
+        the store after the timeout.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._versions.get(job_id, 0) != seen_version, timeout)
+
+    def _context(self):
+        if self.app is None:
+            raise RuntimeError('JobStore is not bound to an app; call init_app(app) first')
+        return self.app.app_context()
+
+    @staticmethod
+    def _to_dict(job):
+        return {
+            'id': job.id,
+            'user_id': job.user_id,
+            'file_path': job.file_path,
+            'target_lang': job.target_lang,
+            'base_job_id': job.base_job_id,
+            'batch_id': job.batch_id,
+            'result_key': job.result_key,
+            'incremental': bool(job.incremental),
+            'status': job.status,
+            'priority': job.priority or 1,
+            'virtual_start': job.virtual_start,
+            'progress': job.progress or 0,
+            'message': job.message,
+            'download_path': job.download_path,
+            'error': job.error,
+            'fallback': bool(job.fallback),
+            'fallback_reason': job.fallback_reason,
+            'segments_reused': job.segments_reused or 0,
+            'segments_translated': job.segments_translated or 0,
+            'eta_seconds': job.eta_seconds,
+            'cancel_requested': bool(job.cancel_requested),
+            'attempts': job.attempts or 0,
+            'worker_id': job.worker_id,
+            'created_at': job.created_at,
+        }
+
+    def create(self, job_id, file_path, target_lang, user_id=None, base_job_id=None, incremental=True,
+               status='pending', message='Queued', error=None, priority=1, batch_id=None, **fields):
+        with self._context():
+            virtual_start = self._virtual_start(user_id, priority) if status == 'pending' else None
+            job = TranslationJob(
+                id=job_id,
+                user_id=user_id,
+                file_path=file_path,
+                target_lang=target_lang,
+                base_job_id=base_job_id,
+                incremental=incremental,
+                status=status,
+                priority=priority,
+                virtual_start=virtual_start,
+                batch_id=batch_id,
+                progress=0,
+                message=message,
+                error=error,
+            )
+            for name, value in fields.items():
+                if name in _MUTABLE_FIELDS:
+                    setattr(job, name, value)
+            db.session.add(job)
+            db.session.commit()
+            return self._to_dict(job)
+
+    @staticmethod
+    def _virtual_start(user_id, weight):
+        leased = db.session.query(db.func.max(TranslationJob.virtual_start)).filter(
+            TranslationJob.status.in_(('in_progress', 'cancelling', 'completed', 'failed')),
+        ).scalar() or 0.0
+        if not user_id:
+            return leased  # anonymous uploads are not grouped: each counts as its own user
+        last = db.session.query(db.func.max(TranslationJob.virtual_start)).filter(
+            TranslationJob.user_id == user_id, TranslationJob.status.in_(ACTIVE_STATUSES),
+        ).scalar()
+        if last is None:
+            return leased
+        return max(leased, last + 1.0 / max(1, weight or 1))
+
+    def get(self, job_id):
+        with self._context():
+            job = db.session.get(TranslationJob, job_id)
+            return self._to_dict(job) if job else None
+
+    def update(self, job_id, worker_id=None, **fields):
+        """Update job fields. When worker_id is given the write only applies while that worker holds the lease."""
+        values = {k: v for k, v in fields.items() if k in _MUTABLE_FIELDS}
+        if not values:
+            return False
+        values['updated_at'] = datetime.utcnow()
+        with self._context():
+            q = TranslationJob.query.filter(TranslationJob.id == job_id)
+            if worker_id is not None:
+                q = q.filter(TranslationJob.worker_id == worker_id)
+            updated = q.update(values, synchronize_session=False)
+            db.session.commit()
+        self._notify(job_id)
+        return updated == 1
+
+    def list_batch(self, batch_id):
+        """All jobs of a batch, in creation order."""
+        with self._context():
+            jobs = (
+                TranslationJob.query.filter(TranslationJob.batch_id == batch_id)
+                .order_by(TranslationJob.created_at.asc(), TranslationJob.id.asc())
+                .all()
+            )
+            return [self._to_dict(job) for job in jobs]
+
+    def recent_download_paths(self, seconds):
+        """download_path of every job completed in the last `seconds` seconds."""
+        since = datetime.utcnow() - timedelta(seconds=seconds)
+        with self._context():
+            rows = (
+                db.session.query(TranslationJob.download_path)
+                .filter(TranslationJob.status == 'completed', TranslationJob.updated_at >= since,
+                        TranslationJob.download_path.isnot(None))
+                .all()
+            )
+            return {row[0] for row in rows}
+
+    def count_active_for_file(self, file_path, exclude_job_id=None):
+        """Unfinished jobs reading the same upload (e.g. other targets of a batch)."""
+        with self._context():
+            q = TranslationJob.query.filter(
+                TranslationJob.file_path == file_path, TranslationJob.status.in_(ACTIVE_STATUSES)
+            )
+            if exclude_job_id:
+                q = q.filter(TranslationJob.id != exclude_job_id)
+            return q.count()
+
+    def lease(self, worker_id, limit=1):
+        """Claim up to `limit` runnable jobs for worker_id.
+
+        Runnable means pending, or running under a lease that has expired (its worker died).
+        Claims are made with a conditional UPDATE so concurrent workers never run the same job.
+        """
+        now = datetime.utcnow()
+        claimed = []
+        with self._context():
+            expired = db.and_(
+                TranslationJob.status.in_(('in_progress', 'cancelling')),
+                TranslationJob.lease_expires_at < now,
+            )
+            runnable = db.or_(TranslationJob.status == 'pending', expired)
+            candidates = [row.id for row in (
+                TranslationJob.query.with_entities(TranslationJob.id)
+                .filter(runnable)
+                .order_by(TranslationJob.virtual_start.asc(), TranslationJob.created_at.asc())
+                .limit(limit * 4)
+                .all()
+            )]
+            for job_id in candidates:
+                if len(claimed) >= limit:
+                    break
+                updated = TranslationJob.query.filter(TranslationJob.id == job_id, runnable).update({
+                    'status': 'in_progress',
+                    'worker_id': worker_id,
+                    'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+                    'attempts': TranslationJob.attempts + 1,
+                    'updated_at': now,
+                }, synchronize_session=False)
+                db.session.commit()
+                if updated == 1:
+                    claimed.append(job_id)
+            jobs = []
+            for job_id in claimed:
+                job = db.session.get(TranslationJob, job_id)
+                if job is None:
+                    continue
+                if (job.attempts or 0) > self.max_attempts:
+                    # Crashed workers keep dying on this job: stop requeueing it
+                    job.status = 'failed'
+                    job.message = 'Failed'
+                    job.error = f'Job abandoned after {job.attempts - 1} attempts'
+                    job.lease_expires_at = None
+                    db.session.commit()
+                    continue
+                jobs.append(self._to_dict(job))
+        if claimed:
+            self._notify(*claimed)
+        return jobs
+
+    def queue_position(self, job):
+        """1-based position of a pending job in the lease order, None once it runs."""
+        if not job or job.get('status') != 'pending':
+            return None
+        tag = job.get('virtual_start') or 0.0
+        with self._context():
+            # Same order as lease(): virtual_start, then created_at
+            ahead = TranslationJob.query.filter(
+                TranslationJob.status == 'pending',
+                db.or_(
+                    db.func.coalesce(TranslationJob.virtual_start, 0.0) < tag,
+                    db.and_(db.func.coalesce(TranslationJob.virtual_start, 0.0) == tag,
+                            TranslationJob.created_at < job['created_at']),
+                ),
+            ).count()
+            return ahead + 1
+
+    def heartbeat(self, job_ids, worker_id):
+        """Extend the lease of jobs held by worker_id.
+
+        Returns {job_id: cancel_requested} for jobs whose lease is still held; jobs missing
+        from the result were lost (requeued to another worker) and must stop.
+        """
+        if not job_ids:
+            return {}
+        now = datetime.utcnow()
+        with self._context():
+            TranslationJob.query.filter(
+                TranslationJob.id.in_(list(job_ids)),
+                TranslationJob.worker_id == worker_id,
+                TranslationJob.status.in_(('in_progress', 'cancelling')),
+            ).update({
+                'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+            }, synchronize_session=False)
+            db.session.commit()
+            rows = TranslationJob.query.with_entities(TranslationJob.id, TranslationJob.cancel_requested).filter(
+                TranslationJob.id.in_(list(job_ids)),
+                TranslationJob.worker_id == worker_id,
+                TranslationJob.status.in_(('in_progress', 'cancelling')),
+            ).all()
+            return {row.id: bool(row.cancel_requested) for row in rows}
+
+    def finish(self, job_id, worker_id, status, **fields):
+        """Move a leased job to a final status and release its lease."""
+        fields['status'] = status
+        values = {k: v for k, v in fields.items() if k in _MUTABLE_FIELDS}
+        values['lease_expires_at'] = None
+        values['updated_at'] = datetime.utcnow()
+        with self._context():
+            updated = TranslationJob.query.filter(
+                TranslationJob.id == job_id,
+                TranslationJob.worker_id == worker_id,
+            ).update(values, synchronize_session=False)
+            db.session.commit()
+        self._notify(job_id)
+        return updated == 1
+
+    def release(self, job_ids, worker_id):
+        """Hand running jobs of worker_id back to the queue (worker shutting down).
+
+        The attempt is not counted, and the job is leased again at once instead of after
+        its lease expires. Jobs being cancelled are left to finish their cancellation.
+        Returns the ids that were requeued.
+        """
+        if not job_ids:
+            return []
+        now = datetime.utcnow()
+        released = []
+        with self._context():
+            for job_id in job_ids:
+                updated = TranslationJob.query.filter(
+                    TranslationJob.id == job_id,
+                    TranslationJob.worker_id == worker_id,
+                    TranslationJob.status == 'in_progress',
+                ).update({
+                    'status': 'pending',
+                    'worker_id': None,
+                    'lease_expires_at': None,
+                    'attempts': db.case((TranslationJob.attempts > 0, TranslationJob.attempts - 1), else_=0),
+                    'message': 'Requeued',
+                    'updated_at': now,
+                }, synchronize_session=False)
+                if updated:
+                    released.append(job_id)
+            db.session.commit()
+        if released:
+            self._notify(*released)
+        return released
+
+    def request_cancel(self, job_id):
+        """Flag a job as cancelled. Pending jobs are cancelled at once; running ones are
+        picked up by their worker on the next heartbeat. Returns the new status or None
+        if the job is already finished."""
+        now = datetime.utcnow()
+        with self._context():
+            pending = TranslationJob.query.filter(
+                TranslationJob.id == job_id, TranslationJob.status == 'pending'
+            ).update({
+                'status': 'cancelled', 'message': 'Cancelled', 'cancel_requested': True, 'updated_at': now,
+            }, synchronize_session=False)
+            if pending:
+                db.session.commit()
+                self._notify(job_id)
+                return 'cancelled'
+            running = TranslationJob.query.filter(
+                TranslationJob.id == job_id, TranslationJob.status.in_(('in_progress', 'cancelling'))
+            ).update({
+                'status': 'cancelling', 'message': 'Cancelling', 'cancel_requested': True, 'updated_at': now,
+            }, synchronize_session=False)
+            db.session.commit()
+        self._notify(job_id)
+        return 'cancelling' if running else None
@@ -0,0 +1,146 @@
+import os
+import socket
+import time
+import threading
+import uuid
+
+
+class JobWorker:
+    """Leases document jobs from the JobStore and runs them on local threads.
+
+    One instance runs inside the API process (embedded mode) or in the standalone
+    worker.py process. A heartbeat thread keeps leases alive and relays cancellation
+    requests written by any API node to the running job. drain() is the shutdown path:
+    no new leases, running jobs get a grace period and the rest go back to the queue.
+    """
+
+    def __init__(self, service, store, max_jobs=8, poll_interval=1.0, heartbeat_interval=None):
+        self.service = service
+        self.store = store
+        self.max_jobs = max(1, int(max_jobs))
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval or max(1.0, store.lease_seconds / 3.0)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._active = {}  # job_id -> threading.Event (cancel signal)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closing = threading.Event()  # no new leases; heartbeats go on until _stop
+        self._threads = []
+
+    def start(self):
+        """Start the lease and heartbeat loops on daemon threads."""
+        if self._threads:
+            return
+        for target in (self._lease_loop, self._heartbeat_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def run_forever(self, drain_timeout=30.0):
+        """Blocking variant used by worker.py; returns after close() (SIGTERM) or Ctrl+C, drained."""
+        self.start()
+        try:
+            while not self._closing.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.drain(drain_timeout)
+
+    def stop(self):
+        self._closing.set()
+        self._stop.set()
+        self._wake.set()
+
+    def close(self):
+        """Stop leasing new jobs; running jobs go on (see drain)."""
+        self._closing.set()
+        self._wake.set()
+
+    def drain(self, timeout=30.0):
+        """Close, wait up to timeout for running jobs, then requeue the rest and stop.
+
+        Requeued jobs are released in the store before their threads are signalled, so
+        the interrupted run neither finishes them as cancelled nor deletes their files.
+        Returns the ids of the requeued jobs.
+        """
+        self.close()
+        deadline = time.monotonic() + max(0.0, timeout)
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._active:
+                    break
+            time.sleep(0.2)
+        with self._lock:
+            active = dict(self._active)
+        released = []
+        if active:
+            try:
+                released = self.store.release(list(active), self.worker_id)
+            except Exception as e:
+                print(f"Job release failed: {e}")
+            for job_id in released:
+                active[job_id].set()
+        self.stop()
+        return released
+
+    def wake(self):
+        """Nudge the lease loop after a job was enqueued by this process."""
+        self._wake.set()
+
+    def cancel_local(self, job_id):
+        """Fast path: signal a job running in this process without waiting for a heartbeat."""
+        with self._lock:
+            event = self._active.get(job_id)
+        if event is not None:
+            event.set()
+            return True
+        return False
+
+    def _lease_loop(self):
+        while not self._closing.is_set():
+            with self._lock:
+                free = self.max_jobs - len(self._active)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = self.store.lease(self.worker_id, limit=free)
+                except Exception as e:
+                    print(f"Job lease failed: {e}")
+            for job in jobs:
+                cancel_event = threading.Event()
+                if job.get('cancel_requested'):
+                    cancel_event.set()
+                with self._lock:
+                    self._active[job['id']] = cancel_event
+                t = threading.Thread(target=self._run, args=(job, cancel_event), daemon=True)
+                t.start()
+            if not jobs:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _run(self, job, cancel_event):
+        try:
+            self.service.run_job(job, self.worker_id, cancel_event)
+        except Exception as e:
+            print(f"Job {job['id']} crashed: {e}")
+        finally:
+            with self._lock:
+                self._active.pop(job['id'], None)
+            self._wake.set()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            try:
+                held = self.store.heartbeat(list(active), self.worker_id)
+            except Exception as e:
+                print(f"Job heartbeat failed: {e}")
+                continue
+            for job_id, event in active.items():
+                # Lost lease (requeued elsewhere) or cancellation requested: stop the job
+                if held.get(job_id, True):
+                    event.set()
@@ -1,4 +1,3 @@
-import requests
 import os
 import hashlib
 import hmac
@@ -27,7 +26,7 @@ class PaymentService:
         signature = self._generate_signature(payment_data)
         payment_data['signature'] = signature
         
-        # In real implementation:
+        # In real implementation (import requests here, it is not needed at startup):
         # response = requests.post(f"{self.base_url}/api/v1/payment/create", json=payment_data)
         # return response.json()['payment_url']
         
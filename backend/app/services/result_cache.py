@@ -0,0 +1,178 @@
+import os
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+# Bump whenever parse/translate/rebuild changes what a given input produces,
+# so outputs of the old pipeline stop being served.
+PIPELINE_VERSION = '2'
+# Outputs worth storing a gzip variant for (docx/xlsx are zip archives, PDFs compress their streams)
+PRECOMPRESS_EXTENSIONS = ('.txt',)
+PRECOMPRESS_MIN_BYTES = 1024
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Content-addressed store for translated documents under downloads/results.
+
+    Outputs are keyed by (source file hash, target_lang, model, PIPELINE_VERSION), so a
+    repeat upload of the same file completes instantly and identical results are stored
+    once. Jobs write into a private staging folder and commit() moves the output into
+    place, so concurrent jobs never overwrite each other. Outputs that must not be
+    shared (some segments failed) are kept per job by keep_private(). The tree is kept
+    under max_bytes by evicting the least recently used entries; lookups and downloads
+    (mark_used) count as use, and entries holding the output of a recently completed job
+    (pinned) are never evicted.
+    """
+
+    def __init__(self, download_folder, max_bytes=5 * 1024 ** 3, evict_interval=60, pinned=None):
+        self.root = os.path.join(download_folder, 'results')
+        self.staging_root = os.path.join(self.root, '.staging')
+        self.private_root = os.path.join(self.root, '.jobs')
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self._last_evict = 0.0
+        # Callable returning the output paths that must stay (see TranslationService.init_app)
+        self.pinned = pinned
+        self._lock = threading.Lock()
+        os.makedirs(self.staging_root, exist_ok=True)
+
+    @staticmethod
+    def key(file_hash, target_lang, model):
+        raw = f"{file_hash}|{str(target_lang).strip().lower()}|{model or ''}|{PIPELINE_VERSION}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def lookup(self, key):
+        """Return the cached output path for key, or None. Marks the entry as recently used."""
+        manifest = os.path.join(self._entry_dir(key), 'manifest.json')
+        try:
+            with open(manifest, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(self._entry_dir(key), data.get('output', ''))
+        if not data.get('output') or not os.path.isfile(path):
+            return None
+        try:
+            os.utime(manifest, None)
+        except OSError:
+            pass
+        return path
+
+    @staticmethod
+    def mark_used(path):
+        """Mark the cache entry holding output path as recently used (it was downloaded)."""
+        manifest = os.path.join(os.path.dirname(path), 'manifest.json')
+        try:
+            os.utime(manifest, None)
+        except OSError:
+            pass  # per-job output, nothing to refresh
+
+    def staging_dir(self, job_id):
+        path = os.path.join(self.staging_root, str(job_id))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def discard_staging(self, job_id):
+        shutil.rmtree(os.path.join(self.staging_root, str(job_id)), ignore_errors=True)
+
+    def commit(self, key, job_id, staged_path):
+        """Move a finished output from staging into the cache and return its final path."""
+        entry = self._entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        name = os.path.basename(staged_path)
+        final_path = os.path.join(entry, name)
+        with self._lock:
+            existing = self.lookup(key)
+            if existing:
+                # Another job produced the same result meanwhile: keep one copy
+                self.discard_staging(job_id)
+                return existing
+            os.replace(staged_path, final_path)
+            self._precompress(final_path)
+            tmp = os.path.join(entry, 'manifest.json.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'output': name, 'created_at': time.time()}, f)
+            os.replace(tmp, os.path.join(entry, 'manifest.json'))
+        self.discard_staging(job_id)
+        self.maybe_evict()
+        return final_path
+
+    @staticmethod
+    def _precompress(path):
+        """Write <path>.gz so downloads can be served compressed without per-request work."""
+        if not path.lower().endswith(PRECOMPRESS_EXTENSIONS) or os.path.getsize(path) < PRECOMPRESS_MIN_BYTES:
+            return
+        try:
+            with open(path, 'rb') as src, gzip.open(path + '.gz.tmp', 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(path + '.gz.tmp', path + '.gz')
+        except OSError as e:
+            print(f"Precompressing {path} failed: {e}")
+
+    def keep_private(self, job_id, staged_path):
+        """Move an output that must not be served from the cache to a folder of its own job."""
+        folder = os.path.join(self.private_root, str(job_id))
+        os.makedirs(folder, exist_ok=True)
+        final_path = os.path.join(folder, os.path.basename(staged_path))
+        os.replace(staged_path, final_path)
+        self.discard_staging(job_id)
+        self.maybe_evict()
+        return final_path
+
+    def maybe_evict(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_evict < self.evict_interval:
+            return
+        self._last_evict = now
+        try:
+            self.evict()
+        except OSError as e:
+            print(f"Result cache eviction failed: {e}")
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or shard.name == '.staging':
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.is_dir():
+                    continue
+                size = 0
+                for f in os.scandir(entry.path):
+                    if f.is_file():
+                        size += f.stat().st_size
+                try:
+                    last_used = os.stat(os.path.join(entry.path, 'manifest.json')).st_mtime
+                except OSError:
+                    # Per-job output, or an entry whose commit never finished
+                    last_used = entry.stat().st_mtime
+                entries.append((last_used, size, entry.path))
+                total += size
+        if total <= self.max_bytes:
+            return
+        # Job status still hands out links to these; evicting them would break the download
+        pinned = {os.path.dirname(os.path.abspath(p)) for p in self.pinned()} if self.pinned else set()
+        with self._lock:
+            for last_used, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if os.path.abspath(path) in pinned:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import time
+import tempfile
+import threading
+
+try:  # POSIX only; elsewhere the thread lock still serializes writers of this process
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Version markers commonly appended to revised uploads: "contract_v2", "contract-rev3",
+# "contract (1)", "contract_final"... they all belong to the same lineage "contract".
+_VERSION_SUFFIX_RE = re.compile(
+    r'([\s._-]*(v|ver|version|rev|revision|r)[\s._-]?\d+|[\s._-]*\(\d+\)|[\s._-]*(final|draft|copy))+$',
+    re.IGNORECASE,
+)
+
+
+def lineage_key(filename):
+    """Normalize an uploaded filename to its lineage (version markers stripped, extension kept)."""
+    name, ext = os.path.splitext(os.path.basename(filename or ''))
+    base = _VERSION_SUFFIX_RE.sub('', name).strip(' ._-') or name
+    return f"{base.lower()}{ext.lower()}"
+
+
+class RevisionStore:
+    """Stores the segment translations of finished document jobs.
+
+    A later upload of the same document (same user and filename lineage, or an explicit
+    base_job_id) loads these segments into a SegmentMemory so only inserted or changed
+    segments are sent to the provider.
+
+    Anonymous jobs are never entered in the lineage index: with no user to scope it,
+    they would share one namespace, so their revisions are only reachable through their
+    own job id. Records older than max_age seconds, and the oldest beyond max_count, are
+    pruned. Writers in every process serialize on index.lock.
+    """
+
+    def __init__(self, folder, max_age=30 * 86400, max_count=10000, prune_interval=3600):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+        self._index_path = os.path.join(self.folder, 'index.json')
+        self._lock_path = os.path.join(self.folder, 'index.lock')
+        self.max_age = max_age
+        self.max_count = max_count
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, job_id):
+        # job ids are uuids; never let a caller-provided id escape the folder
+        safe = re.sub(r'[^A-Za-z0-9_-]', '', str(job_id or ''))
+        return os.path.join(self.folder, f"{safe}.json") if safe else None
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_json(self, path, data):
+        # Unique name per writer, in the same folder so os.replace stays atomic
+        fd, tmp = tempfile.mkstemp(dir=self.folder, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _index_key(user_id, filename, target_lang):
+        return f"{user_id or ''}|{lineage_key(filename)}|{str(target_lang or '').strip().lower()}"
+
+    def save(self, job_id, user_id, filename, target_lang, segments):
+        path = self._path(job_id)
+        if not path:
+            return
+        record = {
+            'job_id': job_id,
+            'user_id': user_id,
+            'filename': filename,
+            'target_lang': target_lang,
+            'segments': segments,
+        }
+        self._write_json(path, record)
+        if user_id is None and time.monotonic() - self._last_prune < self.prune_interval:
+            return
+        with self._lock, open(self._lock_path, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            index = self._read_index()
+            if user_id is not None:
+                index[self._index_key(user_id, filename, target_lang)] = job_id
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self._last_prune = time.monotonic()
+                live = self._prune()
+                index = {k: v for k, v in index.items() if v in live}
+            self._write_json(self._index_path, index)
+
+    def _prune(self):
+        """Delete expired records and the oldest beyond max_count; returns the job ids kept."""
+        records = []
+        for entry in os.scandir(self.folder):
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if entry.name.startswith('.'):
+                # Temp file of a writer that died before its os.replace
+                if entry.name.endswith('.tmp') and mtime < time.time() - 3600:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                continue
+            if entry.name != 'index.json' and entry.name.endswith('.json'):
+                records.append((mtime, entry.name))
+        records.sort(reverse=True)
+        cutoff = time.time() - self.max_age if self.max_age else None
+        live = set()
+        for i, (mtime, name) in enumerate(records):
+            if (cutoff is not None and mtime < cutoff) or (self.max_count and i >= self.max_count):
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+            else:
+                live.add(name[:-len('.json')])
+        return live
+
+    def load(self, job_id):
+        path = self._path(job_id)
+        if not path:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def find_latest(self, user_id, filename, target_lang):
+        """Return the job id of the latest revision in this filename lineage, or None."""
+        if user_id is None:
+            return None
+        # index.json is only ever replaced whole, so reading it needs no lock
+        return self._read_index().get(self._index_key(user_id, filename, target_lang))
@@ -0,0 +1,146 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.orm import Session
+from app.models import db, Translation, TranslationArchive, UsageRollup
+from app.utils.metrics import DB_QUERY_SECONDS
+
+# Longest window /api/history/stats aggregates over
+MAX_DAYS = 366
+KINDS = ('text', 'document')
+
+
+def _key(user_id, created_at, source_lang, target_lang, file_path):
+    day = (created_at or datetime.utcnow()).date()
+    return user_id, day, source_lang or '', target_lang or '', 'document' if file_path else 'text'
+
+
+def _totals(counts):
+    out = {kind: counts.get(kind, 0) for kind in KINDS}
+    out['total'] = sum(out.values())
+    return out
+
+
+class UsageRollups:
+    """Usage per user, UTC day, language pair and kind (table usage_rollup).
+
+    A session after_flush hook adds every new Translation to its rollup row with one upsert
+    per flush, in the same transaction as the insert, so /api/history/stats reads a few
+    primary-key rows instead of grouping raw history. Rollups count translations made:
+    deleting or archiving history does not lower them. rebuild() recomputes them from
+    translation and translation_archive; migrations run it while the table is empty.
+    """
+
+    def __init__(self):
+        self._listening = False
+
+    def init_app(self, app):
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            self._listening = True
+
+    def ensure_filled(self, engine, strict=False):
+        """Fill an empty rollup table from existing history (migrate_database)."""
+        try:
+            with engine.begin() as conn:
+                if conn.execute(select(UsageRollup.user_id).limit(1)).first() is None:
+                    self.rebuild(conn)
+        except Exception as e:
+            if strict:
+                raise
+            print(f"[WARN] Usage rollup backfill failed: {e}")
+
+    def _after_flush(self, session, flush_context):
+        counts = Counter(
+            _key(o.user_id, o.created_at, o.source_lang, o.target_lang, o.file_path)
+            for o in session.new if isinstance(o, Translation) and o.user_id is not None
+        )
+        if counts:
+            self._increment(session.connection(), counts)
+
+    def count_rows(self, conn, rows):
+        """Count rows inserted outside the ORM: (user_id, created_at, source_lang, target_lang, file_path)."""
+        counts = Counter(_key(*r) for r in rows if r[0] is not None)
+        if counts:
+            self._increment(conn, counts)
+
+    def rebuild(self, conn, user_id=None, batch_size=5000):
+        """Recompute rollups (of one user or everyone) from live and archived history."""
+        table = UsageRollup.__table__
+        conn.execute(delete(table).where(table.c.user_id == user_id) if user_id else delete(table))
+        for model in (Translation, TranslationArchive):
+            t = model.__table__
+            last_id = 0
+            while True:
+                query = select(t.c.id, t.c.user_id, t.c.created_at, t.c.source_lang, t.c.target_lang, t.c.file_path) \
+                    .where(t.c.id > last_id, t.c.user_id.isnot(None)).order_by(t.c.id).limit(batch_size)
+                if user_id:
+                    query = query.where(t.c.user_id == user_id)
+                rows = conn.execute(query).fetchall()
+                if not rows:
+                    break
+                self._increment(conn, Counter(_key(*r[1:]) for r in rows))
+                last_id = rows[-1][0]
+
+    @staticmethod
+    def _increment(conn, counts):
+        table = UsageRollup.__table__
+        params = [
+            {'user_id': u, 'day': d, 'source_lang': s, 'target_lang': t, 'kind': k, 'count': n}
+            for (u, d, s, t, k), n in counts.items()
+        ]
+        dialect = conn.dialect.name
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table)
+            conn.execute(stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted.count), params)
+        elif dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=list(table.primary_key.columns),
+                set_={'count': table.c.count + stmt.excluded.count},
+            ), params)
+        else:
+            for p in params:
+                match = [table.c[name] == p[name] for name in ('user_id', 'day', 'source_lang', 'target_lang', 'kind')]
+                if not conn.execute(table.update().where(*match).values(count=table.c.count + p['count'])).rowcount:
+                    conn.execute(table.insert().values(**p))
+
+    @DB_QUERY_SECONDS.labels('history_stats').time()
+    def stats(self, user_id, days=30):
+        """Totals for today, the last `days` UTC days (per day and per language pair) and all time."""
+        days = max(1, min(int(days or 30), MAX_DAYS))
+        today = datetime.utcnow().date()
+        start = today - timedelta(days=days - 1)
+        rows = db.session.query(
+            UsageRollup.day, UsageRollup.source_lang, UsageRollup.target_lang, UsageRollup.kind, UsageRollup.count,
+        ).filter(UsageRollup.user_id == user_id, UsageRollup.day >= start).all()
+        all_time = db.session.query(UsageRollup.kind, func.sum(UsageRollup.count)) \
+            .filter(UsageRollup.user_id == user_id).group_by(UsageRollup.kind).all()
+
+        by_day = {start + timedelta(days=i): Counter() for i in range(days)}
+        by_pair, period = {}, Counter()
+        for day, source_lang, target_lang, kind, count in rows:
+            if day in by_day:
+                by_day[day][kind] += count
+            by_pair.setdefault((source_lang, target_lang), Counter())[kind] += count
+            period[kind] += count
+        pairs = [dict(_totals(c), source_lang=s or None, target_lang=t or None) for (s, t), c in by_pair.items()]
+        pairs.sort(key=lambda p: -p['total'])
+        return {
+            'days': days,
+            'from': start.isoformat(),
+            'to': today.isoformat(),
+            'today': _totals(by_day[today]),
+            'period': _totals(period),
+            'all_time': _totals({kind: int(n or 0) for kind, n in all_time}),
+            'by_day': [dict(_totals(c), date=day.isoformat()) for day, c in by_day.items()],
+            'by_pair': pairs,
+        }
+
+
+usage_rollups = UsageRollups()
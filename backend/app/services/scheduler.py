@@ -0,0 +1,238 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, wait as wait_futures
+
+# Relative share of the global segment budget per User.plan
+DEFAULT_PLAN_WEIGHTS = {'free': 1, 'pro': 3, 'promax': 6}
+
+
+def parse_plan_weights(value):
+    """Parse 'free:1,pro:3,promax:6' into a dict, falling back to the defaults."""
+    weights = dict(DEFAULT_PLAN_WEIGHTS)
+    for part in str(value or '').split(','):
+        name, _, w = part.partition(':')
+        try:
+            if name.strip():
+                weights[name.strip().lower()] = max(1, int(w))
+        except ValueError:
+            continue
+    return weights
+
+
+class _Task:
+    __slots__ = ('lane', 'fn', 'args', 'future')
+
+    def __init__(self, lane, fn, args):
+        self.lane = lane
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+
+
+class _UserQueue:
+    def __init__(self, weight, start_pass):
+        self.weight = max(1, weight)
+        self.pass_value = start_pass
+        self.jobs = OrderedDict()  # job_key -> deque[_Task], rotated round-robin
+
+
+class SchedulerLane:
+    """Executor-like handle for one document job.
+
+    Offers submit()/shutdown() and the context-manager protocol of ThreadPoolExecutor so
+    FileService can use it in place of a per-job pool, but tasks run on the scheduler's
+    shared workers.
+    """
+
+    def __init__(self, scheduler, job_key, user_key, weight):
+        self.scheduler = scheduler
+        self.job_key = job_key
+        self.user_key = user_key
+        self.weight = weight
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        future = self.scheduler._enqueue(self, fn, args)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        if cancel_futures:
+            self.scheduler._drop_job(self.job_key, self.user_key)
+        if wait:
+            with self._lock:
+                pending = list(self._futures)
+            wait_futures(pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
+        return False
+
+
+class SegmentScheduler:
+    """Segment-concurrency budget shared by every document job in this process.
+
+    The budget is per process and nothing coordinates it across processes: configure()
+    divides the node total (SCHEDULER_CONCURRENCY) by the number of processes running
+    jobs (SCHEDULER_PROCESSES), so gunicorn workers with embedded jobs or several
+    worker.py instances together stay near the configured number of provider calls.
+
+    Users are served by stride scheduling weighted by plan (a pro user gets 3x the
+    segment throughput of a free user while both have work queued); jobs of the same
+    user are served round-robin. A 900-page upload therefore only delays the other
+    jobs of its own user.
+    """
+
+    def __init__(self, concurrency=8, plan_weights=None):
+        self.concurrency = max(1, int(concurrency))
+        self.plan_weights = dict(plan_weights or DEFAULT_PLAN_WEIGHTS)
+        self._cond = threading.Condition()
+        self._users = {}  # user_key -> _UserQueue
+        self._running = {}  # job_key -> segments currently on a worker
+        self._completions = deque(maxlen=512)  # monotonic timestamps, for throughput/ETA
+        self._threads = []
+
+    def configure(self, concurrency=None, plan_weights=None, processes=1):
+        """Adjust settings from app config; only effective before the first submit.
+
+        concurrency is the total for all `processes` processes; this one gets its share.
+        """
+        with self._cond:
+            if concurrency and not self._threads:
+                self.concurrency = max(1, int(concurrency) // max(1, int(processes or 1)))
+            if plan_weights:
+                self.plan_weights = dict(plan_weights)
+
+    def after_fork(self):
+        """Forget the parent's threads and queues; workers restart with the next submit."""
+        self._cond = threading.Condition()
+        self._users = {}
+        self._running = {}
+        self._completions = deque(maxlen=512)
+        self._threads = []
+
+    def weight_for(self, plan):
+        return self.plan_weights.get((plan or 'free').lower(), 1)
+
+    def lane(self, job_key, user_key=None, weight=1):
+        return SchedulerLane(self, job_key, user_key or f"anon:{job_key}", weight)
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._worker_loop, name=f"segment-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _enqueue(self, lane, fn, args):
+        task = _Task(lane, fn, args)
+        with self._cond:
+            self._ensure_started()
+            user = self._users.get(lane.user_key)
+            if user is None:
+                # Join at the current minimum pass so idle users don't bank credit
+                start = min((u.pass_value for u in self._users.values()), default=0.0)
+                user = self._users[lane.user_key] = _UserQueue(lane.weight, start)
+            user.weight = max(1, lane.weight)
+            user.jobs.setdefault(lane.job_key, deque()).append(task)
+            self._cond.notify()
+        return task.future
+
+    def _drop_job(self, job_key, user_key):
+        with self._cond:
+            user = self._users.get(user_key)
+            tasks = user.jobs.pop(job_key, None) if user else None
+            if user is not None and not user.jobs:
+                self._users.pop(user_key, None)
+        for task in tasks or ():
+            task.future.cancel()
+
+    def _next_task(self):
+        # Caller holds self._cond
+        if not self._users:
+            return None
+        user_key = min(self._users, key=lambda k: self._users[k].pass_value)
+        user = self._users[user_key]
+        job_key, tasks = next(iter(user.jobs.items()))
+        task = tasks.popleft()
+        # Rotate this job to the back so the user's jobs take turns
+        user.jobs.move_to_end(job_key)
+        if not tasks:
+            del user.jobs[job_key]
+        user.pass_value += 1.0 / user.weight
+        if not user.jobs:
+            del self._users[user_key]
+        self._running[job_key] = self._running.get(job_key, 0) + 1
+        return task
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait()
+                    task = self._next_task()
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(task.fn(*task.args))
+                    except BaseException as e:
+                        task.future.set_exception(e)
+            finally:
+                with self._cond:
+                    job_key = task.lane.job_key
+                    self._running[job_key] -= 1
+                    if self._running[job_key] <= 0:
+                        del self._running[job_key]
+                    self._completions.append(time.monotonic())
+
+    def _throughput(self):
+        """Completed segments per second over the recent window (None if unknown)."""
+        now = time.monotonic()
+        # Ignore completions from before an idle gap
+        while self._completions and now - self._completions[0] > 60:
+            self._completions.popleft()
+        if len(self._completions) < 2:
+            return None
+        span = now - self._completions[0]
+        return len(self._completions) / span if span > 0 else None
+
+    def stats(self, job_key):
+        """Queue depth and ETA for one job: {queued, running, eta_seconds}."""
+        with self._cond:
+            queued = 0
+            owner = None
+            for user in self._users.values():
+                tasks = user.jobs.get(job_key)
+                if tasks is not None:
+                    queued = len(tasks)
+                    owner = user
+                    break
+            running = self._running.get(job_key, 0)
+            rate = self._throughput()
+            eta = None
+            remaining = queued + running
+            if remaining == 0:
+                eta = 0
+            elif rate:
+                # Expected share of the global budget: weighted by plan, split across the user's jobs
+                total_weight = sum(u.weight for u in self._users.values()) or 1
+                share = (owner.weight / total_weight / max(1, len(owner.jobs))) if owner else 1.0 / max(1, len(self._running))
+                eta = int(round(remaining / max(rate * min(1.0, share), 1e-6)))
+            return {'queued': queued, 'running': running, 'eta_seconds': eta}
+
+    def depth(self):
+        with self._cond:
+            return sum(len(t) for u in self._users.values() for t in u.jobs.values())
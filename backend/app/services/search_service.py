@@ -0,0 +1,280 @@
+import re
+import html
+import base64
+import unicodedata
+from datetime import datetime
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+from app.models import db, Translation, TranslationArchive
+from app.utils.metrics import DB_QUERY_SECONDS
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+SNIPPET_CHARS = 160
+MAX_PAGE_SIZE = 50
+MAX_TERMS = 8
+
+
+def fold(value):
+    """Lowercase, strip accents and map đ to d, so "hop dong" finds "Hợp đồng"."""
+    value = unicodedata.normalize('NFD', str(value or '').replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(c for c in value if not unicodedata.combining(c)).lower()
+
+
+def _terms(query):
+    return _WORD_RE.findall(fold(query))[:MAX_TERMS]
+
+
+def _encode_cursor(*parts):
+    raw = '|'.join(str(p) for p in parts).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, kind):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        key, translation_id = raw.rsplit('|', 1)
+        return (float(key) if kind == 'relevance' else key), int(translation_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def highlight(value, terms, width=SNIPPET_CHARS):
+    """HTML snippet of value around the first matching word, matches wrapped in <mark>."""
+    value = value or ''
+    spans = [m.span() for m in _WORD_RE.finditer(value) if any(fold(m.group()).startswith(t) for t in terms)]
+    start = 0
+    if spans and len(value) > width:
+        start = max(0, spans[0][0] - width // 4)
+    end = min(len(value), start + width)
+    out, pos = [], start
+    for s, e in spans:
+        if s < start or e > end:
+            continue
+        out.append(html.escape(value[pos:s]))
+        out.append('<mark>' + html.escape(value[s:e]) + '</mark>')
+        pos = e
+    out.append(html.escape(value[pos:end]))
+    return ('…' if start > 0 else '') + ''.join(out) + ('…' if end < len(value) else '')
+
+
+class SearchIndex:
+    """Full-text index over users' translation history (table translation_search).
+
+    MySQL keeps an InnoDB FULLTEXT index, SQLite an FTS5 table; both hold accent-folded
+    copies of the texts of rows with an owner, written in the same transaction as the
+    Translation insert/update/delete by a session after_flush hook. Other databases fall
+    back to an unindexed LIKE scan. Results are ranked (BM25 / MATCH score) or newest
+    first, paginated by keyset cursors.
+    """
+
+    TABLE = 'translation_search'
+
+    def __init__(self):
+        self.dialect = None
+        self._listening = False
+
+    def init_app(self, app):
+        with app.app_context():
+            self.dialect = db.engine.dialect.name
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            self._listening = True
+
+    @property
+    def indexed(self):
+        return self.dialect in ('mysql', 'sqlite')
+
+    def ensure_schema(self, engine, strict=False):
+        """Create the index table if missing and fill it from existing history (migrate_database)."""
+        try:
+            self._create(engine)
+        except Exception as e:
+            if strict:
+                raise
+            print(f"[WARN] Search index unavailable: {e}")
+            self.dialect = None
+
+    def _create(self, engine):
+        dialect = engine.dialect.name
+        with engine.begin() as conn:
+            exists = engine.dialect.has_table(conn, self.TABLE)
+            if dialect == 'sqlite' and not exists:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {self.TABLE} USING fts5("
+                    "original_text, translated_text, owner, translation_id UNINDEXED, created_at UNINDEXED, "
+                    "tokenize='unicode61 remove_diacritics 2')"
+                ))
+            elif dialect == 'mysql' and not exists:
+                conn.execute(text(
+                    f"CREATE TABLE {self.TABLE} ("
+                    "translation_id INT PRIMARY KEY, user_id INT NOT NULL, created_at DATETIME, "
+                    "original_text LONGTEXT, translated_text LONGTEXT, "
+                    "INDEX ix_translation_search_user (user_id, created_at), "
+                    "FULLTEXT KEY ft_translation_search (original_text, translated_text)"
+                    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+                ))
+            self.dialect = dialect
+            if self.indexed and not exists:
+                self._backfill(conn)
+
+    def _backfill(self, conn, batch_size=1000):
+        # Typed select: stored texts may be compressed (CompressedText)
+        t = Translation.__table__
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                select(t.c.id, t.c.user_id, t.c.original_text, t.c.translated_text, t.c.created_at)
+                .where(t.c.id > last_id, t.c.user_id.isnot(None)).order_by(t.c.id).limit(batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            self._insert(conn, rows)
+            last_id = rows[-1][0]
+
+    def _insert(self, conn, rows):
+        params = [{
+            'id': r[0], 'owner': f"u{r[1]}", 'user_id': r[1],
+            'original': fold(r[2]), 'translated': fold(r[3]), 'created_at': self._timestamp(r[4]),
+        } for r in rows if r[1] is not None]
+        if not params:
+            return
+        if self.dialect == 'sqlite':
+            conn.execute(text(
+                f"INSERT INTO {self.TABLE} (original_text, translated_text, owner, translation_id, created_at) "
+                "VALUES (:original, :translated, :owner, :id, :created_at)"
+            ), params)
+        else:
+            conn.execute(text(
+                f"INSERT INTO {self.TABLE} (translation_id, user_id, created_at, original_text, translated_text) "
+                "VALUES (:id, :user_id, :created_at, :original, :translated)"
+            ), params)
+
+    def _timestamp(self, value):
+        # FTS5 columns are untyped: keep the text form SQLAlchemy uses, so keyset comparisons hold
+        if self.dialect == 'sqlite' and isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+        return value
+
+    def _delete(self, conn, ids):
+        if ids:
+            conn.execute(text(f"DELETE FROM {self.TABLE} WHERE translation_id = :id"), [{'id': i} for i in ids])
+
+    def _after_flush(self, session, flush_context):
+        if not self.indexed:
+            return
+        added = [o for o in session.new if isinstance(o, Translation)]
+        changed = [o for o in session.dirty if isinstance(o, Translation) and session.is_modified(o)]
+        # Archived rows stay searchable until they are deleted from the archive
+        removed = [o.id for o in session.deleted if isinstance(o, (Translation, TranslationArchive))]
+        if not (added or changed or removed):
+            return
+        conn = session.connection()
+        self._delete(conn, removed + [o.id for o in changed])
+        self._insert(conn, [(o.id, o.user_id, o.original_text, o.translated_text, o.created_at) for o in added + changed])
+
+    def index_rows(self, conn, rows):
+        """Index rows written outside the ORM: (id, user_id, original, translated, created_at)."""
+        if self.indexed:
+            self._insert(conn, rows)
+
+    @DB_QUERY_SECONDS.labels('history_search').time()
+    def search(self, user_id, query, cursor=None, limit=20, sort='relevance'):
+        terms = _terms(query)
+        if not terms:
+            raise ValueError('q is required')
+        limit = max(1, min(int(limit or 20), MAX_PAGE_SIZE))
+        sort = 'recent' if sort == 'recent' or not self.indexed else 'relevance'
+        after = _decode_cursor(cursor, sort) if cursor else None
+
+        if self.dialect == 'sqlite':
+            hits = self._search_sqlite(user_id, terms, after, limit + 1, sort)
+        elif self.dialect == 'mysql':
+            hits = self._search_mysql(user_id, ' '.join(terms), after, limit + 1, sort)
+        else:
+            hits = self._search_scan(user_id, terms, after, limit + 1)
+
+        has_more = len(hits) > limit
+        hits = hits[:limit]
+        rows = {}
+        for model in (Translation, TranslationArchive):
+            missing = [h[0] for h in hits if h[0] not in rows]
+            if missing:
+                rows.update((t.id, t) for t in model.query.filter(model.id.in_(missing)).all())
+        results = []
+        for translation_id, score, _ in hits:
+            t = rows.get(translation_id)
+            if not t:
+                continue
+            results.append({
+                'id': t.id,
+                'source_lang': t.source_lang,
+                'target_lang': t.target_lang,
+                'created_at': t.created_at.isoformat() if t.created_at else None,
+                'has_file': bool(t.file_path),
+                'score': score,
+                'original_highlight': highlight(t.original_text, terms),
+                'translated_highlight': highlight(t.translated_text, terms),
+            })
+        next_cursor = None
+        if has_more:
+            last_id, score, created_at = hits[-1]
+            next_cursor = _encode_cursor(repr(score) if sort == 'relevance' else created_at, last_id)
+        return {'results': results, 'has_more': has_more, 'next_cursor': next_cursor, 'sort': sort, 'indexed': self.indexed}
+
+    def _search_sqlite(self, user_id, terms, after, n, sort):
+        # Owner is a column of the FTS table, so the user filter is resolved by the index too
+        phrase = ' '.join(f'"{t}"*' for t in terms)
+        match = f'owner:"u{int(user_id)}" AND {{original_text translated_text}}:({phrase})'
+        score = f"bm25({self.TABLE}, 1.0, 1.0, 0.0)"
+        params = {'match': match, 'n': n}
+        where = ''
+        if sort == 'relevance':
+            # bm25 is lower-is-better; scores are exposed negated so higher is better
+            if after:
+                where = f" AND ({score} > :key OR ({score} = :key AND translation_id < :id))"
+                params.update(key=-after[0], id=after[1])
+            order = f"{score}, translation_id DESC"
+        else:
+            if after:
+                where = " AND (created_at < :key OR (created_at = :key AND translation_id < :id))"
+                params.update(key=after[0], id=after[1])
+            order = "created_at DESC, translation_id DESC"
+        rows = db.session.execute(text(
+            f"SELECT translation_id, {score}, created_at FROM {self.TABLE} "
+            f"WHERE {self.TABLE} MATCH :match{where} ORDER BY {order} LIMIT :n"
+        ), params).fetchall()
+        return [(int(r[0]), -r[1], str(r[2])) for r in rows]
+
+    def _search_mysql(self, user_id, query, after, n, sort):
+        score = "MATCH(original_text, translated_text) AGAINST (:q IN NATURAL LANGUAGE MODE)"
+        params = {'q': query, 'user_id': user_id, 'n': n}
+        where = ''
+        if sort == 'relevance':
+            if after:
+                where = f" AND ({score} < :key OR ({score} = :key AND translation_id < :id))"
+                params.update(key=after[0], id=after[1])
+            order = "score DESC, translation_id DESC"
+        else:
+            if after:
+                where = " AND (created_at < :key OR (created_at = :key AND translation_id < :id))"
+                params.update(key=after[0], id=after[1])
+            order = "created_at DESC, translation_id DESC"
+        rows = db.session.execute(text(
+            f"SELECT translation_id, {score} AS score, created_at FROM {self.TABLE} "
+            f"WHERE user_id = :user_id AND {score}{where} ORDER BY {order} LIMIT :n"
+        ), params).fetchall()
+        return [(int(r[0]), float(r[1]), str(r[2])) for r in rows]
+
+    def _search_scan(self, user_id, terms, after, n):
+        q = Translation.query.filter(Translation.user_id == user_id)
+        for term in terms:
+            like = f"%{term}%"
+            q = q.filter(db.or_(Translation.original_text.ilike(like), Translation.translated_text.ilike(like)))
+        if after:
+            q = q.filter(db.or_(Translation.created_at < after[0],
+                                db.and_(Translation.created_at == after[0], Translation.id < after[1])))
+        rows = q.order_by(Translation.created_at.desc(), Translation.id.desc()).limit(n).all()
+        return [(t.id, None, str(t.created_at)) for t in rows]
+
+
+search_index = SearchIndex()
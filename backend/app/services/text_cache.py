@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+
+class TextCache:
+    """Bounded LRU of text translations keyed by (model, source_lang, target_lang, text).
+
+    Shared by /text, the bulk endpoint and document segments of this process, so repeated
+    UI strings or boilerplate paragraphs are translated once. Only successful provider
+    results are stored.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max(0, int(max_entries))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, source_lang, target_lang, text):
+        return (model or '', (source_lang or 'auto').lower(), str(target_lang).strip().lower(), text)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.max_entries or not value:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,15 +1,22 @@
-import openai
-import deepl
 import os
 import threading
 import uuid
 import time
 import re
+import json
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
-from app.services.file_service import FileService, ProviderRateLimitError
-from deep_translator import MyMemoryTranslator, GoogleTranslator
-import requests
-import urllib.parse
+from app.services.file_service import FileService, ProviderRateLimitError, JobCancelledError, SegmentMemory
+from app.services.revision_service import RevisionStore
+from app.services.result_cache import ResultCache, file_sha256
+from app.services.document_formats import parsed_path
+from app.services.history_service import mark_document_history
+from app.services.text_cache import TextCache
+from app.services.job_store import JobStore
+from app.services.job_worker import JobWorker
+from app.services.scheduler import SegmentScheduler, parse_plan_weights
+from app.utils.metrics import CACHE_LOOKUPS, PROVIDER_REQUEST_SECONDS, SEGMENT_QUEUE_DEPTH
 
 # Load .env từ thư mục backend (app/services -> app -> backend)
 _backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -54,71 +61,141 @@ CODE_TO_NAME = {
     'my': 'Myanmar (Burmese)', 'km': 'Khmer', 'lo': 'Lao', 'tl': 'Filipino',
 }
 
+_UNSET = object()
+
+
+def _sanitize_key(val):
+    if not val:
+        return None
+    v = val.strip()
+    # Treat obvious placeholders or very-short values as absent
+    if v.lower().startswith('your-') or v.lower() in ('changeme', 'replace-me', '') or len(v) < 20:
+        return None
+    return v
+
+
 class TranslationService:
     def __init__(self):
-        def _sanitize_key(val):
-            if not val:
-                return None
-            v = val.strip()
-            # Treat obvious placeholders or very-short values as absent
-            if v.lower().startswith('your-') or v.lower() in ('changeme', 'replace-me', '') or len(v) < 20:
-                return None
-            return v
+        # Provider clients are built on first use (openai/deepl are slow to import), so
+        # importing the routes or starting a CLI script costs no SDK import
+        self._openai_client = _UNSET
+        self._deepl_translator = _UNSET
+        self._client_lock = threading.Lock()
+
+        # Pass translator callback into FileService so document processing can call
+        self.file_service = FileService(translator=self.translate_text)
+        # Durable job queue (translation_job table); bound to the app in init_app
+        self.job_store = JobStore()
+        self.worker = None
+        # One segment-concurrency budget for all document jobs of this process
+        self.scheduler = SegmentScheduler(int(os.getenv('SCHEDULER_CONCURRENCY', '8')))
+        # Segment translations of finished jobs, used for incremental re-translation of revisions
+        self.revisions = RevisionStore(os.path.join(self.file_service.upload_folder, '.revisions'))
+        # Finished documents by content, so a repeat upload completes without translating
+        self.results = ResultCache(
+            self.file_service.download_folder, int(os.getenv('RESULT_CACHE_MAX_BYTES', str(5 * 1024 ** 3)))
+        )
+
+        # In-process LRU of text translations (text, bulk text and document segments)
+        self.text_cache = TextCache(int(os.getenv('TEXT_CACHE_SIZE', '10000')))
+        # Multi-target provider calls in flight, so concurrent identical requests share one call
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
 
+    @property
+    def openai_client(self):
+        """OpenAI client for direct OpenAI or OpenRouter, or None without a key."""
+        if self._openai_client is _UNSET:
+            with self._client_lock:
+                if self._openai_client is _UNSET:
+                    self._openai_client = self._build_openai_client()
+        return self._openai_client
+
+    @openai_client.setter
+    def openai_client(self, client):
+        self._openai_client = client
+
+    @property
+    def deepl_translator(self):
+        if self._deepl_translator is _UNSET:
+            with self._client_lock:
+                if self._deepl_translator is _UNSET:
+                    deepl_key = _sanitize_key(os.getenv('DEEPL_API_KEY'))
+                    if deepl_key:
+                        import deepl
+                        self._deepl_translator = deepl.Translator(deepl_key)
+                    else:
+                        self._deepl_translator = None
+        return self._deepl_translator
+
+    @deepl_translator.setter
+    def deepl_translator(self, translator):
+        self._deepl_translator = translator
+
+    @staticmethod
+    def _build_openai_client():
         openai_key = _sanitize_key(os.getenv('OPENAI_API_KEY'))
         deepl_key = _sanitize_key(os.getenv('DEEPL_API_KEY'))
         openrouter_key = _sanitize_key(os.getenv('OPENROUTER_API_KEY'))
         # Debug: show which keys are present (do not print values). placeholders are ignored.
         print(f"TranslationService keys - DEEPL: {bool(deepl_key)}, OPENAI: {bool(openai_key)}, OPENROUTER: {bool(openrouter_key)}")
-        self.deepl_translator = deepl.Translator(deepl_key) if deepl_key else None
-        
-        # Initialize OpenAI client for direct OpenAI or OpenRouter
+        if not (openrouter_key or openai_key):
+            return None
+        import openai
         if openrouter_key:
             extra = {}
             ref = os.getenv('AI_HEADER_HTTP_REFERER') or os.getenv('HTTP_REFERER')
             if ref:
                 extra["default_headers"] = {"Referer": ref.strip()}
-            self.openai_client = openai.OpenAI(
+            return openai.OpenAI(
                 api_key=openrouter_key,
                 base_url="https://openrouter.ai/api/v1",
                 **extra
             )
-        elif openai_key:
-            self.openai_client = openai.OpenAI(api_key=openai_key)
-        else:
-            self.openai_client = None
-            
-        # Pass translator callback into FileService so document processing can call
-        self.file_service = FileService(translator=self.translate_text)
-        # Simple in-memory job store for background document processing
-        self.jobs = {}  # job_id -> {status, progress, message, download_path, error}
+        return openai.OpenAI(api_key=openai_key)
+
+    @staticmethod
+    def model_name():
+        return os.getenv('AI_MODEL', 'gpt-3.5-turbo')
+
+    def _chat(self, **kwargs):
+        """One chat completion call, timed by model and outcome; provider errors become RuntimeError."""
+        outcome = 'error'
+        start = time.perf_counter()
+        try:
+            response = self.openai_client.chat.completions.create(**kwargs)
+            outcome = 'ok'
+            return response
+        except Exception as e:
+            if self._is_rate_limit_error(e):
+                outcome = 'rate_limited'
+            # Surface API errors with their message so the caller can detect credit or rate issues
+            raise RuntimeError(f"AI translation failed: {e}") from e
+        finally:
+            PROVIDER_REQUEST_SECONDS.labels(kwargs.get('model'), outcome).observe(time.perf_counter() - start)
     
     def _openai_translate(self, text, source_lang, target_lang, target_code):
         """Dịch bằng OpenAI/OpenRouter. Dùng cho mọi ngôn ngữ (kể cả DeepL không hỗ trợ)."""
         if not self.openai_client:
             return None
         target_name = CODE_TO_NAME.get(target_code, target_lang)
-        model = os.getenv('AI_MODEL', 'gpt-3.5-turbo')
+        model = self.model_name()
         system_prompt = f"You are a professional translator. Translate the following text to {target_name}. Only return the translated text, nothing else."
         if source_lang and source_lang != 'auto':
             src_name = CODE_TO_NAME.get(source_lang.lower(), source_lang)
             system_prompt = f"You are a professional translator. Translate the following text from {src_name} to {target_name}. Only return the translated text, nothing else."
-        try:
-            # Use a safe max_tokens to avoid exceeding account credit limits
-            response = self.openai_client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
-                max_tokens=2048,
-                temperature=0
-            )
-            content = response.choices[0].message.content
-            return (content or "").strip()
-        except Exception as e:
-            # Surface API errors with their message so the caller can detect credit or rate issues
-            raise RuntimeError(f"AI translation failed: {e}") from e
+        # Use a safe max_tokens to avoid exceeding account credit limits
+        response = self._chat(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ],
+            max_tokens=2048,
+            temperature=0
+        )
+        content = response.choices[0].message.content
+        return (content or "").strip()
 
     def translate_text(self, text, source_lang, target_lang):
         if target_lang is None or not str(target_lang).strip():
@@ -130,12 +207,18 @@ class TranslationService:
         t = target_lang.lower()
         s = source.lower()
 
+        cache_key = TextCache.key(self.model_name(), s, t, text)
+        cached = self.text_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         # Only use OpenAI/OpenRouter (ChatGPT gpt-4o) for translations — no public or DeepL fallbacks.
         if not self.openai_client:
             raise RuntimeError("AI provider not configured: set OPENAI_API_KEY or OPENROUTER_API_KEY in backend/.env")
         try:
             out = self._openai_translate(text, source, target_lang, t)
             if out is not None and out != "":
+                self.text_cache.put(cache_key, out)
                 return out
             else:
                 raise RuntimeError("AI translation returned empty result")
@@ -144,6 +227,222 @@ class TranslationService:
             traceback.print_exc()
             raise RuntimeError(f"AI translation failed: {e}")
     
+    @staticmethod
+    def _is_rate_limit_error(message):
+        err = str(message).lower()
+        return '429' in err or '402' in err or 'rate' in err or 'insufficient' in err or 'credit' in err
+
+    def _openai_translate_multi(self, text, source_lang, targets):
+        """Translate one text into several languages in one provider call.
+
+        Returns {target: translation} for the targets found in the JSON answer (possibly
+        empty when the answer cannot be parsed).
+        """
+        langs = ', '.join(f"{t} ({CODE_TO_NAME.get(t.lower(), t)})" for t in targets)
+        src = ''
+        if source_lang and source_lang != 'auto':
+            src = f" from {CODE_TO_NAME.get(source_lang.lower(), source_lang)}"
+        system_prompt = (
+            f"You are a professional translator. Translate the following text{src} into each of these languages: {langs}. "
+            "Return only a JSON object whose keys are exactly these language codes and whose values are the translations."
+        )
+        response = self._chat(
+            model=self.model_name(),
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ],
+            # Room for every target, still bounded to avoid exceeding account credit limits
+            max_tokens=min(4096, 2048 * len(targets)),
+            temperature=0
+        )
+        content = (response.choices[0].message.content or "").strip()
+        content = re.sub(r'^```(?:json)?\s*|\s*```$', '', content)
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        by_code = {str(k).strip().lower(): v for k, v in data.items()}
+        return {t: by_code[t.lower()].strip() for t in targets
+                if isinstance(by_code.get(t.lower()), str) and by_code[t.lower()].strip()}
+
+    def _single_flight(self, key, fn):
+        """Run fn once for concurrent callers with the same key; the others wait for its result."""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def translate_text_multi(self, text, source_lang, target_langs):
+        """Translate one text into several target languages: {target: translation}.
+
+        Cached pairs are served from the text cache; the rest is requested in a single
+        provider call (the source and system prompt are sent once) and each pair is cached.
+        Targets missing from the answer fall back to translate_text.
+        """
+        targets = list(dict.fromkeys(str(t).strip() for t in (target_langs or []) if t and str(t).strip()))
+        if not targets:
+            raise ValueError("target_lang is required")
+        if text is None:
+            return {t: "" for t in targets}
+        source = (str(source_lang).strip() if source_lang is not None else 'auto') or 'auto'
+        model = self.model_name()
+        out = {}
+        missing = []
+        for t in targets:
+            cached = self.text_cache.get(TextCache.key(model, source, t, text))
+            if cached is not None:
+                out[t] = cached
+            else:
+                missing.append(t)
+        if len(missing) == 1:
+            out[missing[0]] = self.translate_text(text, source, missing[0])
+        elif missing:
+            key = (model, source.lower(), text, tuple(sorted(t.lower() for t in missing)))
+            out.update(self._single_flight(key, lambda: self._translate_multi_uncached(text, source, missing)))
+        return out
+
+    def _translate_multi_uncached(self, text, source, targets):
+        if not self.openai_client:
+            raise RuntimeError("AI provider not configured: set OPENAI_API_KEY or OPENROUTER_API_KEY in backend/.env")
+        try:
+            translations = self._openai_translate_multi(text, source, targets)
+        except RuntimeError as e:
+            if self._is_rate_limit_error(e):
+                raise
+            print(f"Multi-target translation failed, falling back to per-target calls: {e}")
+            translations = {}
+        model = self.model_name()
+        result = {}
+        for t in targets:
+            if t in translations:
+                result[t] = translations[t]
+                self.text_cache.put(TextCache.key(model, source, t, text), translations[t])
+            else:
+                result[t] = self.translate_text(text, source, t)
+        return result
+
+    # Strings packed into one provider call by translate_many; the character budget keeps
+    # the JSON answer well inside max_tokens
+    BULK_MAX_ITEMS = 40
+    BULK_MAX_CHARS = 2500
+
+    def _openai_translate_batch(self, texts, source_lang, target_lang, target_code):
+        """Translate several strings in one provider call via a JSON array round-trip.
+
+        Returns the list of translations, or None if the answer is not a JSON array of the
+        same length (the caller then falls back to one call per string).
+        """
+        target_name = CODE_TO_NAME.get(target_code, target_lang)
+        src = ''
+        if source_lang and source_lang != 'auto':
+            src = f" from {CODE_TO_NAME.get(source_lang.lower(), source_lang)}"
+        system_prompt = (
+            f"You are a professional translator. Translate each string of the JSON array{src} to {target_name}. "
+            "Return only a JSON array of the translated strings, in the same order and with the same number of items."
+        )
+        response = self._chat(
+            model=self.model_name(),
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": json.dumps(texts, ensure_ascii=False)}
+            ],
+            max_tokens=2048,
+            temperature=0
+        )
+        content = (response.choices[0].message.content or "").strip()
+        # Models sometimes wrap JSON in a markdown code fence
+        content = re.sub(r'^```(?:json)?\s*|\s*```$', '', content)
+        try:
+            out = json.loads(content)
+        except ValueError:
+            return None
+        if not isinstance(out, list) or len(out) != len(texts) or not all(isinstance(o, str) and o.strip() for o in out):
+            return None
+        return [o.strip() for o in out]
+
+    def _translate_chunk(self, texts, source, target_lang):
+        """[(translated or None, error or None)] for one packed chunk of strings."""
+        if len(texts) > 1:
+            try:
+                out = self._openai_translate_batch(texts, source, target_lang, target_lang.lower())
+                if out is not None:
+                    return [(o, None) for o in out]
+            except RuntimeError as e:
+                if self._is_rate_limit_error(e):
+                    # Per-string retries would hit the same limit
+                    return [(None, str(e))] * len(texts)
+        results = []
+        for text in texts:
+            try:
+                results.append((self.translate_text(text, source, target_lang), None))
+            except RuntimeError as e:
+                results.append((None, str(e)))
+        return results
+
+    def translate_many(self, texts, source_lang, target_lang):
+        """Translate a list of strings to one target language.
+
+        Cached and duplicate strings are not sent again; the rest is packed into chunks of
+        up to BULK_MAX_ITEMS strings / BULK_MAX_CHARS characters, one provider call each,
+        run in parallel. Returns [(translated or None, error or None)] aligned with texts.
+        """
+        if target_lang is None or not str(target_lang).strip():
+            raise ValueError("target_lang is required")
+        target_lang = str(target_lang).strip()
+        source = (str(source_lang).strip() if source_lang is not None else 'auto') or 'auto'
+        model = self.model_name()
+        results = [None] * len(texts)
+        pending = {}  # text -> indices still to translate
+        for i, text in enumerate(texts):
+            text = '' if text is None else str(text)
+            if not text.strip():
+                results[i] = (text, None)
+                continue
+            cached = self.text_cache.get(TextCache.key(model, source, target_lang, text))
+            if cached is not None:
+                results[i] = (cached, None)
+            else:
+                pending.setdefault(text, []).append(i)
+        if not pending:
+            return results
+        if not self.openai_client:
+            raise RuntimeError("AI provider not configured: set OPENAI_API_KEY or OPENROUTER_API_KEY in backend/.env")
+
+        chunks, chunk, size = [], [], 0
+        for text in pending:
+            if chunk and (len(chunk) >= self.BULK_MAX_ITEMS or size + len(text) > self.BULK_MAX_CHARS):
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text)
+        if chunk:
+            chunks.append(chunk)
+
+        with ThreadPoolExecutor(max_workers=self.file_service.concurrency) as ex:
+            for chunk, outs in zip(chunks, ex.map(lambda c: self._translate_chunk(c, source, target_lang), chunks)):
+                for text, (out, error) in zip(chunk, outs):
+                    if out is not None:
+                        self.text_cache.put(TextCache.key(model, source, target_lang, text), out)
+                    for i in pending[text]:
+                        results[i] = (out, error)
+        return results
+
     def translate_document(self, file_path, target_lang):
         # Synchronous translation (kept for compatibility)
         return self.file_service.process_document(file_path, target_lang)
@@ -204,67 +503,337 @@ class TranslationService:
             # Non-rate errors: report as unavailable
             print(f"AI provider preflight check returned non-rate error: {e}")
             return (False, str(e))
-    def translate_document_background(self, file_path, target_lang, user_id=None):
-        job_id = str(uuid.uuid4())
-        self.jobs[job_id] = {
-            'status': 'pending',
-            'progress': 0,
-            'message': 'Queued',
-            'download_path': None,
-            'error': None,
-            'user_id': user_id
-        }
+    def resolve_base_revision(self, file_path, target_lang, user_id=None, base_job_id=None):
+        """Find the previous revision to reuse segments from.
+
+        An explicit base_job_id wins; otherwise the latest finished job of the same user,
+        filename lineage and target language is used. Returns the revision record or None.
+        """
+        if base_job_id:
+            revision = self.revisions.load(base_job_id)
+        else:
+            latest = self.revisions.find_latest(user_id, os.path.basename(file_path), target_lang)
+            revision = self.revisions.load(latest) if latest else None
+        if not revision or revision.get('user_id') != user_id:
+            return None
+        if str(revision.get('target_lang') or '').strip().lower() != str(target_lang).strip().lower():
+            return None
+        return revision
+
+    def init_app(self, app):
+        """Bind the durable job store to the Flask app and prepare the embedded worker.
+
+        With JOB_WORKER_EMBEDDED (default outside ProductionConfig) this process also runs jobs; set it to false on
+        API-only nodes and run worker.py separately to scale the two independently.
+        """
+        self.job_store.init_app(app)
+        self.scheduler.configure(
+            concurrency=app.config.get('SCHEDULER_CONCURRENCY'),
+            processes=app.config.get('SCHEDULER_PROCESSES', 1),
+            plan_weights=parse_plan_weights(app.config.get('SCHEDULER_PLAN_WEIGHTS')),
+        )
+        self.file_service.process_workers = int(app.config.get('DOCUMENT_PROCESS_WORKERS', self.file_service.process_workers))
+        self.results.max_bytes = int(app.config.get('RESULT_CACHE_MAX_BYTES', self.results.max_bytes))
+        pin_seconds = int(app.config.get('RESULT_CACHE_PIN_SECONDS', 86400))
+        self.results.pinned = (lambda: self.job_store.recent_download_paths(pin_seconds)) if pin_seconds > 0 else None
+        self.revisions.max_age = float(app.config.get('REVISION_MAX_AGE_DAYS', self.revisions.max_age / 86400)) * 86400
+        self.revisions.max_count = int(app.config.get('REVISION_MAX_COUNT', self.revisions.max_count))
+        self.text_cache.max_entries = int(app.config.get('TEXT_CACHE_SIZE', self.text_cache.max_entries))
+        # Read at scrape time from counters the cache and scheduler keep anyway
+        CACHE_LOOKUPS.labels('text', 'hit').set_function(lambda: self.text_cache.hits)
+        CACHE_LOOKUPS.labels('text', 'miss').set_function(lambda: self.text_cache.misses)
+        SEGMENT_QUEUE_DEPTH.set_function(self.scheduler.depth)
+        if app.config.get('JOB_WORKER_EMBEDDED', True) and self.worker is None:
+            self.worker = JobWorker(
+                self, self.job_store,
+                max_jobs=app.config.get('JOB_WORKER_CONCURRENCY', 8),
+                poll_interval=app.config.get('JOB_POLL_INTERVAL', 1.0),
+            )
+
+    def start_worker(self):
+        if self.worker is not None:
+            self.worker.start()
+
+    def after_fork(self):
+        """Drop per-process state copied from a pre-fork parent (gunicorn preload_app).
+
+        Provider clients (HTTP connection pools), the document process pool and the
+        scheduler threads are re-created on first use in the child; the embedded worker
+        gets a new worker_id, which carries the pid its leases are recorded under.
+        """
+        self._openai_client = _UNSET
+        self._deepl_translator = _UNSET
+        self._client_lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.file_service.after_fork()
+        self.scheduler.after_fork()
+        if self.worker is not None:
+            self.worker = JobWorker(
+                self, self.job_store, max_jobs=self.worker.max_jobs, poll_interval=self.worker.poll_interval,
+            )
+
+    def shutdown(self, timeout=30.0):
+        """Drain the embedded worker (running jobs finish or are requeued) and stop the process pool."""
+        if self.worker is not None:
+            released = self.worker.drain(timeout)
+            if released:
+                print(f"Requeued {len(released)} unfinished jobs: {', '.join(released)}")
+        self.file_service.shutdown()
+
+    def translate_document_background(self, file_path, target_lang, user_id=None, base_job_id=None, incremental=True, plan=None,
+                                      file_hash=None):
+        """Queue a document job. file_hash is the sha256 of the upload if the caller already
+        computed it while receiving the file."""
         # Preflight provider availability: fail early for rate limit/insufficient credits
-        available, message = self._check_provider_available()
+        provider = self._check_provider_available()
+        job_id = self._create_document_job(
+            file_path, target_lang, provider, user_id=user_id, base_job_id=base_job_id, incremental=incremental,
+            priority=self.scheduler.weight_for(plan), file_hash=file_hash,
+        )
+        self._wake_worker()
+        return job_id
+
+    def translate_batch_background(self, files, target_langs, user_id=None, plan=None):
+        """Queue one job per (file, target language) under a common batch id.
+
+        files: [(file_path, file_hash)]. The provider preflight runs once for the whole
+        batch, and jobs on the same upload share one parse (FileService._parse_once).
+        Returns (batch_id, [{'job_id', 'file_path', 'target_lang'}]).
+        """
+        batch_id = str(uuid.uuid4())
+        provider = self._check_provider_available()
+        priority = self.scheduler.weight_for(plan)
+        jobs = []
+        for file_path, file_hash in files:
+            for target_lang in target_langs:
+                job_id = self._create_document_job(
+                    file_path, target_lang, provider, user_id=user_id, priority=priority,
+                    file_hash=file_hash, batch_id=batch_id,
+                )
+                jobs.append({'job_id': job_id, 'file_path': file_path, 'target_lang': target_lang})
+        self._wake_worker()
+        return batch_id, jobs
+
+    def _create_document_job(self, file_path, target_lang, provider, user_id=None, base_job_id=None, incremental=True,
+                             priority=1, file_hash=None, batch_id=None):
+        """Persist one job: completed at once from the result cache, failed if the provider
+        preflight failed, otherwise pending for a worker (embedded or worker.py) to lease."""
+        job_id = str(uuid.uuid4())
+        common = dict(user_id=user_id, base_job_id=base_job_id, incremental=incremental, priority=priority, batch_id=batch_id)
+        result_key = ResultCache.key(file_hash or file_sha256(file_path), target_lang, self.model_name())
+        cached = self.results.lookup(result_key)
+        CACHE_LOOKUPS.labels('result', 'hit' if cached else 'miss').inc()
+        if cached:
+            # Same file, target and pipeline translated before: complete at once
+            self.job_store.create(
+                job_id, file_path, target_lang, status='completed', result_key=result_key, download_path=cached,
+                progress=100, eta_seconds=0, **self._output_fields(file_path, cached, 'Completed (cached)'), **common,
+            )
+            return job_id
+        available, message = provider
         if not available:
-            self.jobs[job_id]['status'] = 'failed'
-            self.jobs[job_id]['progress'] = 0
-            self.jobs[job_id]['message'] = 'Failed - AI provider rate-limited or unavailable'
-            self.jobs[job_id]['error'] = str(message)
+            self.job_store.create(
+                job_id, file_path, target_lang, status='failed',
+                message='Failed - AI provider rate-limited or unavailable', error=str(message), **common,
+            )
             return job_id
+        self.job_store.create(job_id, file_path, target_lang, result_key=result_key, **common)
+        return job_id
 
-        def _worker(job_id, file_path, target_lang):
+    def _wake_worker(self):
+        if self.worker is not None:
+            self.worker.start()
+            self.worker.wake()
+
+    def run_job(self, job, worker_id, cancel_event):
+        """Run one leased document job to completion (called by JobWorker)."""
+        job_id = job['id']
+        file_path = job['file_path']
+        target_lang = job['target_lang']
+        user_id = job.get('user_id')
+        store = self.job_store
+        output_path = None
+        memory = SegmentMemory()
+        # Segments of this job run on the shared scheduler, weighted by the uploader's plan
+        lane = self.scheduler.lane(job_id, user_id, job.get('priority') or 1)
+        try:
+            if cancel_event.is_set():
+                raise JobCancelledError('Job cancelled')
+            # Incremental mode: reuse unchanged segments of a previous revision of this document
+            base = None
+            if job.get('incremental') or job.get('base_job_id'):
+                base = self.resolve_base_revision(file_path, target_lang, user_id, job.get('base_job_id'))
+            memory = SegmentMemory(base.get('segments') if base else None)
+            store.update(job_id, worker_id, progress=5, message='Starting', base_job_id=base.get('job_id') if base else None)
+
+            last_write = [0.0]
+
+            def progress_cb(percent, msg=''):
+                # Progress is reported per segment; throttle writes to the job store
+                now = time.monotonic()
+                if now - last_write[0] < 0.5 and percent < 100:
+                    return
+                last_write[0] = now
+                store.update(
+                    job_id, worker_id,
+                    progress=max(0, min(100, int(percent))), message=msg,
+                    segments_reused=memory.reused, segments_translated=memory.translated,
+                    eta_seconds=self.scheduler.stats(job_id)['eta_seconds'],
+                )
+
+            # Other targets of the same document in a batch: request them in the same provider
+            # call; the sibling jobs then find their segments in the text cache
+            translator = None
+            siblings = self._sibling_targets(job)
+            if siblings:
+                targets = [target_lang] + siblings
+                translator = lambda text, src, tgt: self.translate_text_multi(text, src, targets)[tgt]
+            # Write into a private staging folder; the result cache publishes it on success
+            result_key = job.get('result_key')
+            output_folder = self.results.staging_dir(job_id) if result_key else None
+            # Let FileService update progress via callback
+            output_path = self.file_service.process_document(
+                file_path, target_lang, progress_callback=progress_cb, memory=memory, cancel_event=cancel_event,
+                lane=lane, output_folder=output_folder, translator=translator,
+            )
+            if cancel_event.is_set():
+                raise JobCancelledError('Job cancelled')
+            if result_key:
+                # Outputs with failed segments are not shared with later uploads
+                if memory.failed:
+                    output_path = self.results.keep_private(job_id, output_path)
+                else:
+                    output_path = self.results.commit(result_key, job_id, output_path)
             try:
-                self.jobs[job_id]['status'] = 'in_progress'
-                self.jobs[job_id]['progress'] = 5
-                self.jobs[job_id]['message'] = 'Starting'
-
-                def progress_cb(percent, msg=''):
-                    self.jobs[job_id]['progress'] = max(0, min(100, int(percent)))
-                    self.jobs[job_id]['message'] = msg
-
-                # Let FileService update progress via callback
-                output_path = self.file_service.process_document(file_path, target_lang, progress_callback=progress_cb)
-                self.jobs[job_id]['download_path'] = output_path
-                # Detect fallback: if output extension != original extension -> it's a fallback
-                try:
-                    orig_ext = os.path.splitext(file_path)[1].lower()
-                    out_ext = os.path.splitext(output_path)[1].lower()
-                    if out_ext and orig_ext and out_ext != orig_ext:
-                        self.jobs[job_id]['fallback'] = True
-                        self.jobs[job_id]['fallback_reason'] = f"Output changed from {orig_ext} to {out_ext}"
-                        self.jobs[job_id]['message'] = 'Completed with fallback'
-                    else:
-                        self.jobs[job_id]['fallback'] = False
-                        self.jobs[job_id]['message'] = 'Completed'
-                except Exception:
-                    self.jobs[job_id]['fallback'] = False
-                    self.jobs[job_id]['message'] = 'Completed'
-
-                self.jobs[job_id]['progress'] = 100
-                self.jobs[job_id]['status'] = 'completed'
-            except ProviderRateLimitError as e:
-                self.jobs[job_id]['status'] = 'failed'
-                self.jobs[job_id]['error'] = str(e)
-                self.jobs[job_id]['message'] = 'Failed - Provider rate limit'
-            except Exception as e:
-                self.jobs[job_id]['status'] = 'failed'
-                self.jobs[job_id]['error'] = str(e)
-                self.jobs[job_id]['message'] = 'Failed'
+                self.revisions.save(job_id, user_id, os.path.basename(file_path), target_lang, memory.record)
+            except OSError as e:
+                print(f"Saving document revision failed: {e}")
+            result = {
+                'download_path': output_path,
+                'progress': 100,
+                'segments_reused': memory.reused,
+                'segments_translated': memory.translated,
+                'eta_seconds': 0,
+            }
+            result.update(self._output_fields(file_path, output_path))
+            store.finish(job_id, worker_id, 'completed', **result)
+        except ProviderRateLimitError as e:
+            self.results.discard_staging(job_id)
+            store.finish(job_id, worker_id, 'failed', error=str(e), message='Failed - Provider rate limit')
+        except JobCancelledError:
+            # Only the lease holder cleans up; a lost lease means another worker owns the files now
+            if store.finish(job_id, worker_id, 'cancelled', message='Cancelled',
+                            segments_reused=memory.reused, segments_translated=memory.translated):
+                self.results.discard_staging(job_id)
+                self._cleanup_cancelled(job, output_path)
+        except Exception as e:
+            self.results.discard_staging(job_id)
+            store.finish(job_id, worker_id, 'failed', error=str(e), message='Failed')
 
-        thread = threading.Thread(target=_worker, args=(job_id, file_path, target_lang), daemon=True)
-        thread.start()
-        return job_id
+    def _sibling_targets(self, job):
+        """Target languages of the other unfinished jobs of the batch on the same upload."""
+        if not job.get('batch_id'):
+            return []
+        return sorted({
+            j['target_lang'] for j in self.job_store.list_batch(job['batch_id'])
+            if j['file_path'] == job['file_path'] and j['id'] != job['id']
+            and j['status'] in ('pending', 'in_progress') and j['target_lang'] != job['target_lang']
+        })
+
+    @staticmethod
+    def _output_fields(file_path, output_path, message='Completed'):
+        """Fallback flags for a finished job: an output extension different from the
+        original means the format could not be rebuilt (e.g. PDF -> .txt note)."""
+        fields = {'fallback': False, 'message': message}
+        try:
+            orig_ext = os.path.splitext(file_path)[1].lower()
+            out_ext = os.path.splitext(output_path)[1].lower()
+            if out_ext and orig_ext and out_ext != orig_ext:
+                fields['fallback'] = True
+                fields['fallback_reason'] = f"Output changed from {orig_ext} to {out_ext}"
+                fields['message'] = 'Completed with fallback'
+        except Exception:
+            pass
+        return fields
 
     def get_job(self, job_id):
-        return self.jobs.get(job_id)
\ No newline at end of file
+        return self.job_store.get(job_id)
+
+    def cancel_job(self, job_id):
+        """Request cooperative cancellation of a document job.
+
+        The worker running the job (in this or another process, notified via heartbeat)
+        stops submitting segments, drops pending ones and discards in-flight provider
+        results; partial outputs are removed when it unwinds. Returns the new status, or
+        None if the job is already finished.
+        """
+        status = self.job_store.request_cancel(job_id)
+        if status == 'cancelling' and self.worker is not None:
+            self.worker.cancel_local(job_id)
+        elif status == 'cancelled':
+            # Never leased, so no worker will unwind it: clean up here
+            job = self.job_store.get(job_id)
+            if job:
+                self._cleanup_cancelled(job)
+        return status
+
+    def get_batch(self, batch_id):
+        return self.job_store.list_batch(batch_id)
+
+    def build_batch_bundle(self, batch_id, jobs):
+        """Zip the outputs of a finished batch as <target_lang>/<file>; built once, then reused."""
+        folder = os.path.join(self.results.private_root, batch_id)
+        bundle = os.path.join(folder, 'translations.zip')
+        if os.path.isfile(bundle):
+            return bundle
+        os.makedirs(folder, exist_ok=True)
+        tmp = f"{bundle}.{uuid.uuid4().hex}.tmp"
+        names = set()
+        with zipfile.ZipFile(tmp, 'w') as zf:
+            for job in jobs:
+                path = job.get('download_path')
+                if job.get('status') != 'completed' or not path or not os.path.isfile(path):
+                    continue
+                base, ext = os.path.splitext(os.path.basename(path))
+                arcname = f"{job['target_lang']}/{base}{ext}"
+                n = 2
+                while arcname in names:
+                    arcname = f"{job['target_lang']}/{base} ({n}){ext}"
+                    n += 1
+                names.add(arcname)
+                # docx/xlsx are zip archives already: store them as is
+                compress = zipfile.ZIP_STORED if ext.lower() in ('.docx', '.xlsx') else zipfile.ZIP_DEFLATED
+                zf.write(path, arcname, compress_type=compress)
+        os.replace(tmp, bundle)
+        return bundle
+
+    def _cleanup_cancelled(self, job, output_path=None):
+        """Remove what a cancelled job leaves behind and close its history record."""
+        file_path = job['file_path']
+        paths = [output_path]
+        # The upload may still be needed by other jobs on it (other targets of a batch)
+        upload_done = not self.job_store.count_active_for_file(file_path, exclude_job_id=job['id'])
+        if upload_done:
+            paths += [file_path, parsed_path(file_path)]
+        for path in paths:
+            if not path:
+                continue
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"Cleanup of cancelled job file failed: {e}")
+        # Uploads live in a folder of their own (save_upload_hashed); drop it once empty
+        folder = os.path.dirname(file_path)
+        if upload_done and os.path.abspath(folder) != os.path.abspath(self.file_service.upload_folder):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass  # not empty (or already gone)
+        try:
+            with self.job_store.app.app_context():
+                mark_document_history(job.get('user_id'), file_path, job['target_lang'], job.get('created_at'),
+                                      'Cancelled')
+        except Exception as e:
+            print(f"Updating history of cancelled job {job['id']} failed: {e}")
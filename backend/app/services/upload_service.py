@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from werkzeug.utils import secure_filename
+from app.services.document_formats import TextSegmenter, document_format, save_parsed, sniff_format
+
+
+class UploadError(Exception):
+    """Rejected chunk or session operation; status is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class _UploadState:
+    """In-memory progress of one session in this process: running hash and TXT segmenter."""
+
+    def __init__(self, ext):
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.segmenter = TextSegmenter() if ext == '.txt' else None
+        self.lock = threading.Lock()
+
+    def feed(self, data):
+        self.hasher.update(data)
+        if self.segmenter is not None:
+            try:
+                self.segmenter.feed(data)
+            except UnicodeDecodeError:
+                raise UploadError('File is not valid UTF-8 text', 415)
+        self.offset += len(data)
+
+
+class UploadSessionStore:
+    """Resumable chunked uploads for large documents.
+
+    A session is a metadata file plus a .part file under `folder`; the size of the .part
+    file is the authoritative offset, so a client that lost its connection asks for the
+    offset and resumes from there, on any API process sharing the folder. Chunks carry a
+    SHA-256 checksum and must be sent in order. The upload is hashed and format-sniffed
+    as it arrives, and TXT files are split into segments on the fly.
+    """
+
+    def __init__(self, folder, max_size=500 * 1024 * 1024, chunk_size=5 * 1024 * 1024, ttl_seconds=86400):
+        self.folder = folder
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self._states = {}  # upload_id -> _UploadState
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def configure(self, max_size=None, chunk_size=None, ttl_seconds=None):
+        if max_size:
+            self.max_size = int(max_size)
+        if chunk_size:
+            self.chunk_size = int(chunk_size)
+        if ttl_seconds:
+            self.ttl_seconds = int(ttl_seconds)
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.folder, f"{upload_id}.json")
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.folder, f"{upload_id}.part")
+
+    def _session(self, upload_id, user_id):
+        try:
+            uuid.UUID(str(upload_id))
+            with open(self._meta_path(upload_id), 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except (ValueError, OSError):
+            raise UploadError('Upload not found', 404)
+        if session.get('user_id') != user_id:
+            raise UploadError('Upload not found', 404)
+        try:
+            session['offset'] = os.path.getsize(self._part_path(upload_id))
+        except OSError:
+            raise UploadError('Upload not found', 404)
+        return session
+
+    def create(self, user_id, filename, size):
+        filename = secure_filename(filename or '')
+        if not filename:
+            raise UploadError('filename is required')
+        try:
+            ext = document_format(filename)
+        except ValueError as e:
+            raise UploadError(str(e), 415)
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError('size is required')
+        if size <= 0:
+            raise UploadError('File is empty')
+        if size > self.max_size:
+            raise UploadError(f'File exceeds the upload limit of {self.max_size} bytes', 413)
+        self.cleanup_expired()
+        upload_id = str(uuid.uuid4())
+        session = {
+            'upload_id': upload_id,
+            'user_id': user_id,
+            'filename': filename,
+            'format': ext,
+            'size': size,
+            'created_at': time.time(),
+        }
+        open(self._part_path(upload_id), 'wb').close()
+        with open(self._meta_path(upload_id), 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        session['offset'] = 0
+        return session
+
+    def get(self, upload_id, user_id):
+        return self._session(upload_id, user_id)
+
+    def _state(self, upload_id, session):
+        with self._lock:
+            state = self._states.get(upload_id)
+            if state is None:
+                state = self._states[upload_id] = _UploadState(session['format'])
+            return state
+
+    def _sync(self, upload_id, state, session):
+        """Rebuild the running state from the .part file if this process did not receive
+        the previous chunks (restart, or another API node). Caller holds state.lock."""
+        if state.offset != session['offset']:
+            fresh = _UploadState(session['format'])
+            with open(self._part_path(upload_id), 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    fresh.feed(block)
+            state.offset, state.hasher, state.segmenter = fresh.offset, fresh.hasher, fresh.segmenter
+
+    def append(self, upload_id, user_id, offset, data, checksum=None):
+        """Append one chunk at `offset`. Returns the new offset."""
+        session = self._session(upload_id, user_id)
+        if checksum and hashlib.sha256(data).hexdigest() != checksum.strip().lower():
+            raise UploadError('Chunk checksum mismatch', 400, offset=session['offset'])
+        state = self._state(upload_id, session)
+        with state.lock:
+            session = self._session(upload_id, user_id)
+            if offset != session['offset']:
+                raise UploadError('Offset does not match the received size', 409, offset=session['offset'])
+            if session['offset'] + len(data) > session['size']:
+                raise UploadError('Chunk exceeds the declared file size', 413, offset=session['offset'])
+            if offset == 0 and not sniff_format(session['format'], data[:1024]):
+                raise UploadError(f"File content does not look like {session['format']}", 415, offset=0)
+            self._sync(upload_id, state, session)
+            try:
+                # Feed first: a TXT chunk that is not UTF-8 is rejected before it is stored
+                state.feed(data)
+                with open(self._part_path(upload_id), 'ab') as f:
+                    f.write(data)
+            except (UploadError, OSError):
+                # The running state may be half-updated: rebuild it from disk on the next chunk
+                state.offset = -1
+                raise
+            os.utime(self._meta_path(upload_id), None)
+            return state.offset
+
+    def complete(self, upload_id, user_id, dest_folder, sha256=None):
+        """Finish the upload: move it into its own folder under dest_folder.
+
+        Returns (session, file_path, file_hash). TXT segments extracted during the upload
+        are saved beside the file so the job can skip the parse stage.
+        """
+        session = self._session(upload_id, user_id)
+        if session['offset'] != session['size']:
+            raise UploadError('Upload is incomplete', 409, offset=session['offset'])
+        state = self._state(upload_id, session)
+        with state.lock:
+            # Re-read under the lock: a concurrent complete() may have moved the file already
+            session = self._session(upload_id, user_id)
+            self._sync(upload_id, state, session)
+            file_hash = state.hasher.hexdigest()
+            if sha256 and sha256.strip().lower() != file_hash:
+                raise UploadError('File checksum mismatch', 400, offset=session['offset'])
+            upload_dir = os.path.join(dest_folder, uuid.uuid4().hex)
+            os.makedirs(upload_dir, exist_ok=True)
+            file_path = os.path.join(upload_dir, session['filename'])
+            os.replace(self._part_path(upload_id), file_path)
+            if state.segmenter is not None:
+                try:
+                    save_parsed(file_path, {'format': '.txt', 'segments': state.segmenter.close(), 'meta': {}})
+                except OSError as e:
+                    print(f"Saving pre-split segments failed: {e}")
+            self._discard(upload_id)
+        return session, file_path, file_hash
+
+    def abort(self, upload_id, user_id):
+        self._session(upload_id, user_id)
+        self._discard(upload_id)
+        try:
+            os.remove(self._part_path(upload_id))
+        except OSError:
+            pass
+
+    def _discard(self, upload_id):
+        with self._lock:
+            self._states.pop(upload_id, None)
+        try:
+            os.remove(self._meta_path(upload_id))
+        except OSError:
+            pass
+
+    def cleanup_expired(self):
+        """Drop sessions untouched for longer than ttl_seconds."""
+        cutoff = time.time() - self.ttl_seconds
+        for entry in os.scandir(self.folder):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    with self._lock:
+                        self._states.pop(entry.name.split('.', 1)[0], None)
+            except OSError:
+                continue
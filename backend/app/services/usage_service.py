@@ -0,0 +1,129 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.models import db, Translation, UsageCounter
+from app.utils.metrics import DB_QUERY_SECONDS
+
+# Daily translation quota per plan (see also the plan info in /api/auth/profile)
+PLAN_DAILY_QUOTA = {'free': 170, 'pro': 4000, 'promax': 10000}
+
+
+def daily_quota(plan):
+    return PLAN_DAILY_QUOTA.get(plan or 'free', PLAN_DAILY_QUOTA['free'])
+
+
+def day_range(day):
+    """[start, end) datetimes of a UTC day, for index-friendly created_at predicates."""
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+class UsageCounters:
+    """Per-user daily translation counts for quota checks.
+
+    Writers call add() next to their Translation inserts (same session, same commit); the
+    usage_counter row is bumped with a single upsert, so checks read one primary-key row
+    instead of counting history. The first write of a day seeds the row from a range count
+    over (user_id, created_at), which covers rows written before counters existed.
+    Reads are cached per process for ttl_seconds and advanced locally on writes, so other
+    processes see at most ttl_seconds of staleness.
+    """
+
+    def __init__(self, ttl_seconds=30, max_entries=50000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl_seconds = float(app.config.get('USAGE_CACHE_TTL', self.ttl_seconds))
+
+    @staticmethod
+    def _today():
+        return datetime.utcnow().date()
+
+    def used_today(self, user_id):
+        day = self._today()
+        key = (user_id, day)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        with DB_QUERY_SECONDS.labels('quota_read').time():
+            count = db.session.query(UsageCounter.count).filter_by(user_id=user_id, day=day).scalar()
+            if count is None:
+                # No write yet today: nothing to seed, the range count is bounded by today's rows
+                count = self._count_rows(user_id, day)
+        self._remember(key, count, now)
+        return count
+
+    def add(self, user_id, n=1):
+        """Record n new translations of user_id; the caller commits."""
+        if not user_id or n <= 0:
+            return
+        day = self._today()
+        table = UsageCounter.__table__
+        # Rows the caller added but has not flushed must not be counted in the seed below
+        with db.session.no_autoflush, DB_QUERY_SECONDS.labels('quota_write').time():
+            result = db.session.execute(
+                table.update()
+                .where(table.c.user_id == user_id, table.c.day == day)
+                .values(count=table.c.count + n)
+            )
+            if not result.rowcount:
+                # First write of the day: start from the rows already stored today
+                seed = self._count_rows(user_id, day)
+                db.session.execute(self._upsert(user_id, day, seed + n, n))
+
+        key = (user_id, day)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached:
+                self._cache[key] = (cached[0] + n, cached[1])
+
+    def forget(self, user_id):
+        with self._lock:
+            self._cache.pop((user_id, self._today()), None)
+
+    def _remember(self, key, count, now):
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._cache = {k: v for k, v in self._cache.items() if v[1] > now}
+                if len(self._cache) >= self.max_entries:
+                    self._cache.clear()
+            self._cache[key] = (count, now + self.ttl_seconds)
+
+    @staticmethod
+    def _count_rows(user_id, day):
+        start, end = day_range(day)
+        return db.session.query(func.count(Translation.id)).filter(
+            Translation.user_id == user_id,
+            Translation.created_at >= start,
+            Translation.created_at < end,
+        ).scalar() or 0
+
+    @staticmethod
+    def _upsert(user_id, day, initial, n):
+        """INSERT of a new counter row that adds n instead when another writer won the race."""
+        table = UsageCounter.__table__
+        values = {'user_id': user_id, 'day': day, 'count': initial}
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            return insert(table).values(**values).on_duplicate_key_update(count=table.c.count + n)
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            return insert(table).values(**values).on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.day],
+                set_={'count': table.c.count + n},
+            )
+        return table.insert().values(**values)
+
+
+usage_counters = UsageCounters()
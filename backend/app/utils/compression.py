@@ -0,0 +1,57 @@
+import zlib
+
+try:  # optional: pip install zstandard
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Stored values start with a tag so plain legacy text, zlib and zstd rows can coexist
+_ZLIB = b'\x00zl'
+_ZSTD = b'\x00zs'
+
+_settings = {'min_bytes': 512, 'algorithm': 'zlib', 'level': 6}
+
+
+def configure(min_bytes=None, algorithm=None, level=None):
+    """Set how new values are stored; existing rows stay readable whatever they use."""
+    if min_bytes is not None:
+        _settings['min_bytes'] = int(min_bytes)
+    if algorithm:
+        algorithm = str(algorithm).strip().lower()
+        if algorithm == 'zstd' and zstandard is None:
+            print("[WARN] HISTORY_COMPRESSION=zstd but zstandard is not installed; using zlib")
+            algorithm = 'zlib'
+        _settings['algorithm'] = algorithm
+    if level is not None:
+        _settings['level'] = int(level)
+
+
+def compress_text(value):
+    """bytes to store for value: UTF-8, compressed when that pays off."""
+    if value is None:
+        return None
+    raw = value.encode('utf-8')
+    algorithm = _settings['algorithm']
+    if len(raw) < _settings['min_bytes'] or algorithm in ('', 'none', 'off'):
+        return raw
+    if algorithm == 'zstd':
+        packed = _ZSTD + zstandard.ZstdCompressor(level=_settings['level']).compress(raw)
+    else:
+        packed = _ZLIB + zlib.compress(raw, _settings['level'])
+    return packed if len(packed) < len(raw) else raw
+
+
+def decompress_text(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        # Row written before the column became binary (SQLite keeps its TEXT value)
+        return value
+    value = bytes(value)
+    if value.startswith(_ZLIB):
+        value = zlib.decompress(value[len(_ZLIB):])
+    elif value.startswith(_ZSTD):
+        if zstandard is None:
+            raise RuntimeError('zstd-compressed history row but zstandard is not installed')
+        value = zstandard.ZstdDecompressor().decompress(value[len(_ZSTD):])
+    return value.decode('utf-8')
@@ -0,0 +1,189 @@
+import threading
+from sqlalchemy import bindparam, event, inspect, select, text, update
+from app.models import db, PREVIEW_CHARS, Translation, TranslationArchive, text_preview, translation_hash
+from app.utils import compression
+
+_WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def init_database(app):
+    """Bind db to app; shared by create_app and run.py.
+
+    Startup itself sends no queries: the schema is created and upgraded by
+    migrate_database(), run here when DB_AUTO_MIGRATE is set and by migrate.py otherwise.
+    """
+    db.init_app(app)
+    compression.configure(
+        min_bytes=app.config.get('HISTORY_COMPRESS_MIN_BYTES'),
+        algorithm=app.config.get('HISTORY_COMPRESSION'),
+    )
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            configure_sqlite(db.engine, app.config)
+
+    # Full-text search index over history (FULLTEXT on MySQL, FTS5 on SQLite)
+    from app.services.search_service import search_index
+    search_index.init_app(app)
+    # Per-day usage rollups behind /api/history/stats
+    from app.services.rollup_service import usage_rollups
+    usage_rollups.init_app(app)
+
+    if app.config.get('DB_AUTO_MIGRATE', True):
+        migrate_database(app)
+
+
+def migrate_database(app, strict=False):
+    """Create missing tables, apply additive migrations and fill derived tables.
+
+    A failing step is only logged so DB_AUTO_MIGRATE startup keeps serving; with strict
+    (migrate.py) the error is raised instead.
+    """
+    from app.services.search_service import search_index
+    from app.services.rollup_service import usage_rollups
+    with app.app_context():
+        db.create_all()
+        migrate_schema(db.engine, strict)
+        search_index.ensure_schema(db.engine, strict)
+        usage_rollups.ensure_filled(db.engine, strict)
+
+
+def migrate_schema(engine, strict=False):
+    """Additive changes create_all does not apply to existing tables."""
+    try:
+        with engine.begin() as conn:
+            inspector = inspect(conn)
+            if engine.dialect.name == 'mysql':
+                # Check if avatar_url column exists in user table
+                result = conn.execute(text("SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME='user' AND COLUMN_NAME='avatar_url'"))
+                if not result.fetchone():
+                    conn.execute(text('ALTER TABLE user ADD COLUMN avatar_url VARCHAR(500)'))
+                # History texts are stored as CompressedText bytes (rebuilds the table once)
+                result = conn.execute(text("SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME='translation' AND COLUMN_NAME='original_text'"))
+                row = result.fetchone()
+                if row and str(row[0]).lower() != 'longblob':
+                    conn.execute(text('ALTER TABLE translation MODIFY original_text LONGBLOB, MODIFY translated_text LONGBLOB'))
+            columns = {c['name'] for c in inspector.get_columns('translation')}
+            if 'content_hash' not in columns:
+                conn.execute(text('ALTER TABLE translation ADD COLUMN content_hash VARCHAR(64)'))
+            # Plain-text prefixes read by history lists instead of the compressed texts
+            for table in ('translation', 'translation_archive'):
+                if table != 'translation' and not inspector.has_table(table):
+                    continue
+                existing = columns if table == 'translation' else {c['name'] for c in inspector.get_columns(table)}
+                for name in ('original_preview', 'translated_preview'):
+                    if name not in existing:
+                        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} VARCHAR({PREVIEW_CHARS + 1})'))
+            indexes = {i['name'] for i in inspector.get_indexes('translation')}
+            # Composite indexes for per-user history/daily range counts and hash lookups
+            if 'ix_translation_user_created' not in indexes:
+                conn.execute(text('CREATE INDEX ix_translation_user_created ON translation (user_id, created_at)'))
+            if 'ix_translation_user_hash' not in indexes:
+                conn.execute(text('CREATE INDEX ix_translation_user_hash ON translation (user_id, content_hash)'))
+            # Fair-queuing tag of document jobs (JobStore.lease); queued jobs start level at 0
+            if inspector.has_table('translation_job'):
+                job_columns = {c['name'] for c in inspector.get_columns('translation_job')}
+                if 'virtual_start' not in job_columns:
+                    conn.execute(text('ALTER TABLE translation_job ADD COLUMN virtual_start DOUBLE PRECISION'))
+                    conn.execute(text('UPDATE translation_job SET virtual_start = 0 WHERE virtual_start IS NULL'))
+                if 'ix_translation_job_status_vstart' not in {i['name'] for i in inspector.get_indexes('translation_job')}:
+                    conn.execute(text('CREATE INDEX ix_translation_job_status_vstart ON translation_job (status, virtual_start, created_at)'))
+        _backfill_content_hash(engine)
+        for model in (Translation, TranslationArchive):
+            _backfill_previews(engine, model.__table__)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"[WARN] Schema check/migration failed: {e}")
+
+
+def _backfill_content_hash(engine, batch_size=1000):
+    # Typed select so compressed texts are hashed as text
+    t = Translation.__table__
+    update = text("UPDATE translation SET content_hash = :h WHERE id = :id")
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(t.c.id, t.c.user_id, t.c.source_lang, t.c.target_lang, t.c.original_text, t.c.translated_text)
+                .where(t.c.id > last_id, t.c.content_hash.is_(None)).order_by(t.c.id).limit(batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            conn.execute(update, [{'id': r[0], 'h': translation_hash(*r[1:])} for r in rows])
+            last_id = rows[-1][0]
+
+
+def _backfill_previews(engine, t, batch_size=1000):
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(t.c.id, t.c.original_text, t.c.translated_text)
+                .where(t.c.id > last_id, t.c.original_preview.is_(None)).order_by(t.c.id).limit(batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            conn.execute(
+                update(t).where(t.c.id == bindparam('row_id')),
+                [{'row_id': r[0], 'original_preview': text_preview(r[1]), 'translated_preview': text_preview(r[2])}
+                 for r in rows],
+            )
+            last_id = rows[-1][0]
+
+
+def configure_sqlite(engine, config):
+    """Embedded mode: WAL journal, tuned pragmas and one writer at a time per process.
+
+    WAL lets readers run while a transaction writes. SQLite still allows a single writer,
+    so with SQLITE_SINGLE_WRITER write transactions of this process queue on a lock
+    (taken at the first INSERT/UPDATE/DELETE, released at commit or rollback) instead
+    of failing with "database is locked"; other processes wait on busy_timeout.
+    """
+    busy_ms = int(float(config.get('SQLITE_BUSY_TIMEOUT', 30)) * 1000)
+    pragmas = {
+        'journal_mode': 'WAL',
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': busy_ms,
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+        'cache_size': -int(config.get('SQLITE_CACHE_KB', 20000)),
+        'mmap_size': int(config.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024)),
+    }
+    in_memory = engine.url.database in (None, '', ':memory:')
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            if name == 'journal_mode' and in_memory:
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    if not config.get('SQLITE_SINGLE_WRITER', True) or in_memory:
+        return
+    writer = threading.Lock()
+    timeout = busy_ms / 1000.0
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _acquire(conn, cursor, statement, parameters, context, executemany):
+        info = conn.info
+        if not info.get('sqlite_writer') and statement.lstrip()[:7].upper().startswith(_WRITE_PREFIXES):
+            # On timeout go ahead and let SQLite's busy handler decide
+            info['sqlite_writer'] = writer.acquire(timeout=timeout)
+
+    def _release(info):
+        if info.pop('sqlite_writer', False):
+            writer.release()
+
+    @event.listens_for(engine, 'commit')
+    def _on_commit(conn):
+        _release(conn.info)
+
+    @event.listens_for(engine, 'rollback')
+    def _on_rollback(conn):
+        _release(conn.info)
+
+    @event.listens_for(engine.pool, 'checkin')
+    def _on_checkin(dbapi_conn, connection_record):
+        _release(connection_record.info)
@@ -1,4 +1,6 @@
 import os
+import uuid
+import hashlib
 from werkzeug.utils import secure_filename
 from flask import current_app
 
@@ -17,6 +19,23 @@ def save_uploaded_file(file, folder='uploads'):
         return file_path
     return None
 
+def save_upload_hashed(file, folder, chunk_size=1024 * 1024):
+    """Stream an uploaded file to disk while hashing it. Returns (file_path, sha256 hex).
+
+    Each upload gets a folder of its own, so two users uploading the same filename
+    never overwrite each other.
+    """
+    filename = secure_filename(file.filename)
+    upload_dir = os.path.join(folder, uuid.uuid4().hex)
+    os.makedirs(upload_dir, exist_ok=True)
+    file_path = os.path.join(upload_dir, filename)
+    digest = hashlib.sha256()
+    with open(file_path, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(chunk_size), b''):
+            digest.update(chunk)
+            out.write(chunk)
+    return file_path, digest.hexdigest()
+
 def get_file_size(file_path):
     return os.path.getsize(file_path) if os.path.exists(file_path) else 0
 
@@ -0,0 +1,34 @@
+from app.models import db
+from app.utils.metrics import REGISTRY
+
+
+def after_fork(app):
+    """Re-create per-process state in a worker forked from a preloaded app (gunicorn post_fork).
+
+    Connections of the parent's engine pool must never be shared with the child: they are
+    dropped without closing the parent's sockets, and provider clients, executors and the
+    embedded job worker are rebuilt lazily in this process. Metrics start from zero.
+    """
+    from app.routes.translation import translation_service
+    with app.app_context():
+        db.engine.dispose(close=False)
+    translation_service.after_fork()
+    REGISTRY.after_fork()
+
+
+def shutdown(app, timeout=None):
+    """Graceful stop of a serving process (gunicorn worker_exit).
+
+    Stops leasing jobs, gives running ones up to JOB_DRAIN_TIMEOUT seconds and requeues
+    the rest, flushes queued history rows, closes pooled connections and hands this
+    process's final counters to METRICS_DIR.
+    """
+    from app.routes.translation import translation_service
+    from app.services.history_writer import history_writer
+    if timeout is None:
+        timeout = float(app.config.get('JOB_DRAIN_TIMEOUT', 30))
+    translation_service.shutdown(timeout)
+    history_writer.stop()
+    with app.app_context():
+        db.engine.dispose()
+    REGISTRY.stop()
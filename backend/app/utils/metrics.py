@@ -0,0 +1,451 @@
+import os
+import json
+import math
+import time
+import bisect
+import socket
+import functools
+import threading
+
+try:  # POSIX only; without it concurrent exits may lose each other's final counters
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Seconds; one bucket set per kind of operation
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PROVIDER_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+class _Timer:
+    """Observes elapsed seconds; usable as context manager or decorator."""
+
+    __slots__ = ('_observe', '_start')
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._observe(time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self._observe):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class _Value:
+    __slots__ = ('_lock', 'value', 'function')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self.function = None
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+    def set_function(self, fn):
+        """Read the value from fn() at collection time instead (counts kept elsewhere)."""
+        self.function = fn
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+        return self.value
+
+    def reset(self):
+        self.value = 0.0
+
+
+class _Buckets:
+    __slots__ = ('_lock', '_bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self.observe)
+
+    def get(self):
+        with self._lock:
+            return [list(self.counts), self.sum]
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self._bounds)
+            self.sum = 0.0
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values, **named):
+        """Series for these label values (created on first use, then a dict lookup)."""
+        if named:
+            values = tuple(named[n] for n in self.labelnames)
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        return _Value()
+
+    def snapshot(self):
+        return [[list(key), child.get()] for key, child in list(self._children.items())]
+
+    def reset(self):
+        for child in list(self._children.values()):
+            child.reset()
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, fn):
+        self.labels().set_function(fn)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=HTTP_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+def _merge(snapshots, gauges=True):
+    """Sum series of several process snapshots ({name: {type, help, labelnames, series}})."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if metric['type'] == 'gauge' and not gauges:
+                continue
+            into = merged.setdefault(name, dict(metric, series={}))
+            series = into['series']
+            for labels, value in (metric['series'].items() if isinstance(metric['series'], dict) else
+                                  ((tuple(k), v) for k, v in metric['series'])):
+                labels = tuple(labels)
+                current = series.get(labels)
+                if current is None:
+                    series[labels] = [list(value[0]), value[1]] if metric['type'] == 'histogram' else value
+                elif metric['type'] == 'histogram':
+                    if len(current[0]) == len(value[0]):
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                else:
+                    series[labels] = current + value
+    return merged
+
+
+def _to_file_format(merged):
+    return {name: dict(m, series=[[list(k), v] for k, v in m['series'].items()]) for name, m in merged.items()}
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value != value:
+        return 'NaN'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in pairs) + '}'
+
+
+def render(merged):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        names = metric['labelnames']
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric['series'].items()):
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(metric['buckets'], counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(names, labels, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(names, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(names, labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+class Registry:
+    """Metrics of this process, optionally shared with sibling processes through a directory.
+
+    Recording is a dict lookup plus a short per-series lock. Without a directory /metrics
+    shows the serving process only. With METRICS_DIR every process (gunicorn workers,
+    worker.py) writes its snapshot there every `interval` seconds and /metrics sums them:
+    counters and histograms of exited processes are folded into dead.json so totals stay
+    monotonic, gauges only count processes that published recently.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.directory = None
+        self.interval = 5.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def snapshot(self):
+        out = {}
+        for metric in list(self._metrics.values()):
+            out[metric.name] = {
+                'type': metric.type, 'help': metric.documentation, 'labelnames': list(metric.labelnames),
+                'series': metric.snapshot(),
+            }
+            if metric.type == 'histogram':
+                out[metric.name]['buckets'] = list(metric.buckets)
+        return out
+
+    def configure(self, directory=None, interval=None):
+        self.directory = directory or None
+        if interval:
+            self.interval = max(0.5, float(interval))
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    # Publishing (METRICS_DIR)
+
+    @staticmethod
+    def _process_name(pid=None):
+        return f"{socket.gethostname()}-{pid or os.getpid()}"
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def start(self):
+        """Start publishing snapshots of this process (no-op without a directory)."""
+        if self._thread is not None or not self.directory:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"[WARN] Publishing metrics failed: {e}")
+
+    def publish(self):
+        _write_json(self._path(self._process_name()), {'pid': os.getpid(), 'time': time.time(), 'metrics': self.snapshot()})
+
+    def after_fork(self):
+        """Start from zero in a forked child; its publisher starts with the first request."""
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def stop(self):
+        """Stop publishing and fold this process's counters into dead.json."""
+        self._stop.set()
+        if not self.directory or self._thread is None:
+            return
+        self._thread = None
+        try:
+            self._retire(self._path(self._process_name()), self.snapshot(), must_exist=False)
+        except Exception as e:
+            print(f"[WARN] Saving final metrics failed: {e}")
+
+    def _retire(self, path, snapshot, must_exist=True):
+        with open(os.path.join(self.directory, 'dead.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            if must_exist and not os.path.exists(path):
+                return  # another process folded it in meanwhile
+            dead = _read_json(self._path('dead')) or {}
+            merged = _merge([dead.get('metrics', {}), snapshot], gauges=False)
+            _write_json(self._path('dead'), {'time': time.time(), 'metrics': _to_file_format(merged)})
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Collection
+
+    def collect(self):
+        """Exposition text for /metrics: this process, plus its siblings with a directory."""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            snapshots += self._siblings()
+        return render(_merge(snapshots))
+
+    def _siblings(self):
+        own = f"{self._process_name()}.json"
+        host = socket.gethostname()
+        stale_after = 3 * self.interval
+        now = time.time()
+        out = []
+        for entry in sorted(os.listdir(self.directory)):
+            if not entry.endswith('.json') or entry in (own, 'dead.json'):
+                continue
+            path = os.path.join(self.directory, entry)
+            data = _read_json(path)
+            if not data:
+                continue
+            metrics = data.get('metrics', {})
+            if now - data.get('time', 0) > stale_after:
+                # Killed (or hung) process: keep its counters, drop its gauges
+                metrics = {name: m for name, m in metrics.items() if m['type'] != 'gauge'}
+                pid = data.get('pid')
+                if pid and entry.startswith(f"{host}-") and not _alive(pid):
+                    self._retire(path, metrics)
+                    continue
+            out.append(metrics)
+        # Read last, so files folded in above are counted exactly once
+        dead = _read_json(self._path('dead'))
+        if dead:
+            out.append(dead.get('metrics', {}))
+        return out
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+REGISTRY = Registry()
+
+# HTTP
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being served.')
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by endpoint.', ('method', 'endpoint', 'status'),
+)
+
+# AI provider
+PROVIDER_REQUEST_SECONDS = Histogram(
+    'provider_request_duration_seconds', 'Chat completion calls to the AI provider (SDK retries included).',
+    ('model', 'outcome'), buckets=PROVIDER_BUCKETS,
+)
+SEGMENT_RETRIES = Counter('translation_retries_total', 'Segment translations retried after a transient provider error.')
+
+# Document pipeline
+DOCUMENT_STAGE_SECONDS = Histogram(
+    'document_stage_duration_seconds', 'Document pipeline stages (parse, translate, rebuild).', ('stage', 'format'),
+    buckets=STAGE_BUCKETS,
+)
+DOCUMENT_SEGMENTS = Counter(
+    'document_segments_total', 'Document segments by outcome (translated, reused from a previous revision, failed).',
+    ('outcome',),
+)
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Text and document result cache lookups.', ('cache', 'result'))
+SEGMENT_QUEUE_DEPTH = Gauge('segment_queue_depth', 'Document segments waiting for a scheduler worker.')
+HISTORY_QUEUE_DEPTH = Gauge('history_write_queue_depth', 'History rows waiting for the write-behind flush.')
+
+# Database
+DB_QUERY_SECONDS = Histogram(
+    'db_query_duration_seconds', 'Quota and history queries.', ('operation',), buckets=DB_BUCKETS,
+)
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+# Load .env từ thư mục backend (nơi có archive.py) – trước khi import config
+_env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(_env_path)
+
+from app import create_app
+from app.services.archive_service import archive_history
+
+# Moves history older than HISTORY_ARCHIVE_DAYS into translation_archive.
+# Run once from cron, or with --loop to repeat every ARCHIVE_INTERVAL seconds.
+app = create_app(os.getenv('APP_CONFIG', 'config.DevelopmentConfig'))
+
+if __name__ == '__main__':
+    days = app.config.get('HISTORY_ARCHIVE_DAYS', 180)
+    batch = app.config.get('HISTORY_ARCHIVE_BATCH', 1000)
+    interval = float(os.getenv('ARCHIVE_INTERVAL', '3600'))
+    while True:
+        with app.app_context():
+            moved = archive_history(days, batch_size=batch)
+        print(f"Archived {moved} history rows older than {days} days")
+        if '--loop' not in sys.argv[1:]:
+            break
+        time.sleep(interval)
@@ -0,0 +1 @@
+"""Offline benchmarks: a local OpenAI-compatible provider, generated corpora and a runner (python -m bench.run)."""
@@ -0,0 +1,143 @@
+"""Deterministic benchmark documents for every supported format.
+
+Sizes are given for scale=1.0 and shrink linearly with --scale. A share of sentences
+repeats (headers, boilerplate, recurring table labels) as in real documents, so the
+text cache and duplicate handling are part of what gets measured.
+"""
+import os
+import random
+
+# Base sizes at scale=1.0
+TXT_CHARS = 200_000
+PDF_PAGES = 60
+DOCX_TABLES = 40  # each 12 rows x 6 columns, plus paragraphs in between
+XLSX_CELLS = 100_000
+HTML_NODES = 5_000
+
+_WORDS = (
+    'contract invoice payment delivery service customer supplier agreement period amount '
+    'report quarter revenue growth market product quality schedule project budget review '
+    'approval department manager employee policy document section clause term notice '
+    'request order shipment warehouse inventory account balance transfer signature date'
+).split()
+
+
+def _sentence(rng, words=(6, 16)):
+    n = rng.randint(*words)
+    return ' '.join(rng.choice(_WORDS) for _ in range(n)).capitalize() + '.'
+
+
+class _Text:
+    """Sentence source where `repeat` of the sentences come from a small recurring pool."""
+
+    def __init__(self, seed, repeat=0.3, pool_size=50):
+        self.rng = random.Random(seed)
+        self.repeat = repeat
+        self.pool = [_sentence(self.rng) for _ in range(pool_size)]
+
+    def sentence(self):
+        if self.rng.random() < self.repeat:
+            return self.rng.choice(self.pool)
+        return _sentence(self.rng)
+
+    def paragraph(self, sentences=(2, 6)):
+        return ' '.join(self.sentence() for _ in range(self.rng.randint(*sentences)))
+
+
+def _scaled(n, scale, minimum=1):
+    return max(minimum, int(n * scale))
+
+
+def make_txt(path, scale, seed):
+    src, parts, size = _Text(seed), [], 0
+    while size < _scaled(TXT_CHARS, scale, 1000):
+        p = src.paragraph()
+        parts.append(p)
+        size += len(p) + 2
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(parts))
+
+
+def make_pdf(path, scale, seed):
+    from fpdf import FPDF
+    src = _Text(seed)
+    pdf = FPDF()
+    pdf.set_font('Arial', size=11)
+    for _ in range(_scaled(PDF_PAGES, scale)):
+        pdf.add_page()
+        for _ in range(8):
+            pdf.multi_cell(0, 6, src.paragraph((3, 5)))
+            pdf.ln(2)
+    pdf.output(path)
+
+
+def make_docx(path, scale, seed):
+    import docx
+    src = _Text(seed, repeat=0.5)
+    doc = docx.Document()
+    doc.add_heading(src.sentence(), level=1)
+    for _ in range(_scaled(DOCX_TABLES, scale)):
+        doc.add_paragraph(src.paragraph())
+        table = doc.add_table(rows=12, cols=6)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                # Header row and label column are text; every third column holds figures
+                if r > 0 and c % 3 == 2:
+                    cell.text = str(src.rng.randint(1, 99999))
+                else:
+                    cell.text = src.sentence()
+    doc.save(path)
+
+
+def make_xlsx(path, scale, seed):
+    import openpyxl
+    src = _Text(seed, repeat=0.6, pool_size=200)
+    wb = openpyxl.Workbook(write_only=True)
+    cells = _scaled(XLSX_CELLS, scale, 100)
+    columns = 10
+    sheets = max(1, cells // 20_000)
+    per_sheet = cells // sheets
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Sheet{s + 1}")
+        for r in range(per_sheet // columns):
+            # Text cells alongside numbers and formulas, which are not translated
+            row = [src.sentence() if c < 6 else src.rng.randint(0, 10 ** 6) for c in range(columns - 1)]
+            row.append(f"=SUM(G{r + 1}:I{r + 1})")
+            ws.append(row)
+    wb.save(path)
+
+
+def make_html(path, scale, seed):
+    src = _Text(seed, repeat=0.4)
+    nodes = _scaled(HTML_NODES, scale, 10)
+    parts = ['<html><head><title>Benchmark</title><style>p{margin:0}</style></head><body>']
+    for i in range(nodes // 5):
+        parts.append(f'<section id="s{i}"><h2>{src.sentence()}</h2><p>{src.paragraph()} <b>{src.sentence()}</b></p>'
+                     f'<ul><li>{src.sentence()}</li><li><a href="#s{i}">{src.sentence()}</a></li></ul>'
+                     '<pre>code block not translated</pre></section>')
+    parts.append('</body></html>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(parts))
+
+
+GENERATORS = {
+    'txt': make_txt,
+    'pdf': make_pdf,
+    'docx': make_docx,
+    'xlsx': make_xlsx,
+    'html': make_html,
+}
+
+
+def build(folder, formats, scale=1.0, docs=1, seed=1):
+    """{format: [paths]}: `docs` distinct documents per format, regenerated only when missing."""
+    os.makedirs(folder, exist_ok=True)
+    out = {}
+    for fmt in formats:
+        out[fmt] = []
+        for i in range(docs):
+            path = os.path.join(folder, f"bench_{fmt}_s{scale:g}_{seed}_{i}.{fmt}")
+            if not os.path.exists(path):
+                GENERATORS[fmt](path, scale, seed * 1000 + i)
+            out[fmt].append(path)
+    return out
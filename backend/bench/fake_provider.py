@@ -0,0 +1,192 @@
+"""Local OpenAI-compatible stand-in for benchmarks: no network, no credits.
+
+Serves POST /v1/chat/completions and GET /v1/models. Every completion waits for a
+latency drawn from a configurable distribution plus a per-token delay (prompt and
+completion tokens, ~4 characters each), and a configurable share of requests fails
+with 429 or 5xx, so client retries and the fail-fast paths are exercised too.
+
+Answers follow the prompt shapes of TranslationService: a JSON array for batch
+prompts, a JSON object keyed by language code for multi-target prompts, otherwise the
+text itself tagged with "[tr]".
+
+    python -m bench.fake_provider --port 8799 --latency lognormal:40:0.5 --rate-429 0.01
+"""
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_LANG_CODES_RE = re.compile(r'([A-Za-z-]+) \(')
+
+
+def parse_latency(spec):
+    """Sampler (seconds) for 'fixed:MS', 'uniform:LO:HI', 'lognormal:MEDIAN:SIGMA' or 'exp:MEAN'."""
+    kind, *params = str(spec).split(':')
+    values = [float(p) for p in params]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == 'lognormal':
+        mu = math.log(max(values[0], 0.001))
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000.0
+    if kind == 'exp':
+        return lambda rng: rng.expovariate(1.0 / max(values[0], 0.001)) / 1000.0
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+
+def fake_translate(text):
+    return f"[tr] {text}"
+
+
+def answer(system_prompt, content):
+    """Completion text for a TranslationService prompt."""
+    if 'JSON array' in system_prompt:
+        try:
+            items = json.loads(content)
+            return json.dumps([fake_translate(t) for t in items], ensure_ascii=False)
+        except ValueError:
+            pass
+    if 'JSON object' in system_prompt:
+        langs = system_prompt.split('languages:', 1)[-1].split('.', 1)[0]
+        return json.dumps({code: f"[{code}] {content}" for code in _LANG_CODES_RE.findall(langs)}, ensure_ascii=False)
+    return fake_translate(content)
+
+
+class FakeProvider:
+    """Threaded HTTP server; start() runs it in the background and returns its base_url."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency='lognormal:40:0.5', ms_per_token=0.0,
+                 rate_429=0.0, rate_5xx=0.0, retry_after_ms=100, seed=1):
+        self.sample_latency = parse_latency(latency)
+        self.ms_per_token = float(ms_per_token)
+        self.rate_429 = float(rate_429)
+        self.rate_5xx = float(rate_5xx)
+        self.retry_after_ms = int(retry_after_ms)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.stats = {'requests': 0, 'completions': 0, '429': 0, '5xx': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self._stats_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-provider', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, **fields):
+        with self._stats_lock:
+            for name, n in fields.items():
+                self.stats[name] += n
+
+    def _draw(self):
+        with self._rng_lock:
+            return self._rng.random(), self.sample_latency(self._rng)
+
+    def _handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    self._send(200, {'object': 'list', 'data': [{'id': 'fake-model', 'object': 'model'}]})
+                else:
+                    self._send(404, {'error': {'message': 'Not found'}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send(404, {'error': {'message': 'Not found'}})
+                    return
+                provider._count(requests=1)
+                roll, delay = provider._draw()
+                if roll < provider.rate_429:
+                    provider._count(**{'429': 1})
+                    time.sleep(delay / 4)
+                    self._send(429, {'error': {'message': 'Rate limit reached (fake provider)', 'type': 'rate_limit'}},
+                               {'retry-after-ms': str(provider.retry_after_ms)})
+                    return
+                if roll < provider.rate_429 + provider.rate_5xx:
+                    provider._count(**{'5xx': 1})
+                    time.sleep(delay)
+                    self._send(503, {'error': {'message': 'Service temporarily unavailable (fake provider)'}})
+                    return
+
+                messages = payload.get('messages') or []
+                system_prompt = next((m.get('content') or '' for m in messages if m.get('role') == 'system'), '')
+                content = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+                out = answer(system_prompt, content)
+                prompt_tokens = (len(system_prompt) + len(content)) // 4 + 1
+                completion_tokens = len(out) // 4 + 1
+                time.sleep(delay + provider.ms_per_token * (prompt_tokens + completion_tokens) / 1000.0)
+                provider._count(completions=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+                self._send(200, {
+                    'id': f"chatcmpl-fake-{provider.stats['requests']}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': payload.get('model') or 'fake-model',
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': out}, 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                              'total_tokens': prompt_tokens + completion_tokens},
+                })
+
+        return Handler
+
+
+def add_provider_args(parser):
+    parser.add_argument('--latency', default='lognormal:40:0.5',
+                        help='fixed:MS | uniform:LO:HI | lognormal:MEDIAN_MS:SIGMA | exp:MEAN_MS')
+    parser.add_argument('--ms-per-token', type=float, default=0.05, help='extra delay per prompt+completion token')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='share of requests answered 429')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='share of requests answered 503')
+    parser.add_argument('--retry-after-ms', type=int, default=100)
+
+
+def provider_from_args(args, port=0):
+    return FakeProvider(port=port, latency=args.latency, ms_per_token=args.ms_per_token, rate_429=args.rate_429,
+                        rate_5xx=args.rate_5xx, retry_after_ms=args.retry_after_ms, seed=args.seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--seed', type=int, default=1)
+    add_provider_args(parser)
+    args = parser.parse_args()
+    provider = provider_from_args(args, port=args.port)
+    print(f"Fake provider on {provider.base_url} (OPENAI_BASE_URL)")
+    try:
+        provider.server.serve_forever()
+    except KeyboardInterrupt:
+        provider.stop()
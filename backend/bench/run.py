@@ -0,0 +1,335 @@
+"""Offline throughput benchmark of TranslationService and FileService.
+
+Starts the fake provider (bench/fake_provider.py), generates the corpora (bench/corpus.py)
+and runs each scenario through the real services:
+
+    text   translate_text on unique strings from --concurrency threads (/text)
+    bulk   translate_many in requests of 500 strings (/text/batch)
+    html   translate_html on large pages
+    txt, pdf, docx, xlsx   FileService.process_document (parse -> translate -> rebuild)
+
+Reports docs/sec, segments/sec, p50/p95/p99 latency of provider calls as the pipeline sees
+them (SDK retries included), failures and peak RSS. Results can be saved as a baseline and
+later runs compared against it; --compare exits 1 when a metric regressed by more than
+--tolerance. Only compare runs made with the same settings on the same machine.
+
+    python -m bench.run --scale 0.1 --save-baseline bench/baseline.json
+    python -m bench.run --scale 0.1 --compare bench/baseline.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import corpus
+from bench.fake_provider import add_provider_args, provider_from_args
+
+SCENARIOS = ('text', 'bulk', 'html', 'txt', 'pdf', 'docx', 'xlsx')
+TEXT_ITEMS = 2000  # strings for the text/bulk scenarios at scale=1.0
+BULK_REQUEST_ITEMS = 500
+# metric -> True when higher is better
+COMPARED_METRICS = {'docs_per_sec': True, 'segments_per_sec': True, 'p95_ms': False, 'peak_rss_mb': False}
+# p95 of fewer provider calls is mostly noise and is not compared
+MIN_LATENCY_SAMPLES = 50
+
+
+def percentile(values, p):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100.0 * len(ordered)) - 1)]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class TimedClient:
+    """OpenAI client wrapper recording the wall time and outcome of every completion call."""
+
+    def __init__(self, client):
+        self._client = client
+        self.models = client.models
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latencies_ms = []
+            self.failures = 0
+
+    def _create(self, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self._client.chat.completions.create(**kwargs)
+            ok = True
+            return response
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000.0
+            with self._lock:
+                self.latencies_ms.append(elapsed)
+                if not ok:
+                    self.failures += 1
+
+
+def _sentences(n, seed):
+    src = corpus._Text(seed, repeat=0.3, pool_size=100)
+    return [f"{src.sentence()} #{i}" if i % 3 else src.sentence() for i in range(n)]
+
+
+def run_text(service, args, paths):
+    items = list(dict.fromkeys(_sentences(max(10, int(TEXT_ITEMS * args.scale)), args.seed)))
+    failed = [0]
+
+    def one(text):
+        try:
+            service.translate_text(text, 'auto', 'vi')
+        except Exception:
+            failed[0] += 1
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        list(ex.map(one, items))
+    return {'docs': len(items), 'segments': len(items), 'errors': failed[0]}
+
+
+def run_bulk(service, args, paths):
+    items = _sentences(max(10, int(TEXT_ITEMS * args.scale)) * 2, args.seed + 1)
+    errors = 0
+    requests = [items[i:i + BULK_REQUEST_ITEMS] for i in range(0, len(items), BULK_REQUEST_ITEMS)]
+    for chunk in requests:
+        errors += sum(1 for out, error in service.translate_many(chunk, 'auto', 'vi') if out is None)
+    return {'docs': len(requests), 'segments': len(items), 'errors': errors}
+
+
+def run_html(service, args, paths):
+    segments, errors = 0, 0
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        out = service.translate_html(html, 'auto', 'vi')
+        translated = out.count('[tr]')
+        segments += translated
+        errors += 0 if translated else 1
+    return {'docs': len(paths), 'segments': segments, 'errors': errors}
+
+
+def run_documents(service, args, paths, output_folder):
+    from app.services.file_service import SegmentMemory
+    totals = {'docs': len(paths), 'segments': 0, 'errors': 0}
+    lock = threading.Lock()
+    # Fresh copies as fresh uploads: the parse stage saves its result beside the file
+    upload_folder = tempfile.mkdtemp(prefix='translation-bench-in-', dir=output_folder)
+    copies = []
+    for path in paths:
+        copies.append(os.path.join(upload_folder, os.path.basename(path)))
+        shutil.copyfile(path, copies[-1])
+
+    def one(path):
+        memory = SegmentMemory()
+        try:
+            service.file_service.process_document(path, 'vi', memory=memory, output_folder=output_folder)
+            failed = memory.failed
+        except Exception as e:
+            print(f"  {os.path.basename(path)} failed: {e}")
+            failed = 1
+        with lock:
+            totals['segments'] += memory.translated + memory.reused
+            totals['errors'] += failed
+
+    with ThreadPoolExecutor(max_workers=args.doc_concurrency) as ex:
+        list(ex.map(one, copies))
+    return totals
+
+
+def warm_up(file_service):
+    """Start the parse/rebuild process pool so spawn cost is not charged to the first scenario."""
+    n = file_service.process_workers
+    if n > 0:
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            list(ex.map(lambda _: file_service._cpu_stage(time.sleep, 0.2), range(n)))
+
+
+def run(args):
+    # The services read their settings from the environment when no app is configured
+    os.environ.setdefault('AI_MODEL', 'fake-model')
+    import openai
+    from app.services.text_cache import TextCache
+    from app.services.translation_service import TranslationService
+
+    provider = provider_from_args(args)
+    base_url = provider.start()
+    corpus_dir = args.corpus_dir or os.path.join(tempfile.gettempdir(), 'translation-bench-corpus')
+    formats = [s for s in args.scenarios if s in corpus.GENERATORS]
+    print(f"Generating corpora in {corpus_dir} (scale {args.scale:g}) ...")
+    documents = corpus.build(corpus_dir, formats, scale=args.scale, docs=args.docs, seed=args.seed)
+
+    service = TranslationService()
+    client = TimedClient(openai.OpenAI(base_url=base_url, api_key='bench', max_retries=args.max_retries))
+    service.openai_client = client
+    service.file_service.concurrency = args.concurrency
+    service.file_service.process_workers = args.process_workers
+    output_folder = tempfile.mkdtemp(prefix='translation-bench-out-')
+
+    results = {}
+    try:
+        warm_up(service.file_service)
+        for name in args.scenarios:
+            # Cold text cache per scenario: repeats inside a document still hit it
+            service.text_cache = TextCache(int(os.getenv('TEXT_CACHE_SIZE', '10000')))
+            client.reset()
+            paths = documents.get(name, [])
+            start = time.perf_counter()
+            if name == 'text':
+                out = run_text(service, args, paths)
+            elif name == 'bulk':
+                out = run_bulk(service, args, paths)
+            elif name == 'html':
+                out = run_html(service, args, paths)
+            else:
+                out = run_documents(service, args, paths, output_folder)
+            seconds = time.perf_counter() - start
+            latencies = list(client.latencies_ms)
+            results[name] = {
+                'docs': out['docs'],
+                'segments': out['segments'],
+                'seconds': round(seconds, 3),
+                'docs_per_sec': round(out['docs'] / seconds, 3) if seconds else None,
+                'segments_per_sec': round(out['segments'] / seconds, 1) if seconds else None,
+                'p50_ms': _round(percentile(latencies, 50)),
+                'p95_ms': _round(percentile(latencies, 95)),
+                'p99_ms': _round(percentile(latencies, 99)),
+                'provider_calls': len(latencies),
+                'provider_failures': client.failures,
+                'errors': out['errors'],
+                'peak_rss_mb': peak_rss_mb(),
+            }
+            _print_row(name, results[name])
+    finally:
+        service.file_service.shutdown()
+        provider.stop()
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'git': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'settings': _settings(args),
+        },
+        'provider': dict(provider.stats),
+        'peak_rss_mb': {'self': peak_rss_mb(), 'children': peak_rss_mb(resource.RUSAGE_CHILDREN)},
+        'scenarios': results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Print metric deltas against baseline; returns the list of regressions."""
+    if current['meta']['settings'] != baseline['meta'].get('settings'):
+        print("WARNING: settings differ from the baseline; numbers are not comparable")
+    regressions = []
+    print(f"\n{'scenario':<8} {'metric':<17} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, now in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), now.get(metric)
+            if not old or new is None:
+                continue
+            if metric == 'p95_ms' and min(before.get('provider_calls', 0), now['provider_calls']) < MIN_LATENCY_SAMPLES:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > tolerance:
+                flag = '  REGRESSION'
+                regressions.append((name, metric, old, new))
+            print(f"{name:<8} {metric:<17} {old:>10} {new:>10} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def _print_row(name, r):
+    print(f"  {name:<5} {r['docs']:>5} docs {r['segments']:>7} segments in {r['seconds']:>7.2f}s | "
+          f"{r['docs_per_sec']:>7.2f} docs/s {r['segments_per_sec']:>8.1f} seg/s | "
+          f"p50 {r['p50_ms']} p95 {r['p95_ms']} p99 {r['p99_ms']} ms | "
+          f"errors {r['errors']} | rss {r['peak_rss_mb']} MB")
+
+
+def _settings(args):
+    names = ('scale', 'docs', 'seed', 'concurrency', 'doc_concurrency', 'process_workers', 'max_retries',
+             'latency', 'ms_per_token', 'rate_429', 'rate_5xx', 'retry_after_ms')
+    return {name: getattr(args, name) for name in names}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument('--scale', type=float, default=0.1, help='corpus size; 1.0 = full size (100k-cell XLSX, 60-page PDF)')
+    parser.add_argument('--docs', type=int, default=2, help='documents per format')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=8, help='segment/request threads (TRANSLATION_CONCURRENCY)')
+    parser.add_argument('--doc-concurrency', type=int, default=2, help='documents processed at once')
+    parser.add_argument('--process-workers', type=int, default=2, help='DOCUMENT_PROCESS_WORKERS (0 = inline)')
+    parser.add_argument('--max-retries', type=int, default=2, help='openai SDK retries on 429/5xx')
+    parser.add_argument('--corpus-dir')
+    parser.add_argument('--out', help='write the results JSON here')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the results as the new baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a baseline; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression (0.15 = 15%%)')
+    add_provider_args(parser)
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = run(args)
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
+            print(f"Results written to {path}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,33 @@ from dotenv import load_dotenv
 # Load .env từ thư mục backend (config.py nằm trong backend/)
 load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
 
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+def engine_options(uri, pool_size=10, max_overflow=20):
+    """SQLALCHEMY_ENGINE_OPTIONS for uri; DB_POOL_* variables override the defaults.
+
+    Size the pool for request threads plus JOB_WORKER_CONCURRENCY job threads, which hold
+    a connection while they update their job. pool_recycle stays below MySQL's
+    wait_timeout and pool_pre_ping replaces connections the server dropped.
+    """
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', str(pool_size))),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', str(max_overflow))),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', 'true'),
+    }
+    if uri.startswith('sqlite'):
+        # Connections move between request, job and writer threads; locking is handled by
+        # busy_timeout and the single-writer lock (see app/utils/database.py)
+        options['connect_args'] = {'check_same_thread': False, 'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))}
+        if uri in ('sqlite://', 'sqlite:///:memory:'):
+            return {'connect_args': options['connect_args']}
+    return options
+
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
@@ -11,6 +38,17 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'mysql+pymysql://root:@localhost:3306/ai_translation')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Embedded SQLite (DATABASE_URL=sqlite:///path.db) for single-node deployments and benchmarks:
+    # WAL journal plus these pragmas; SQLITE_SINGLE_WRITER queues write transactions per process
+    SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_KB = int(os.getenv('SQLITE_CACHE_KB', '20000'))
+    SQLITE_MMAP_BYTES = int(os.getenv('SQLITE_MMAP_BYTES', str(256 * 1024 * 1024)))
+    SQLITE_SINGLE_WRITER = _env_bool('SQLITE_SINGLE_WRITER', 'true')
+    # Create/upgrade the schema and fill derived tables when the app starts; with false,
+    # startup does not touch the database and `python migrate.py` applies them on deploy
+    DB_AUTO_MIGRATE = _env_bool('DB_AUTO_MIGRATE', 'true')
     
     # Google OAuth
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
@@ -43,12 +81,101 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     DOWNLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'downloads')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
+    # Resumable chunked uploads (/api/translation/document/uploads); each chunk request
+    # stays under MAX_CONTENT_LENGTH, the whole file under UPLOAD_MAX_SIZE
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))
+    UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', str(500 * 1024 * 1024)))
+    UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', '86400'))
+    # Batch API (/api/translation/batch): documents (zip entries included) and target languages per request
+    BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', '50'))
+    BATCH_MAX_TARGETS = int(os.getenv('BATCH_MAX_TARGETS', '10'))
+    # Bulk text (/api/translation/text/batch): strings x target languages per request
+    BULK_TEXT_MAX_ITEMS = int(os.getenv('BULK_TEXT_MAX_ITEMS', '10000'))
+    # In-process LRU of text translations shared by text, bulk text and document segments
+    TEXT_CACHE_SIZE = int(os.getenv('TEXT_CACHE_SIZE', '10000'))
+    # Write-behind for text history rows: batched off the request path every
+    # HISTORY_FLUSH_INTERVAL_MS or HISTORY_FLUSH_ROWS rows (quota counters stay synchronous)
+    HISTORY_WRITE_BEHIND = os.getenv('HISTORY_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+    HISTORY_FLUSH_ROWS = int(os.getenv('HISTORY_FLUSH_ROWS', '500'))
+    HISTORY_FLUSH_INTERVAL_MS = int(os.getenv('HISTORY_FLUSH_INTERVAL_MS', '200'))
+    HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', '10000'))
+    # History texts of at least HISTORY_COMPRESS_MIN_BYTES are stored compressed
+    # (zlib, or zstd when the zstandard package is installed; 'none' stores plain UTF-8)
+    HISTORY_COMPRESSION = os.getenv('HISTORY_COMPRESSION', 'zlib')
+    HISTORY_COMPRESS_MIN_BYTES = int(os.getenv('HISTORY_COMPRESS_MIN_BYTES', '512'))
+    # archive.py moves history older than HISTORY_ARCHIVE_DAYS into translation_archive (0 = keep all live)
+    HISTORY_ARCHIVE_DAYS = int(os.getenv('HISTORY_ARCHIVE_DAYS', '180'))
+    HISTORY_ARCHIVE_BATCH = int(os.getenv('HISTORY_ARCHIVE_BATCH', '1000'))
+    # Callers are resolved from JWT claims (uid, plan) and this per-process cache instead of a
+    # User query per request; entries are dropped when the plan or profile changes, but only
+    # in the process that made the change, so there is no cached entry with several workers
+    IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', '10000'))
+    IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', '300' if int(os.getenv('WEB_CONCURRENCY', '1')) <= 1 else '0'))
+    # Daily quota reads (usage_counter rows) are cached per process for this many seconds
+    USAGE_CACHE_TTL = float(os.getenv('USAGE_CACHE_TTL', '30'))
+
+    # Document jobs (durable queue in the translation_job table)
+    # JOB_WORKER_EMBEDDED=false: this process only enqueues; run worker.py to process jobs
+    JOB_WORKER_EMBEDDED = os.getenv('JOB_WORKER_EMBEDDED', 'true').lower() not in ('0', 'false', 'no')
+    JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', '8'))  # jobs run in parallel per worker
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    # On shutdown running jobs get this long to finish; the rest are requeued for other workers
+    JOB_DRAIN_TIMEOUT = float(os.getenv('JOB_DRAIN_TIMEOUT', '30'))
+    # Progress stream (/document/events/<job_id>). Each open stream holds a gunicorn request
+    # thread for up to JOB_EVENTS_MAX_DURATION, so WEB_CONCURRENCY x GUNICORN_THREADS must
+    # cover the concurrent streams plus regular requests
+    JOB_EVENTS_MIN_INTERVAL = float(os.getenv('JOB_EVENTS_MIN_INTERVAL', '0.5'))
+    JOB_EVENTS_POLL_INTERVAL = float(os.getenv('JOB_EVENTS_POLL_INTERVAL', '2.0'))
+    JOB_EVENTS_KEEPALIVE = float(os.getenv('JOB_EVENTS_KEEPALIVE', '15'))
+    JOB_EVENTS_MAX_DURATION = float(os.getenv('JOB_EVENTS_MAX_DURATION', '600'))
+
+    # Global segment scheduler: one provider-call budget per process shared by all jobs,
+    # split between users by plan weight (free:1,pro:3,promax:6)
+    # Segments translated at once on this node, split evenly over the SCHEDULER_PROCESSES
+    # processes that run jobs (gunicorn.conf.py sets it to its worker count when they do)
+    SCHEDULER_CONCURRENCY = int(os.getenv('SCHEDULER_CONCURRENCY', '8'))
+    SCHEDULER_PROCESSES = int(os.getenv('SCHEDULER_PROCESSES', '1'))
+    SCHEDULER_PLAN_WEIGHTS = os.getenv('SCHEDULER_PLAN_WEIGHTS', 'free:1,pro:3,promax:6')
+    # Processes for CPU-bound document parse/rebuild (0 = run them on the job thread)
+    DOCUMENT_PROCESS_WORKERS = int(os.getenv('DOCUMENT_PROCESS_WORKERS', str(min(2, os.cpu_count() or 1))))
+    # Content-addressed cache of translated documents (downloads/results), evicted LRU above this size
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(5 * 1024 ** 3)))
+    # Outputs of jobs completed within this many seconds are never evicted (0 = no pinning)
+    RESULT_CACHE_PIN_SECONDS = int(os.getenv('RESULT_CACHE_PIN_SECONDS', '86400'))
+    # Segment records kept for revision uploads (uploads/.revisions); 0 disables a limit
+    REVISION_MAX_AGE_DAYS = float(os.getenv('REVISION_MAX_AGE_DAYS', '30'))
+    REVISION_MAX_COUNT = int(os.getenv('REVISION_MAX_COUNT', '10000'))
+
+    # Downloads: signed links valid for DOWNLOAD_URL_TTL seconds (key defaults to SECRET_KEY).
+    # DOWNLOAD_OFFLOAD hands transfers to the proxy: '' (Flask), 'x-accel' (nginx) or 'x-sendfile'
+    DOWNLOAD_SIGNING_KEY = os.getenv('DOWNLOAD_SIGNING_KEY')
+    DOWNLOAD_URL_TTL = int(os.getenv('DOWNLOAD_URL_TTL', '900'))
+    DOWNLOAD_ALLOW_UNSIGNED = os.getenv('DOWNLOAD_ALLOW_UNSIGNED', 'false').lower() in ('1', 'true', 'yes')
+    DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', '')
+    DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '/_protected_downloads/')
+    DOWNLOAD_MAX_AGE = int(os.getenv('DOWNLOAD_MAX_AGE', '3600'))
+
+    # Prometheus metrics at /metrics (METRICS_TOKEN: bearer token required to scrape, if set).
+    # METRICS_DIR: directory shared by the processes of a node (gunicorn workers, worker.py);
+    # each publishes its metrics there every METRICS_FLUSH_INTERVAL seconds and /metrics sums them
+    METRICS_ENABLED = _env_bool('METRICS_ENABLED', 'true')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_DIR = os.getenv('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
     
     # Frontend URL
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(Config.SQLALCHEMY_DATABASE_URI, pool_size=5, max_overflow=10)
 
 class ProductionConfig(Config):
-    DEBUG = False
\ No newline at end of file
+    DEBUG = False
+    DB_AUTO_MIGRATE = _env_bool('DB_AUTO_MIGRATE', 'false')
+    # Jobs run in worker.py, so gunicorn workers can be recycled (gunicorn.conf.py) and
+    # job concurrency does not grow with WEB_CONCURRENCY
+    JOB_WORKER_EMBEDDED = _env_bool('JOB_WORKER_EMBEDDED', 'false')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(Config.SQLALCHEMY_DATABASE_URI, pool_size=20, max_overflow=20)
\ No newline at end of file
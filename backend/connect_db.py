@@ -65,11 +65,10 @@ def create_tables():
     print(f"\n📦 Creating tables...")
     try:
         from app import create_app
+        from app.utils.database import migrate_database
         app = create_app()
-        with app.app_context():
-            from app.models import db
-            db.create_all()
-            print("✅ Tables created successfully")
+        migrate_database(app, strict=True)
+        print("✅ Tables created successfully")
         return True
     except Exception as e:
         print(f"❌ Failed to create tables: {e}")
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import multiprocessing
+from dotenv import load_dotenv
+
+# Same .env as wsgi.py, read here too so the settings below see it
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+# Production serving: gunicorn -c gunicorn.conf.py (run migrate.py first)
+# Pre-fork model: the app is imported once in the master (preload_app) and forked into
+# `workers` processes of `threads` request threads each; post_fork gives every worker its
+# own DB connections, provider clients and executors, worker_exit drains its jobs.
+# Everything per process multiplies by `workers`: with the embedded job worker each one
+# runs up to JOB_WORKER_CONCURRENCY jobs. SegmentScheduler splits SCHEDULER_CONCURRENCY
+# over the workers (SCHEDULER_PROCESSES, set below) instead.
+wsgi_app = 'wsgi:app'
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = 'gthread'
+# Exported so the app can tell it runs in several processes (IDENTITY_CACHE_TTL)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+# Job event streams (SSE) stay open up to JOB_EVENTS_MAX_DURATION; gthread keeps
+# heartbeating the master meanwhile, so timeout only catches stuck workers
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+keepalive = 5
+# Time a stopping worker gets to finish requests and drain jobs (JOB_DRAIN_TIMEOUT) before SIGKILL
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '60'))
+# Same default as the app config wsgi.py loads: ProductionConfig leaves jobs to worker.py
+_job_worker_embedded = os.getenv(
+    'JOB_WORKER_EMBEDDED',
+    'false' if (os.getenv('APP_CONFIG') or 'config.ProductionConfig').endswith('ProductionConfig') else 'true',
+).lower() not in ('0', 'false', 'no')
+# Recycle workers now and then to bound memory growth; jitter avoids restarting all at once.
+# Never with the embedded job worker: a recycled worker hands its running jobs back after
+# JOB_DRAIN_TIMEOUT and long documents would restart over and over
+max_requests = 0 if _job_worker_embedded else int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '500'))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+# Job-running workers share the node's segment budget (SegmentScheduler.configure)
+if _job_worker_embedded:
+    os.environ.setdefault('SCHEDULER_PROCESSES', str(workers))
+# Workers publish their metrics here so /metrics, served by any one of them, reports all.
+# Set before the app is preloaded so Config picks it up; one directory per master
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"translation-metrics-{os.getpid()}"))
+
+
+def post_fork(server, worker):
+    from app.utils.lifecycle import after_fork
+    after_fork(server.app.wsgi())
+
+
+def worker_exit(server, worker):
+    from app.utils.lifecycle import shutdown
+    app = server.app.wsgi()
+    shutdown(app, min(float(app.config.get('JOB_DRAIN_TIMEOUT', 30)), graceful_timeout - 5))
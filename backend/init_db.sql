@@ -26,17 +26,72 @@ CREATE TABLE IF NOT EXISTS `user` (
 CREATE TABLE IF NOT EXISTS `translation` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `user_id` INT NULL,
-  `original_text` LONGTEXT,
-  `translated_text` LONGTEXT,
+  `original_text` LONGBLOB,
+  `translated_text` LONGBLOB,
   `source_lang` VARCHAR(10),
   `target_lang` VARCHAR(10),
   `file_path` VARCHAR(500),
+  `content_hash` VARCHAR(64),
+  `original_preview` VARCHAR(201),
+  `translated_preview` VARCHAR(201),
   `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
-  INDEX (`user_id`),
+  INDEX `ix_translation_user_created` (`user_id`, `created_at`),
+  INDEX `ix_translation_user_hash` (`user_id`, `content_hash`),
   CONSTRAINT `fk_translation_user` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`)
     ON DELETE SET NULL ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- history rows older than HISTORY_ARCHIVE_DAYS (moved by archive.py, same ids and stored bytes)
+CREATE TABLE IF NOT EXISTS `translation_archive` (
+  `id` INT PRIMARY KEY,
+  `user_id` INT NULL,
+  `original_text` LONGBLOB,
+  `translated_text` LONGBLOB,
+  `source_lang` VARCHAR(10),
+  `target_lang` VARCHAR(10),
+  `file_path` VARCHAR(500),
+  `content_hash` VARCHAR(64),
+  `original_preview` VARCHAR(201),
+  `translated_preview` VARCHAR(201),
+  `created_at` DATETIME,
+  `archived_at` DATETIME,
+  INDEX `ix_translation_archive_user_created` (`user_id`, `created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- translations per user and UTC day (daily quota without scanning history)
+CREATE TABLE IF NOT EXISTS `usage_counter` (
+  `user_id` INT NOT NULL,
+  `day` DATE NOT NULL,
+  `count` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`user_id`, `day`),
+  CONSTRAINT `fk_usage_counter_user` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- history rows per user, UTC day, language pair and kind (text/document), behind /api/history/stats
+CREATE TABLE IF NOT EXISTS `usage_rollup` (
+  `user_id` INT NOT NULL,
+  `day` DATE NOT NULL,
+  `source_lang` VARCHAR(10) NOT NULL DEFAULT '',
+  `target_lang` VARCHAR(10) NOT NULL DEFAULT '',
+  `kind` VARCHAR(10) NOT NULL,
+  `count` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`user_id`, `day`, `source_lang`, `target_lang`, `kind`),
+  CONSTRAINT `fk_usage_rollup_user` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- full-text search over history (accent-folded copies, maintained by the app on insert/delete)
+CREATE TABLE IF NOT EXISTS `translation_search` (
+  `translation_id` INT PRIMARY KEY,
+  `user_id` INT NOT NULL,
+  `created_at` DATETIME,
+  `original_text` LONGTEXT,
+  `translated_text` LONGTEXT,
+  INDEX `ix_translation_search_user` (`user_id`, `created_at`),
+  FULLTEXT KEY `ft_translation_search` (`original_text`, `translated_text`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- payments table
 CREATE TABLE IF NOT EXISTS `payment` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
@@ -50,3 +105,37 @@ CREATE TABLE IF NOT EXISTS `payment` (
   CONSTRAINT `fk_payment_user` FOREIGN KEY (`user_id`) REFERENCES `user` (`id`)
     ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- durable document job queue (shared by API nodes and translation workers)
+CREATE TABLE IF NOT EXISTS `translation_job` (
+  `id` VARCHAR(36) PRIMARY KEY,
+  `user_id` VARCHAR(255),
+  `file_path` VARCHAR(500) NOT NULL,
+  `target_lang` VARCHAR(10) NOT NULL,
+  `base_job_id` VARCHAR(36),
+  `batch_id` VARCHAR(36),
+  `result_key` VARCHAR(64),
+  `incremental` BOOLEAN DEFAULT TRUE,
+  `status` VARCHAR(20) DEFAULT 'pending',
+  `priority` INT DEFAULT 1,
+  `virtual_start` DOUBLE,
+  `progress` INT DEFAULT 0,
+  `message` VARCHAR(255),
+  `download_path` VARCHAR(500),
+  `error` TEXT,
+  `fallback` BOOLEAN DEFAULT FALSE,
+  `fallback_reason` VARCHAR(255),
+  `segments_reused` INT DEFAULT 0,
+  `segments_translated` INT DEFAULT 0,
+  `eta_seconds` INT,
+  `cancel_requested` BOOLEAN DEFAULT FALSE,
+  `attempts` INT DEFAULT 0,
+  `worker_id` VARCHAR(100),
+  `lease_expires_at` DATETIME,
+  `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  INDEX (`user_id`),
+  INDEX (`batch_id`),
+  INDEX `ix_translation_job_status_vstart` (`status`, `virtual_start`, `created_at`),
+  INDEX (`lease_expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
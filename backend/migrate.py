@@ -0,0 +1,25 @@
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load .env từ thư mục backend (nơi có migrate.py) – trước khi import config
+_env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(_env_path)
+
+# Schema migrations as an explicit deploy step: creates missing tables and indexes,
+# applies additive column changes and fills the search index and usage rollups.
+# Needed before starting API processes or workers that run with DB_AUTO_MIGRATE=false.
+os.environ['DB_AUTO_MIGRATE'] = 'false'
+
+from app import create_app
+from app.utils.database import migrate_database
+
+app = create_app(os.getenv('APP_CONFIG', 'config.DevelopmentConfig'))
+
+if __name__ == '__main__':
+    try:
+        migrate_database(app, strict=True)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+    print("✅ Database schema is up to date")
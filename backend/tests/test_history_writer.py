@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.models import db, Translation, UsageRollup, User
+from app.services.history_writer import HistoryWriter
+from app.services.search_service import search_index
+
+
+@pytest.fixture
+def writer(db_app):
+    with db_app.app_context():
+        db.session.add(User(id=1, google_id='g1', email='a@example.com'))
+        db.session.commit()
+        search_index.ensure_schema(db.engine)
+    w = HistoryWriter(interval_ms=1)
+    w.init_app(db_app)
+    return w
+
+
+def _row(i, created_at=None):
+    return {
+        'user_id': 1, 'original_text': f"Hợp đồng số {i}", 'translated_text': f"Contract {i}",
+        'source_lang': 'vi', 'target_lang': 'en', 'created_at': created_at or datetime.utcnow(),
+    }
+
+
+def _state(app):
+    with app.app_context():
+        rows = Translation.query.order_by(Translation.id).all()
+        indexed = db.session.execute(text('SELECT translation_id FROM translation_search')).scalars().all()
+        rollup = db.session.query(db.func.sum(UsageRollup.count)).scalar() or 0
+        return rows, sorted(indexed), rollup
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_batch_is_inserted_with_index_and_rollups(db_app, writer, monkeypatch, returning):
+    with db_app.app_context():
+        # False takes the MySQL path: ids read back by content_hash
+        monkeypatch.setattr(db.engine.dialect, 'insert_executemany_returning', returning)
+    writer._write([_row(i) for i in range(5)])
+    rows, indexed, rollup = _state(db_app)
+    assert [r.original_text for r in rows] == [f"Hợp đồng số {i}" for i in range(5)]
+    assert all(r.content_hash and r.original_preview == r.original_text for r in rows)
+    assert indexed == [r.id for r in rows]
+    assert rollup == 5
+    assert writer.flushed == 5 and writer.failed == 0
+
+
+def test_bad_row_only_drops_itself(db_app, writer):
+    rows = [_row(i) for i in range(7)]
+    rows[3] = _row(3, created_at='yesterday')  # rejected when the statement binds it
+    writer._write(rows)
+    written, indexed, rollup = _state(db_app)
+    assert [r.original_text for r in written] == [f"Hợp đồng số {i}" for i in (0, 1, 2, 4, 5, 6)]
+    assert len(indexed) == 6 and rollup == 6
+    assert writer.flushed == 6 and writer.failed == 1
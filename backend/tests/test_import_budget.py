@@ -0,0 +1,57 @@
+"""Startup cost of the WSGI entry point (python -m pytest tests from backend/).
+
+Provider SDKs and HTTP clients are built on first use (TranslationService properties,
+google-auth at sign-in), so a gunicorn master or worker.py must be able to load the
+app without them. IMPORT_BUDGET_SECONDS overrides the budget on slow machines.
+"""
+import os
+import sys
+import json
+import subprocess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_SECONDS = float(os.getenv('IMPORT_BUDGET_SECONDS', '2.0'))
+# Top-level packages that must only be imported when a request needs them
+LAZY_PACKAGES = ('openai', 'deepl', 'google', 'requests')
+
+_PROBE = (
+    "import sys, json, wsgi; "
+    f"print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in {LAZY_PACKAGES!r})))"
+)
+
+
+def _import_wsgi(tmp_path):
+    env = dict(os.environ)
+    env.update({
+        'APP_CONFIG': 'config.ProductionConfig',
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'import_budget.db'}",
+        'METRICS_DIR': str(tmp_path / 'metrics'),
+    })
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def _cumulative_seconds(importtime_log, module):
+    # "import time: self [us] | cumulative | imported package"
+    for line in importtime_log.splitlines():
+        parts = line.split('|')
+        if line.startswith('import time:') and len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    raise AssertionError(f"{module} missing from -X importtime output")
+
+
+def test_provider_sdks_are_not_imported(tmp_path):
+    loaded, _ = _import_wsgi(tmp_path)
+    assert loaded == []
+
+
+def test_import_time_within_budget(tmp_path):
+    # Warm run first so the measured one does not pay for writing .pyc files
+    _import_wsgi(tmp_path)
+    _, log = _import_wsgi(tmp_path)
+    seconds = _cumulative_seconds(log, 'wsgi')
+    assert seconds < BUDGET_SECONDS, f"import wsgi took {seconds:.2f}s (budget {BUDGET_SECONDS}s)"
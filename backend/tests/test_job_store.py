@@ -0,0 +1,66 @@
+import time
+from collections import Counter
+
+import pytest
+
+from app.services.job_store import JobStore
+
+
+@pytest.fixture
+def store(db_app):
+    return JobStore(db_app)
+
+
+def _submit(store, user_id, n, weight=1):
+    ids = []
+    for i in range(n):
+        job_id = f"{user_id}-{i}-{time.monotonic_ns()}"
+        store.create(job_id, '/tmp/upload.docx', 'vi', user_id=user_id, priority=weight)
+        ids.append(job_id)
+        time.sleep(0.001)  # distinct created_at, the tie-breaker
+    return ids
+
+
+def _lease_all(store, n):
+    order = []
+    for _ in range(n):
+        jobs = store.lease('w1', limit=1)
+        assert jobs
+        order.append(jobs[0]['user_id'])
+    return order
+
+
+def test_backlog_does_not_hold_back_later_users(store):
+    _submit(store, 'pro', 6, weight=3)
+    _submit(store, 'free1', 1)
+    _submit(store, 'free2', 1)
+    order = _lease_all(store, 8)
+    # Both free jobs are leased right after the pro user's first one, not after all six
+    assert order[:3] == ['pro', 'free1', 'free2']
+
+
+def test_leases_follow_plan_weights(store):
+    _submit(store, 'pro', 8, weight=3)
+    _submit(store, 'free', 8, weight=1)
+    assert Counter(_lease_all(store, 8)) == {'pro': 6, 'free': 2}
+
+
+def test_idle_user_does_not_bank_credit(store):
+    _submit(store, 'busy', 4)
+    _lease_all(store, 2)
+    late = _submit(store, 'late', 1)[0]
+    job = store.get(late)
+    # Starts at the last leased tag: ahead of busy's remaining jobs, not ahead of what ran
+    assert job['virtual_start'] == 1.0
+    assert store.queue_position(job) == 1
+    assert _lease_all(store, 1) == ['late']
+
+
+def test_queue_position_matches_lease_order(store):
+    ids = _submit(store, 'pro', 3, weight=3) + _submit(store, 'free', 2)
+    pending = sorted(
+        (store.get(job_id) for job_id in ids),
+        key=lambda job: store.queue_position(job),
+    )
+    leased = [store.lease('w1', limit=1)[0]['id'] for _ in pending]
+    assert [job['id'] for job in pending] == leased
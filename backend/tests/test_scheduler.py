@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import CancelledError, wait
+
+import pytest
+
+from app.services.scheduler import SegmentScheduler, parse_plan_weights
+
+
+@pytest.fixture
+def run_queued():
+    """Queue tasks behind a blocked single worker, then release it and return the run order."""
+    scheduler = SegmentScheduler(concurrency=1)
+    gate = threading.Event()
+    blocker = scheduler.lane('gate', 'gate').submit(gate.wait)
+    order = []
+
+    def run(submissions):
+        futures = [lane.submit(order.append, label) for lane, label in submissions]
+        gate.set()
+        wait([blocker] + futures, timeout=5)
+        return futures
+
+    run.scheduler = scheduler
+    run.order = order
+    return run
+
+
+def test_users_share_segments_by_plan_weight(run_queued):
+    pro = run_queued.scheduler.lane('job-pro', 'pro', weight=3)
+    free = run_queued.scheduler.lane('job-free', 'free', weight=1)
+    run_queued([(pro, 'pro')] * 12 + [(free, 'free')] * 12)
+    order = run_queued.order
+    # Stride order while both have work: 3 pro segments per free one
+    assert order[:8] == ['pro', 'free', 'pro', 'pro', 'pro', 'free', 'pro', 'pro']
+    assert order[:16].count('pro') == 12
+    assert order[16:] == ['free'] * 8
+
+
+def test_a_big_job_only_delays_its_own_user(run_queued):
+    s = run_queued.scheduler
+    big, small = s.lane('big', 'alice'), s.lane('small', 'alice')
+    other = s.lane('other', 'bob')
+    run_queued([(big, 'big')] * 6 + [(small, 'small')] * 2 + [(other, 'other')] * 2)
+    # alice's jobs take turns; bob is served at his weight, not after alice's backlog
+    assert run_queued.order[:6] == ['big', 'other', 'small', 'other', 'big', 'small']
+    assert run_queued.order[6:] == ['big'] * 4
+
+
+def test_cancelled_job_drops_its_queued_segments(run_queued):
+    s = run_queued.scheduler
+    doomed, kept = s.lane('doomed', 'alice'), s.lane('kept', 'bob')
+    futures = [doomed.submit(run_queued.order.append, 'doomed') for _ in range(3)]
+    doomed.shutdown(wait=False, cancel_futures=True)
+    run_queued([(kept, 'kept')] * 2)
+    assert run_queued.order == ['kept', 'kept']
+    for future in futures:
+        with pytest.raises(CancelledError):
+            future.result(timeout=1)
+    assert s.depth() == 0
+
+
+def test_parse_plan_weights_keeps_defaults_for_bad_entries():
+    weights = parse_plan_weights('pro:5, free:0, team:x, :4')
+    assert weights['pro'] == 5 and weights['free'] == 1 and weights['promax'] == 6
+    assert 'team' not in weights
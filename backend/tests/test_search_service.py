@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.models import db, Translation, User
+from app.services.search_service import highlight, search_index
+
+
+@pytest.fixture
+def app(db_app):
+    with db_app.app_context():
+        db.session.add_all([User(id=1, google_id='g1', email='a@example.com'),
+                            User(id=2, google_id='g2', email='b@example.com')])
+        db.session.commit()
+        search_index.init_app(db_app)
+        search_index.ensure_schema(db.engine)
+    yield db_app
+    # The singleton's session hook would otherwise index into other tests' databases
+    if event.contains(Session, 'after_flush', search_index._after_flush):
+        event.remove(Session, 'after_flush', search_index._after_flush)
+    search_index._listening = False
+    search_index.dialect = None
+
+
+def _add(user_id, original, translated='', created_at=None):
+    t = Translation(user_id=user_id, original_text=original, translated_text=translated,
+                    source_lang='vi', target_lang='en', created_at=created_at or datetime.utcnow())
+    db.session.add(t)
+    db.session.commit()
+    return t.id
+
+
+def _ids(user_id, query, **kwargs):
+    return [r['id'] for r in search_index.search(user_id, query, **kwargs)['results']]
+
+
+def _indexed():
+    return db.session.execute(text('SELECT translation_id FROM translation_search')).scalars().all()
+
+
+def test_index_follows_insert_update_delete(app):
+    with app.app_context():
+        tid = _add(1, 'Hợp đồng lao động', 'Labour contract')
+        other = _add(2, 'Hợp đồng thuê nhà', 'Lease contract')
+        assert _ids(1, 'hop dong') == [tid]
+        assert _ids(2, 'hop dong') == [other]
+
+        t = db.session.get(Translation, tid)
+        t.original_text = 'Biên bản họp'
+        db.session.commit()
+        assert _ids(1, 'hop dong') == []
+        assert _ids(1, 'bien ban') == [tid]
+        assert sorted(_indexed()) == [tid, other]
+
+        db.session.delete(db.session.get(Translation, tid))
+        db.session.commit()
+        assert _ids(1, 'bien ban') == []
+        assert _indexed() == [other]
+
+
+def test_matching_is_accent_and_case_insensitive(app):
+    with app.app_context():
+        tid = _add(1, 'HỢP ĐỒNG mua bán', 'Sales contract')
+        for query in ('hop dong', 'Hợp đồng', 'HOP', 'đồng', 'contract'):
+            assert _ids(1, query) == [tid], query
+        assert _ids(1, 'hop nhat') == []
+
+
+@pytest.mark.parametrize('sort', ['relevance', 'recent'])
+def test_keyset_pages_have_no_duplicates_or_gaps(app, sort):
+    with app.app_context():
+        start = datetime(2026, 1, 1)
+        expected = []
+        for i in range(23):
+            # Repeated texts and timestamps give ties the cursor has to break by id
+            words = ' '.join(['hop dong'] * (1 + i % 3) + ['khac'] * (i % 4))
+            expected.append(_add(1, words, created_at=start + timedelta(minutes=i // 2)))
+        _add(2, 'hop dong')
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = search_index.search(1, 'hop dong', cursor=cursor, limit=5, sort=sort)
+            seen.extend(r['id'] for r in page['results'])
+            pages += 1
+            if not page['has_more']:
+                break
+            cursor = page['next_cursor']
+        assert pages == 5
+        assert len(seen) == len(set(seen))
+        assert sorted(seen) == sorted(expected)
+        # One query for everything gives the same order as walking the pages
+        assert seen == _ids(1, 'hop dong', limit=50, sort=sort)
+
+
+def test_invalid_cursor_and_empty_query_are_rejected(app):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            search_index.search(1, '  ,. ')
+        with pytest.raises(ValueError):
+            search_index.search(1, 'hop', cursor='not-a-cursor')
+
+
+def test_highlight_escapes_text_around_matches():
+    out = highlight('<b>Hợp đồng</b> & "hop"', ['hop'])
+    assert out == '&lt;b&gt;<mark>Hợp</mark> đồng&lt;/b&gt; &amp; &quot;<mark>hop</mark>&quot;'
+
+
+def test_highlight_cuts_a_window_around_the_first_match():
+    value = 'x ' * 200 + '<i>hợp</i> đồng' + ' y' * 200
+    out = highlight(value, ['hop'], width=40)
+    assert out.startswith('…') and out.endswith('…')
+    assert '&lt;i&gt;<mark>hợp</mark>&lt;/i&gt;' in out
+    assert '<i>' not in out
+
+
+def test_search_results_are_highlighted_and_escaped(app):
+    with app.app_context():
+        _add(1, '<script>alert(1)</script> hợp đồng', 'contract')
+        result = search_index.search(1, 'hop')['results'][0]
+        assert result['original_highlight'] == '&lt;script&gt;alert(1)&lt;/script&gt; <mark>hợp</mark> đồng'
+        assert result['translated_highlight'] == 'contract'
@@ -0,0 +1,80 @@
+import hashlib
+import os
+
+import pytest
+
+from app.services.document_formats import load_parsed, split_text
+from app.services.upload_service import UploadError, UploadSessionStore
+
+TEXT = ('Đoạn một.\n\nĐoạn hai, dài hơn một chút.\n\n\nĐoạn ba.\r\nvẫn đoạn ba\n\n' * 50).encode('utf-8')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadSessionStore(str(tmp_path / 'sessions'))
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_offset_mismatch_reports_the_offset_to_resume_from(store):
+    session = store.create('u1', 'notes.txt', len(TEXT))
+    chunks = _chunks(TEXT, 1000)
+    offset = store.append(session['upload_id'], 'u1', 0, chunks[0], _sha(chunks[0]))
+
+    # A retried chunk after a lost response, and a chunk sent ahead of the server
+    for stale in (0, offset + len(chunks[1])):
+        with pytest.raises(UploadError) as e:
+            store.append(session['upload_id'], 'u1', stale, chunks[1])
+        assert e.value.status == 409 and e.value.offset == offset
+
+    assert store.get(session['upload_id'], 'u1')['offset'] == offset
+    for chunk in chunks[1:]:
+        offset = store.append(session['upload_id'], 'u1', offset, chunk)
+    assert offset == len(TEXT)
+
+
+def test_rejected_chunk_leaves_the_offset_unchanged(store):
+    session = store.create('u1', 'notes.txt', len(TEXT))
+    with pytest.raises(UploadError) as e:
+        store.append(session['upload_id'], 'u1', 0, TEXT[:100], checksum=_sha(b'other'))
+    assert e.value.status == 400 and e.value.offset == 0
+    with pytest.raises(UploadError) as e:
+        store.append(session['upload_id'], 'u1', 0, TEXT + b'!')
+    assert e.value.status == 413
+    with pytest.raises(UploadError) as e:
+        store.complete(session['upload_id'], 'u1', 'unused')
+    assert e.value.status == 409 and e.value.offset == 0
+
+
+def test_resume_in_another_process_rebuilds_hash_and_segments(store, tmp_path):
+    session = store.create('u1', 'notes.txt', len(TEXT))
+    # Split inside a multi-byte character and inside a paragraph break
+    cut = TEXT.index('ạn hai'.encode('utf-8')) + 1
+    offset = store.append(session['upload_id'], 'u1', 0, TEXT[:cut])
+
+    # Same folder, fresh in-memory state: another API node or a restarted process
+    other = UploadSessionStore(store.folder)
+    assert other.get(session['upload_id'], 'u1')['offset'] == offset
+    for chunk in _chunks(TEXT[cut:], 777):
+        offset = other.append(session['upload_id'], 'u1', offset, chunk)
+    _, path, file_hash = other.complete(session['upload_id'], 'u1', str(tmp_path / 'uploads'), sha256=_sha(TEXT))
+
+    assert file_hash == _sha(TEXT)
+    with open(path, 'rb') as f:
+        assert f.read() == TEXT
+    with open(path, 'r', encoding='utf-8') as f:
+        assert load_parsed(path)['segments'] == split_text(f.read())
+    assert os.listdir(store.folder) == []
+
+
+def test_sessions_are_private_to_their_user(store):
+    session = store.create('u1', 'notes.txt', len(TEXT))
+    with pytest.raises(UploadError) as e:
+        store.append(session['upload_id'], 'u2', 0, TEXT[:10])
+    assert e.value.status == 404
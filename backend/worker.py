@@ -0,0 +1,36 @@
+import os
+import signal
+from dotenv import load_dotenv
+
+# Load .env từ thư mục backend (nơi có worker.py) – trước khi import config hoặc TranslationService
+_env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(_env_path)
+
+from app import create_app
+from app.routes.translation import translation_service
+from app.services.job_worker import JobWorker
+from app.utils.metrics import REGISTRY
+
+# Standalone translation worker: leases document jobs from the shared database,
+# heartbeats while they run and picks up jobs abandoned by dead workers.
+# Run as many of these as needed; API nodes can set JOB_WORKER_EMBEDDED=false.
+app = create_app(os.getenv('APP_CONFIG', 'config.DevelopmentConfig'))
+
+if __name__ == '__main__':
+    worker = JobWorker(
+        translation_service,
+        translation_service.job_store,
+        max_jobs=app.config.get('JOB_WORKER_CONCURRENCY', 8),
+        poll_interval=app.config.get('JOB_POLL_INTERVAL', 1.0),
+    )
+    translation_service.worker = worker
+    print("=" * 60)
+    print(f"🛠️  Translation worker {worker.worker_id} (max {worker.max_jobs} jobs)")
+    print("=" * 60)
+    # SIGTERM (docker stop, systemd): stop leasing, let running jobs finish or requeue them
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.close())
+    # Job metrics reach the API's /metrics through METRICS_DIR
+    REGISTRY.start()
+    worker.run_forever(drain_timeout=app.config.get('JOB_DRAIN_TIMEOUT', 30))
+    translation_service.file_service.shutdown()
+    REGISTRY.stop()
@@ -0,0 +1,11 @@
+import os
+from dotenv import load_dotenv
+
+# Load .env từ thư mục backend (nơi có wsgi.py) – trước khi import config
+_env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(_env_path)
+
+from app import create_app
+
+# WSGI entry point for production servers: gunicorn -c gunicorn.conf.py
+app = create_app(os.getenv('APP_CONFIG', 'config.ProductionConfig'))
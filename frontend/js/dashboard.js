@@ -635,9 +635,13 @@ class HistoryManager {
     this.currentPage = 1;
     this.currentFilter = "all";
     this.currentDate = "";
+    // Keyset pagination: cursors[i] is the cursor that loads page i + 1
+    this.cursors = [null];
+    this.items = {};
   }
 
   async loadHistory(page = 1, filter = "all", date = "") {
+    if (page === 1) this.cursors = [null];
     this.currentPage = page;
     this.currentFilter = filter;
     this.currentDate = date || "";
@@ -658,15 +662,18 @@ class HistoryManager {
           },
         ];
         this.renderHistory(mock);
-        this.updatePagination(1, 1);
+        this.updatePagination(1, false);
         return;
       }
 
       const params = new URLSearchParams({
-        page: page,
-        per_page: 10,
+        limit: 10,
         type: filter,
       });
+      const cursor = this.cursors[page - 1];
+      if (cursor) {
+        params.set("cursor", cursor);
+      }
 
       if (date) {
         params.set("date", date);
@@ -679,8 +686,11 @@ class HistoryManager {
       if (!response.ok) throw new Error("Failed to load history");
 
       const data = await response.json();
+      if (data.next_cursor) {
+        this.cursors[page] = data.next_cursor;
+      }
       this.renderHistory(data.translations);
-      this.updatePagination(data.pages, page);
+      this.updatePagination(page, data.has_more);
     } catch (error) {
       console.error("Error loading history:", error);
     }
@@ -688,6 +698,10 @@ class HistoryManager {
 
   renderHistory(translations) {
     const historyList = document.getElementById("historyList");
+    this.items = {};
+    translations.forEach((item) => {
+      this.items[item.id] = item;
+    });
 
     if (translations.length === 0) {
       historyList.innerHTML =
@@ -712,7 +726,7 @@ class HistoryManager {
                     </div>
                 </div>
                 <div class="history-actions">
-                    <button onclick="copyHistoryItem('${item.translated_text.replace(/'/g, "\\'")}')" class="btn-small">
+                    <button onclick="dashboard.history.copyItem(${item.id})" class="btn-small">
                         <i class="fas fa-copy"></i> Sao chép
                     </button>
                     <button onclick="deleteHistoryItem(${item.id})" class="btn-small delete">
@@ -725,19 +739,40 @@ class HistoryManager {
       .join("");
   }
 
-  updatePagination(totalPages, currentPage) {
+  updatePagination(currentPage, hasMore) {
     const pageInfo = document.getElementById("pageInfo");
     const prevBtn = document.getElementById("prevPage");
     const nextBtn = document.getElementById("nextPage");
 
-    pageInfo.textContent = `Trang ${currentPage} / ${totalPages}`;
+    pageInfo.textContent = `Trang ${currentPage}`;
     prevBtn.disabled = currentPage <= 1;
-    nextBtn.disabled = currentPage >= totalPages;
+    nextBtn.disabled = !hasMore;
+  }
+
+  async copyItem(id) {
+    const item = this.items[id];
+    if (!item) return;
+    let text = item.translated_text;
+    try {
+      // The list only carries previews; fetch the full record when it was cut
+      if (item.truncated) {
+        const response = await fetch(`/api/history/${id}`, {
+          headers: this.auth.getAuthHeaders(),
+        });
+        if (!response.ok) throw new Error("Failed to load translation");
+        text = (await response.json()).translated_text;
+      }
+      await navigator.clipboard.writeText(text);
+      UIManager.showNotification("Đã sao chép vào clipboard!", "success");
+    } catch (error) {
+      console.error("Error copying history item:", error);
+      UIManager.showNotification("Không thể sao chép bản dịch!", "error");
+    }
   }
 
   changePage(direction) {
     const newPage = this.currentPage + direction;
-    if (newPage > 0) {
+    if (newPage > 0 && (newPage === 1 || this.cursors[newPage - 1])) {
       this.loadHistory(newPage, this.currentFilter, this.currentDate);
     }
   }
@@ -808,7 +843,7 @@ class FileUploadManager {
       "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
       "text/plain",
     ];
-    const maxSize = 50 * 1024 * 1024; // 50MB
+    const maxSize = 500 * 1024 * 1024; // 500MB (files above 8MB go through chunked upload)
 
     if (!allowedTypes.includes(file.type)) {
       UIManager.showAlert(
@@ -818,7 +853,7 @@ class FileUploadManager {
     }
 
     if (file.size > maxSize) {
-      UIManager.showAlert("File quá lớn. Giới hạn 50MB.");
+      UIManager.showAlert("File quá lớn. Giới hạn 500MB.");
       return;
     }
 
@@ -836,6 +871,80 @@ class FileUploadManager {
     this.selectedFile = file;
   }
 
+  async sha256Hex(buffer) {
+    // crypto.subtle is only available on https/localhost; the checksum is optional
+    if (!window.crypto || !window.crypto.subtle) return null;
+    const digest = await window.crypto.subtle.digest("SHA-256", buffer);
+    return Array.from(new Uint8Array(digest))
+      .map((b) => b.toString(16).padStart(2, "0"))
+      .join("");
+  }
+
+  // Resumable upload for large files: chunks are retried and resumed from the
+  // offset the server reports, so a dropped connection does not restart the file
+  async uploadChunked(file, targetLang) {
+    const headers = this.auth.getAuthHeaders();
+    const startRes = await fetch("/api/translation/document/uploads", {
+      method: "POST",
+      headers: { "Content-Type": "application/json", ...headers },
+      body: JSON.stringify({ filename: file.name, size: file.size }),
+    });
+    const session = await startRes.json().catch(() => ({}));
+    if (!startRes.ok) {
+      throw new Error(session.error || "Không thể bắt đầu upload.");
+    }
+
+    let offset = session.offset || 0;
+    let failures = 0;
+    while (offset < file.size) {
+      const chunk = await file
+        .slice(offset, offset + session.chunk_size)
+        .arrayBuffer();
+      const chunkHeaders = { ...headers, "Upload-Offset": String(offset) };
+      const checksum = await this.sha256Hex(chunk);
+      if (checksum) chunkHeaders["X-Chunk-SHA256"] = checksum;
+      try {
+        const res = await fetch(session.upload_url, {
+          method: "PUT",
+          headers: chunkHeaders,
+          body: chunk,
+        });
+        const data = await res.json().catch(() => ({}));
+        if (res.ok || (res.status === 409 && data.offset !== undefined)) {
+          offset = data.offset;
+          failures = 0;
+        } else if (res.status >= 500 || res.status === 400) {
+          throw new Error(data.error || `HTTP ${res.status}`);
+        } else {
+          throw Object.assign(new Error(data.error || "Upload thất bại."), {
+            fatal: true,
+          });
+        }
+      } catch (err) {
+        if (err.fatal || ++failures > 5) throw err;
+        // Back off, then ask the server how much it has before resuming
+        await new Promise((r) => setTimeout(r, 1000 * failures));
+        const st = await fetch(session.upload_url, { headers })
+          .then((r) => r.json())
+          .catch(() => null);
+        if (st && st.offset !== undefined) offset = st.offset;
+      }
+      document.getElementById("uploadBtnText").textContent =
+        `Đang upload... ${Math.floor((offset / file.size) * 100)}%`;
+    }
+
+    const doneRes = await fetch(`${session.upload_url}/complete`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", ...headers },
+      body: JSON.stringify({ target_lang: targetLang }),
+    });
+    const done = await doneRes.json().catch(() => ({}));
+    if (!doneRes.ok) {
+      throw new Error(done.error || "Upload thất bại.");
+    }
+    return done;
+  }
+
   async uploadDocument() {
     if (!this.selectedFile) {
       UIManager.showError("Vui lòng chọn file trước!");
@@ -861,22 +970,27 @@ class FileUploadManager {
     formData.append("target_lang", targetLang);
 
     try {
-      const response = await fetch("/api/translation/document", {
-        method: "POST",
-        headers: this.auth.getAuthHeaders(),
-        body: formData,
-      });
+      let data;
+      if (this.selectedFile.size > 8 * 1024 * 1024) {
+        data = await this.uploadChunked(this.selectedFile, targetLang);
+      } else {
+        const response = await fetch("/api/translation/document", {
+          method: "POST",
+          headers: this.auth.getAuthHeaders(),
+          body: formData,
+        });
 
-      if (!response.ok) {
-        const errorData = await response.json().catch(() => ({}));
-        throw new Error(
-          errorData.error ||
-            errorData.message ||
-            "Upload thất bại. Kiểm tra API key (OPENAI/OPENROUTER) trong .env.",
-        );
-      }
+        if (!response.ok) {
+          const errorData = await response.json().catch(() => ({}));
+          throw new Error(
+            errorData.error ||
+              errorData.message ||
+              "Upload thất bại. Kiểm tra API key (OPENAI/OPENROUTER) trong .env.",
+          );
+        }
 
-      const data = await response.json();
+        data = await response.json();
+      }
 
       // If job-based, start polling status
       if (data.job_id) {
@@ -889,62 +1003,106 @@ class FileUploadManager {
         const progressText = document.getElementById("progressText");
         const progressPercent = document.getElementById("progressPercent");
 
-        const pollUrl = data.status_url;
-        const interval = setInterval(async () => {
-          try {
-            const statusResp = await fetch(pollUrl, {
-              headers: this.auth.getAuthHeaders(),
-            });
-            if (!statusResp.ok) {
-              throw new Error("Failed to get status");
+        // Progress is pushed over Server-Sent Events; polling status_url remains the fallback
+        let interval = null;
+        let events = null;
+        const stopTracking = () => {
+          if (interval) clearInterval(interval);
+          if (events) events.close();
+          interval = null;
+          events = null;
+        };
+        const handleStatus = (statusData) => {
+          const p = statusData.progress || 0;
+          progressFill.style.width = `${p}%`;
+          progressPercent.textContent = `${p}%`;
+          progressText.textContent = statusData.message || "Đang xử lý...";
+
+          if (statusData.status === "completed") {
+            stopTracking();
+
+            // If fallback occurred, inform user
+            if (statusData.fallback) {
+              UIManager.showError(
+                `File was returned as a fallback (${statusData.fallback_reason}). The file may be plain text.`,
+              );
             }
-            const statusData = await statusResp.json();
-            const p = statusData.progress || 0;
-            progressFill.style.width = `${p}%`;
-            progressPercent.textContent = `${p}%`;
-            progressText.textContent = statusData.message || "Đang xử lý...";
-
-            if (statusData.status === "completed") {
-              clearInterval(interval);
-
-              // If fallback occurred, inform user
-              if (statusData.fallback) {
-                UIManager.showError(
-                  `File was returned as a fallback (${statusData.fallback_reason}). The file may be plain text.`,
-                );
-              }
 
-              // Auto download
-              if (statusData.download_url) {
-                setTimeout(() => {
-                  const link = document.createElement("a");
-                  link.href = statusData.download_url;
-                  link.download = `translated_${this.selectedFile.name}`;
-                  document.body.appendChild(link);
-                  link.click();
-                  document.body.removeChild(link);
-                }, 500);
-              }
+            // Auto download
+            if (statusData.download_url) {
+              setTimeout(() => {
+                const link = document.createElement("a");
+                link.href = statusData.download_url;
+                link.download = `translated_${this.selectedFile.name}`;
+                document.body.appendChild(link);
+                link.click();
+                document.body.removeChild(link);
+              }, 500);
+            }
 
-              UIManager.showSuccess("Tệp đã được dịch xong!");
-              document.getElementById("uploadProgress").style.display = "none";
+            UIManager.showSuccess("Tệp đã được dịch xong!");
+            document.getElementById("uploadProgress").style.display = "none";
 
-              // Reload stats and history
-              dashboard.stats.loadStats();
-              dashboard.history.loadHistory();
-            }
+            // Reload stats and history
+            dashboard.stats.loadStats();
+            dashboard.history.loadHistory();
+          }
 
-            if (statusData.status === "failed") {
-              clearInterval(interval);
-              UIManager.showError(
-                statusData.error || "Đã có lỗi khi xử lý file",
-              );
-              document.getElementById("uploadProgress").style.display = "none";
-            }
-          } catch (err) {
-            console.error("Status polling error", err);
+          if (statusData.status === "failed") {
+            stopTracking();
+            UIManager.showError(
+              statusData.error || "Đã có lỗi khi xử lý file",
+            );
+            document.getElementById("uploadProgress").style.display = "none";
           }
-        }, 1000);
+
+          if (statusData.status === "cancelled") {
+            stopTracking();
+            document.getElementById("uploadProgress").style.display = "none";
+          }
+        };
+
+        const startPolling = () => {
+          if (interval) return;
+          const pollUrl = data.status_url;
+          interval = setInterval(async () => {
+            try {
+              const statusResp = await fetch(pollUrl, {
+                headers: this.auth.getAuthHeaders(),
+              });
+              if (!statusResp.ok) {
+                throw new Error("Failed to get status");
+              }
+              handleStatus(await statusResp.json());
+            } catch (err) {
+              console.error("Status polling error", err);
+            }
+          }, 1000);
+        };
+
+        if (window.EventSource && data.events_url) {
+          events = new EventSource(data.events_url);
+          let received = false;
+          const onEvent = (e) => {
+            received = true;
+            handleStatus(JSON.parse(e.data));
+          };
+          events.addEventListener("progress", onEvent);
+          events.addEventListener("done", onEvent);
+          events.onerror = () => {
+            // The server ends long streams (JOB_EVENTS_MAX_DURATION): let the browser
+            // reconnect as long as the stream worked before
+            if (events && received && events.readyState === EventSource.CONNECTING) {
+              return;
+            }
+            // Stream refused or unsupported by a proxy: fall back to polling
+            if (events) events.close();
+            events = null;
+            startPolling();
+          };
+        } else {
+          startPolling();
+        }
       } else if (data.download_url) {
         // Fallback for immediate synchronous response
         if (data.fallback) {
@@ -998,46 +1156,30 @@ class DashboardStatsManager {
       // Dev: if token is fake, create mock stats
       const token = localStorage.getItem("token");
       if (token && token.startsWith && token.startsWith("fake")) {
-        this.updateStats([
-          { created_at: new Date().toISOString(), has_file: false },
-        ]);
+        this.updateStats({
+          today: { total: 1, text: 1, document: 0 },
+          all_time: { total: 1, text: 1, document: 0 },
+        });
         return;
       }
 
-      const response = await fetch(
-        "/api/translation/history?page=1&per_page=100",
-        {
-          headers: this.auth.getAuthHeaders(),
-        },
-      );
+      const response = await fetch("/api/history/stats?days=30", {
+        headers: this.auth.getAuthHeaders(),
+      });
 
       if (!response.ok) throw new Error("Failed to load stats");
 
-      const data = await response.json();
-      this.updateStats(data.translations);
+      this.updateStats(await response.json());
     } catch (error) {
       console.error("Error loading stats:", error);
     }
   }
 
-  updateStats(translations) {
-    const today = new Date().toDateString();
-
-    let todayCount = 0;
-    let documentCount = 0;
-
-    translations.forEach((item) => {
-      const itemDate = new Date(item.created_at).toDateString();
-      if (itemDate === today) {
-        todayCount++;
-      }
-      if (item.has_file) {
-        documentCount++;
-      }
-    });
-
-    document.getElementById("translationCount").textContent = todayCount;
-    document.getElementById("documentCount").textContent = documentCount;
+  updateStats(stats) {
+    document.getElementById("translationCount").textContent =
+      stats.today.total;
+    document.getElementById("documentCount").textContent =
+      stats.all_time.document;
 
     // Use quota info shown in plan card if available
     const usedText = (document.getElementById("usedToday") || {}).textContent;
@@ -1310,6 +1452,10 @@ class DashboardController {
         return payload;
       })
       .then(async (payload) => {
+        // The token carries the plan as a claim: switch to the reissued one
+        if (payload.access_token) {
+          localStorage.setItem("token", payload.access_token);
+        }
         UIManager.showNotification(
           `Đã nâng cấp lên ${payload.plan_name || plan.toUpperCase()} (Dev).`,
           "success",